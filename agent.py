@@ -0,0 +1,227 @@
+import os
+import asyncio
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+
+import httpx
+from google import genai
+from google.genai import types
+
+import config as cfg
+from call_funtion import call_function, available_functions, plan_call_levels
+from context_compaction import ContextManager
+
+# Tools do blocking file and subprocess work; give them their own pool so they
+# never compete with the server's request threadpool
+_tool_pool = ThreadPoolExecutor(max_workers=cfg.TOOL_WORKERS, thread_name_prefix="agent-tool")
+
+
+class AgentError(Exception):
+    pass
+
+
+# Built once and shared by every run; treat as read-only
+GENERATE_CONFIG = types.GenerateContentConfig(
+    system_instruction=cfg.system_prompt,
+    tools=[available_functions],
+    candidate_count=1,
+)
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_client():
+    """Process-wide Gemini client, created on first use.
+
+    Reusing it keeps the underlying httpx pools (and their TLS connections) alive
+    across runs instead of handshaking again for every request.
+    """
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                api_key = os.environ.get("GEMINI_API_KEY")
+                if not api_key:
+                    raise AgentError("GEMINI_API_KEY not set")
+                limits = httpx.Limits(
+                    max_connections=cfg.GEMINI_MAX_CONNECTIONS,
+                    max_keepalive_connections=cfg.GEMINI_MAX_KEEPALIVE,
+                    keepalive_expiry=cfg.GEMINI_KEEPALIVE_EXPIRY,
+                )
+                _client = genai.Client(
+                    api_key=api_key,
+                    http_options=types.HttpOptions(
+                        client_args={"limits": limits},
+                        async_client_args={"limits": limits},
+                    ),
+                )
+    return _client
+
+
+class RunGovernor:
+    """Caps concurrent agent runs globally and per workspace; excess runs wait in line."""
+
+    def __init__(self, max_global, max_per_workspace, queue_timeout=None):
+        self._global = asyncio.Semaphore(max_global)
+        self._max_per_workspace = max_per_workspace
+        self._workspaces = {}  # workspace -> [semaphore, holders + waiters]
+        self._queue_timeout = queue_timeout
+        self.active = 0
+        self.queued = 0
+
+    @asynccontextmanager
+    async def slot(self, workspace):
+        entry = self._workspaces.setdefault(workspace, [asyncio.Semaphore(self._max_per_workspace), 0])
+        entry[1] += 1
+        self.queued += 1
+        acquired_ws = acquired_global = False
+        try:
+            async with asyncio.timeout(self._queue_timeout):
+                # Wait on the workspace first so queued runs don't hold global slots
+                await entry[0].acquire()
+                acquired_ws = True
+                await self._global.acquire()
+                acquired_global = True
+            self.queued -= 1
+            self.active += 1
+            try:
+                yield
+            finally:
+                self.active -= 1
+        finally:
+            if not acquired_global:
+                self.queued -= 1
+            else:
+                self._global.release()
+            if acquired_ws:
+                entry[0].release()
+            entry[1] -= 1
+            if entry[1] == 0:
+                self._workspaces.pop(workspace, None)
+
+    def in_use(self, workspace):
+        """True while a run on workspace is queued or running."""
+        return workspace in self._workspaces
+
+    def stats(self):
+        return {"active": self.active, "queued": self.queued, "workspaces": len(self._workspaces)}
+
+
+async def run_tool(function_call, verbose, workspace_root, on_output=None, priority=None):
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        _tool_pool,
+        functools.partial(call_function, function_call, verbose, workspace_root, on_output=on_output, priority=priority),
+    )
+
+
+def _output_forwarder(loop, queue, iteration, name):
+    """Thread-safe on_output callback that turns script output into tool_output events."""
+    sent = 0
+
+    def on_output(stream, text):
+        nonlocal sent
+        if sent >= cfg.STREAM_TOOL_OUTPUT_MAX_CHARS:
+            return
+        text = text[:cfg.STREAM_TOOL_OUTPUT_MAX_CHARS - sent]
+        sent += len(text)
+        event = {"type": "tool_output", "iteration": iteration, "name": name, "stream": stream, "text": text}
+        if sent >= cfg.STREAM_TOOL_OUTPUT_MAX_CHARS:
+            event["truncated"] = True
+        loop.call_soon_threadsafe(queue.put_nowait, event)
+
+    return on_output
+
+
+def _usage(resp):
+    usage = resp.usage_metadata
+    return {
+        "prompt_tokens": getattr(usage, "prompt_token_count", None),
+        "response_tokens": getattr(usage, "candidates_token_count", None),
+    }
+
+
+def _summarize(content, limit=cfg.STREAM_RESULT_PREVIEW_CHARS):
+    response = content.parts[0].function_response.response or {}
+    result = str(response.get("result", response.get("error", "")))
+    preview = result if len(result) <= limit else result[:limit] + "..."
+    return {"chars": len(result), "preview": preview}
+
+
+async def iter_agent_events(client, config, messages, workspace_root, max_iterations, verbose=False, priority=None):
+    """Async Gemini tool-calling loop that yields an event dict as each step happens.
+
+    Event types: model_turn, tool_call, tool_output, tool_result, usage, compaction
+    and final. priority is passed to the execution scheduler for script runs. Raises
+    AgentError if the model returns nothing or max_iterations is reached.
+    """
+    context = ContextManager(messages)
+    for iteration in range(1, max_iterations + 1):
+        if saved := context.compact():
+            yield {"type": "compaction", "iteration": iteration, "tokens_saved": saved}
+        resp = await client.aio.models.generate_content(
+            model="gemini-2.0-flash",
+            contents=messages,
+            config=config,
+        )
+        if not resp or not resp.candidates:
+            raise AgentError("Empty response")
+
+        candidate_msg = resp.candidates[0]
+        messages.append(candidate_msg.content)
+        text = "".join(p.text for p in (candidate_msg.content.parts or []) if p.text)
+        yield {"type": "model_turn", "iteration": iteration, "text": text or None}
+        yield {"type": "usage", "iteration": iteration, **_usage(resp)}
+
+        if resp.function_calls:
+            calls = resp.function_calls
+            for fc in calls:
+                yield {"type": "tool_call", "iteration": iteration, "name": fc.name, "args": dict(fc.args or {})}
+
+            # Independent calls in a level run together; results keep the model's call order
+            results = [None] * len(calls)
+            limit = asyncio.Semaphore(cfg.TOOL_CALL_PARALLELISM)
+
+            loop = asyncio.get_running_loop()
+            live = asyncio.Queue()
+
+            async def run_bounded(fc):
+                async with limit:
+                    forward = _output_forwarder(loop, live, iteration, fc.name)
+                    return await run_tool(fc, verbose, workspace_root, forward, priority)
+
+            for level in plan_call_levels(calls):
+                pending = asyncio.ensure_future(asyncio.gather(*(run_bounded(calls[i]) for i in level)))
+                # Relay script output while the level runs
+                while not pending.done():
+                    getter = asyncio.ensure_future(live.get())
+                    done, _ = await asyncio.wait({pending, getter}, return_when=asyncio.FIRST_COMPLETED)
+                    if getter in done:
+                        yield getter.result()
+                    else:
+                        getter.cancel()
+                while not live.empty():
+                    yield live.get_nowait()
+                outputs = pending.result()
+                for i, tool_result in zip(level, outputs):
+                    results[i] = tool_result
+                    yield {"type": "tool_result", "iteration": iteration, "name": calls[i].name, **_summarize(tool_result)}
+
+            tool_parts = [part for tool_result in results for part in tool_result.parts]
+            messages.append(types.Content(role="tool", parts=tool_parts))
+            continue
+
+        yield {"type": "final", "final_text": resp.text, "usage": {**_usage(resp), "compacted_tokens": context.tokens_saved}}
+        return
+
+    raise AgentError("Max iterations reached")
+
+
+async def run_agent(client, config, messages, workspace_root, max_iterations, verbose=False, priority=None):
+    """Run the loop to completion and return the final text and token usage."""
+    async for event in iter_agent_events(client, config, messages, workspace_root, max_iterations, verbose, priority):
+        if event["type"] == "final":
+            return {"final_text": event["final_text"], "usage": event["usage"]}
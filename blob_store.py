@@ -0,0 +1,170 @@
+import os
+import stat
+import time
+import hashlib
+import threading
+
+from config import BLOB_MIN_BYTES, BLOB_COLLECT_INTERVAL
+from file_ops import COPY_CHUNK_SIZE, new_temp_path, discard
+
+
+def file_digest(path):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        while chunk := f.read(COPY_CHUNK_SIZE):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+class BlobStore:
+    """Content-addressed store that workspace files are hardlinked into.
+
+    A blob is named by the sha256 of its content plus its permission bits (all
+    links to an inode share one mode), under objects/<2 hex>/. Adding a
+    workspace makes every file a link to the blob with the same content, so
+    identical files across workspaces take disk space once. A blob's link count
+    minus one is the number of workspace files using it, and collect() deletes
+    blobs nothing links to any more. Tool writes replace files rather than
+    writing through them, and scripts copy a linked file just before writing
+    to it (write_guard.py), so a blob's content never changes.
+    Workspaces on another filesystem than the store are left alone.
+    """
+
+    def __init__(self, root, min_bytes=BLOB_MIN_BYTES):
+        self.root = root
+        self.min_bytes = min_bytes
+        self._lock = threading.Lock()
+        self.stored = self.deduplicated = self.collected = 0
+        self._usage = {"blobs": 0, "bytes": 0, "saved_bytes": 0}
+        self._inodes = set()  # (st_dev, st_ino) of every blob, so workspace files can be told apart
+        os.makedirs(os.path.join(root, "objects"), exist_ok=True)
+        self.device = os.stat(root).st_dev
+
+    def start(self, interval=BLOB_COLLECT_INTERVAL):
+        """Collect now and then every interval seconds in the background; 0 collects only now."""
+        threading.Thread(target=self._collect_forever, args=(interval,), daemon=True).start()
+
+    def _collect_forever(self, interval):
+        while True:
+            try:
+                self.collect()
+            except Exception as e:
+                print(f"Blob collection failed: {e}")
+            if interval <= 0:
+                return
+            time.sleep(interval)
+
+    def _blob_path(self, digest, mode):
+        return os.path.join(self.root, "objects", digest[:2], f"{digest[2:]}-{mode:o}")
+
+    def _add_file(self, path, st):
+        blob = self._blob_path(file_digest(path), stat.S_IMODE(st.st_mode))
+        for _ in range(2):
+            try:
+                blob_st = os.stat(blob)
+            except FileNotFoundError:
+                os.makedirs(os.path.dirname(blob), exist_ok=True)
+                try:
+                    # The workspace file itself becomes the blob
+                    os.link(path, blob)
+                    with self._lock:
+                        self._inodes.add((st.st_dev, st.st_ino))
+                    return "stored"
+                except FileExistsError:
+                    continue  # added concurrently by another workspace
+            with self._lock:
+                self._inodes.add((blob_st.st_dev, blob_st.st_ino))
+            if (blob_st.st_dev, blob_st.st_ino) == (st.st_dev, st.st_ino):
+                return None
+            tmp_path = new_temp_path(path)
+            try:
+                os.unlink(tmp_path)
+                os.link(blob, tmp_path)
+                os.replace(tmp_path, path)
+                return "deduplicated"
+            except FileNotFoundError:
+                discard(tmp_path)
+                continue  # collected between the stat and the link
+            except BaseException:
+                discard(tmp_path)
+                raise
+        return None
+
+    def add_tree(self, workspace):
+        """Link every regular file of a new workspace (outside .git) into the store.
+
+        Must run before anything else can write to the workspace.
+        """
+        counts = {"stored": 0, "deduplicated": 0}
+        if os.stat(workspace).st_dev != self.device:
+            return counts  # can't hardlink across filesystems
+        for dirpath, dirnames, filenames in os.walk(workspace):
+            if ".git" in dirnames:
+                dirnames.remove(".git")
+            for name in filenames:
+                path = os.path.join(dirpath, name)
+                try:
+                    st = os.lstat(path)
+                    if not stat.S_ISREG(st.st_mode) or st.st_size < self.min_bytes:
+                        continue
+                    result = self._add_file(path, st)
+                except OSError:
+                    continue  # left as a private file
+                if result:
+                    counts[result] += 1
+        with self._lock:
+            self.stored += counts["stored"]
+            self.deduplicated += counts["deduplicated"]
+        return counts
+
+    def collect(self):
+        """Delete blobs no workspace links to; returns the bytes deduplication is saving.
+
+        Blobs linked from k workspace files are counted k times in workspace
+        sizes but stored once, so (k - 1) * size is saved.
+        """
+        blobs = size = saved = collected = 0
+        inodes, gone = set(), set()
+        objects = os.path.join(self.root, "objects")
+        for shard in os.scandir(objects):
+            if not shard.is_dir(follow_symlinks=False):
+                continue
+            for entry in os.scandir(shard.path):
+                try:
+                    st = entry.stat(follow_symlinks=False)
+                    if st.st_nlink <= 1:
+                        os.unlink(entry.path)
+                        gone.add((st.st_dev, st.st_ino))
+                        collected += 1
+                        continue
+                except OSError:
+                    continue
+                inodes.add((st.st_dev, st.st_ino))
+                blobs += 1
+                size += st.st_size
+                saved += (st.st_nlink - 2) * st.st_size
+        with self._lock:
+            self.collected += collected
+            self._usage = {"blobs": blobs, "bytes": size, "saved_bytes": saved}
+            # Blobs added while we scanned may be missing from inodes, so only drop deleted ones
+            self._inodes = (self._inodes | inodes) - gone
+        return saved
+
+    def contains(self, st):
+        """Whether the file stat result st is a link to one of the blobs."""
+        with self._lock:
+            return (st.st_dev, st.st_ino) in self._inodes
+
+    def saved_bytes(self):
+        """Bytes saved as of the last collect(), without scanning the store."""
+        with self._lock:
+            return self._usage["saved_bytes"]
+
+    def stats(self):
+        with self._lock:
+            return {
+                **self._usage,
+                "stored": self.stored,
+                "deduplicated": self.deduplicated,
+                "collected": self.collected,
+            }
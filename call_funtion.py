@@ -1,16 +1,28 @@
+import os
 from functions.get_files_info import get_files_info
 from functions.get_file_content import get_file_content
 from functions.write_file_content import write_file_content
 from functions.edit_file_content import edit_file_content
 from functions.run_python_file import run_python_file
+from functions.search_code import search_code
+from functions.find_definition import find_definition
+from functions.find_references import find_references
 from google.genai import types
 from config import WORKING_DIRECTORY, LOCAL_MODE
+from workspace_index import notify_changed, notify_tree_changed
+import search_index
+import symbol_index
+from tool_cache import tool_cache
+from workspace_registry import workspace_registry
 
 from functions.get_files_info import schema_get_files_info
 from functions.get_file_content import schema_get_file_content
 from functions.write_file_content import schema_write_file_content
 from functions.edit_file_content import schema_edit_file_content
 from functions.run_python_file import schema_run_python_file
+from functions.search_code import schema_search_code
+from functions.find_definition import schema_find_definition
+from functions.find_references import schema_find_references
 
 available_functions = types.Tool(
     function_declarations=[
@@ -19,9 +31,82 @@ available_functions = types.Tool(
     schema_write_file_content,
     schema_edit_file_content,
     schema_run_python_file,
+    schema_search_code,
+    schema_find_definition,
+    schema_find_references,
     ]
 )
-def call_function(function_call_part, verbose=False,workspace_root="" ):
+# How each tool touches the workspace, used to decide which calls in one model
+# turn may run concurrently. Anything not listed is treated as a barrier.
+FILE_READ_FUNCTIONS = {"get_file_content"}
+TREE_READ_FUNCTIONS = {"get_files_info", "search_code", "find_definition", "find_references"}
+FILE_WRITE_FUNCTIONS = {"write_file_content", "edit_file_content"}
+
+
+def _file_size(working_directory, file_path):
+    try:
+        return os.path.getsize(os.path.join(os.path.realpath(working_directory), file_path))
+    except (OSError, ValueError):
+        return 0
+
+
+def _write_growth(function_name, args, old_size):
+    """Upper bound on how many bytes a write tool call can add to the workspace."""
+    if function_name == "write_file_content":
+        return len((args.get("content") or "").encode("utf-8")) - old_size
+    texts = [args.get("replacement_text")] + [e.get("replacement_text") for e in args.get("edits") or [] if isinstance(e, dict)]
+    return sum(len(t.encode("utf-8")) for t in texts if isinstance(t, str))
+
+
+def plan_call_levels(function_calls):
+    """Group the calls of one model turn into levels that are safe to run concurrently.
+
+    Reads of different files share a level; a write waits for earlier reads and
+    writes of the same file; listings and searches wait for every earlier write; and calls with
+    unknown effects (run_python_file) wait for everything before them and block
+    everything after. Returns a list of lists of indices into function_calls.
+    """
+    levels = []
+    last_read, last_write = {}, {}
+    last_tree_read = last_any_write = barrier = latest = -1
+    for i, fc in enumerate(function_calls):
+        name = fc.name
+        args = fc.args or {}
+        path = os.path.normpath(args.get("file_path") or ".")
+        if name in FILE_READ_FUNCTIONS:
+            level = max(barrier, last_write.get(path, -1)) + 1
+            last_read[path] = max(last_read.get(path, -1), level)
+        elif name in TREE_READ_FUNCTIONS:
+            level = max(barrier, last_any_write) + 1
+            last_tree_read = max(last_tree_read, level)
+        elif name in FILE_WRITE_FUNCTIONS:
+            level = max(barrier, last_tree_read, last_read.get(path, -1), last_write.get(path, -1)) + 1
+            last_write[path] = level
+            last_any_write = max(last_any_write, level)
+        else:
+            level = barrier = latest + 1
+        latest = max(latest, level)
+        if level == len(levels):
+            levels.append([])
+        levels[level].append(i)
+    return levels
+
+
+def call_functions(function_calls, verbose=False, workspace_root="", executor=None):
+    """Run one turn's calls, in parallel where plan_call_levels allows, returning results in call order."""
+    results = [None] * len(function_calls)
+    for level in plan_call_levels(function_calls):
+        if executor is None or len(level) == 1:
+            for i in level:
+                results[i] = call_function(function_calls[i], verbose, workspace_root)
+            continue
+        futures = [executor.submit(call_function, function_calls[i], verbose, workspace_root) for i in level]
+        for i, fut in zip(level, futures):
+            results[i] = fut.result()
+    return results
+
+
+def call_function(function_call_part, verbose=False,workspace_root="", on_output=None, priority=None):
     
     if LOCAL_MODE:
         working_directory = WORKING_DIRECTORY
@@ -42,6 +127,9 @@ def call_function(function_call_part, verbose=False,workspace_root="" ):
         "run_python_file": run_python_file,
         "write_file_content": write_file_content,
         "edit_file_content": edit_file_content,
+        "search_code": search_code,
+        "find_definition": find_definition,
+        "find_references": find_references,
     }
     if function_name not in function_map:
         return types.Content(
@@ -57,9 +145,42 @@ def call_function(function_call_part, verbose=False,workspace_root="" ):
     args = dict(function_call_part.args)
     args["working_directory"] = working_directory
 
-    print(f"Calling funtion: {function_call_part.name}(args_dict:{args})")
+    # Live stdout/stderr of script runs, for callers that stream progress
+    if on_output is not None and function_name == "run_python_file":
+        args["on_output"] = on_output
+    # Queue position for the shared execution scheduler
+    if priority is not None and function_name == "run_python_file":
+        args["priority"] = priority
+
+    # Writes reserve their growth against the workspace's disk quota and are counted toward its size
+    quota_error = None
+    is_write = function_name in FILE_WRITE_FUNCTIONS and bool(args.get("file_path"))
+    if is_write:
+        old_size = _file_size(working_directory, args["file_path"])
+        quota_error, reserved = workspace_registry.reserve_write(working_directory, _write_growth(function_name, args, old_size))
+
+    if quota_error:
+        function_result = quota_error
+    else:
+        try:
+            cache_key, function_result = tool_cache.lookup(working_directory, function_name, function_call_part.args)
+            if function_result is None:
+                function_result = function_map[function_name](**args)
+                tool_cache.store(cache_key, function_result)
+        finally:
+            if is_write:
+                workspace_registry.record_write(working_directory, old_size, _file_size(working_directory, args["file_path"]), reserved)
 
-    function_result = function_map[function_name](**args)
+        # Keep the workspace file/search indexes and tool cache in step with the agent's own writes
+        if is_write:
+            notify_changed(working_directory, args["file_path"])
+            search_index.notify_changed(working_directory, args["file_path"])
+            symbol_index.notify_changed(working_directory, args["file_path"])
+            tool_cache.invalidate_path(working_directory, args["file_path"])
+        elif function_name == "run_python_file":
+            tool_cache.invalidate_listings(working_directory)
+            notify_tree_changed(working_directory)
+            workspace_registry.mark_stale(working_directory)
 
     return types.Content(
         role='tool',
@@ -0,0 +1,198 @@
+import os
+import time
+import shutil
+import hashlib
+import tempfile
+import threading
+import subprocess
+
+from config import CLONE_CACHE_DIR, CLONE_CACHE_MAX_BYTES, CLONE_CACHE_FETCH_INTERVAL, CLONE_TIMEOUT
+from file_ops import tree_bytes
+
+
+def _git(args, cwd=None):
+    return subprocess.run(["git", *args], cwd=cwd, check=True, capture_output=True, text=True, timeout=CLONE_TIMEOUT)
+
+
+class _Mirror:
+    __slots__ = ("path", "lock", "size", "last_used", "last_fetch")
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.size = 0
+        self.last_used = 0.0
+        self.last_fetch = 0.0
+
+
+class CloneCache:
+    """Bare mirrors of cloned repos, so repeat clones don't go back over the network.
+
+    A clone first brings the repo's mirror up to date (a full fetch the
+    first time, git fetch --prune at most every CLONE_CACHE_FETCH_INTERVAL
+    seconds after that), then makes the workspace with a local clone from it.
+    Mirrors hold branches and tags only (no refs/pull/* or other hosting refs).
+    Local clones hardlink the object files when the mirror is on the same
+    filesystem (and copy them otherwise), so they are fast and take little
+    extra disk, and the workspace stays valid if its mirror is later evicted.
+    Mirrors are evicted least recently used first once they pass max_bytes. If
+    the mirror can't be created or fetched, the clone falls back to a direct
+    shallow clone, as without the cache; a branch the repo doesn't have fails
+    straight away.
+    """
+
+    def __init__(self, root=CLONE_CACHE_DIR, max_bytes=CLONE_CACHE_MAX_BYTES, fetch_interval=CLONE_CACHE_FETCH_INTERVAL):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.fetch_interval = fetch_interval
+        self._lock = threading.Lock()
+        self._mirrors = {}  # mirror path -> _Mirror
+        self.hits = self.misses = self.evictions = self.fallbacks = 0
+
+    def start(self):
+        """Create the cache directory, picking up mirrors left by a previous process.
+
+        On failure (e.g. no permission) the cache is disabled and clones go direct.
+        """
+        if self.max_bytes <= 0:
+            return
+        try:
+            os.makedirs(self.root, exist_ok=True)
+            self._load()
+        except OSError as e:
+            print(f"Clone cache disabled: {e}")
+            self.max_bytes = 0
+
+    def _load(self):
+        """Pick up mirrors left by a previous process and drop its unfinished ones."""
+        for name in os.listdir(self.root):
+            path = os.path.join(self.root, name)
+            if name.startswith(".tmp-"):
+                shutil.rmtree(path, ignore_errors=True)
+            elif name.endswith(".git") and os.path.isdir(path):
+                mirror = self._mirrors[path] = _Mirror(path)
+                mirror.size = tree_bytes(path)
+                mirror.last_used = os.stat(path).st_mtime
+
+    def _mirror_for(self, repo_url):
+        key = hashlib.sha256(repo_url.encode()).hexdigest()[:24]
+        path = os.path.join(self.root, key + ".git")
+        with self._lock:
+            mirror = self._mirrors.get(path)
+            if mirror is None:
+                mirror = self._mirrors[path] = _Mirror(path)
+            return mirror
+
+    def _update(self, mirror, repo_url, force=False):
+        """Create or fetch the mirror as due; returns whether it was fetched just now."""
+        if os.path.isdir(mirror.path):
+            if not force:
+                with self._lock:
+                    self.hits += 1
+            if force or time.monotonic() - mirror.last_fetch >= self.fetch_interval:
+                _git(["fetch", "--prune", "--quiet", "origin"], cwd=mirror.path)
+                mirror.last_fetch = time.monotonic()
+                mirror.size = tree_bytes(mirror.path)
+                return True
+            return False
+        else:
+            with self._lock:
+                self.misses += 1
+            tmp = tempfile.mkdtemp(dir=self.root, prefix=".tmp-")
+            try:
+                # Like clone --mirror, but only branches and tags: hosts' refs/pull/* etc. can be huge
+                path = os.path.join(tmp, "m.git")
+                _git(["init", "--bare", "--quiet", path])
+                _git(["config", "remote.origin.url", repo_url], cwd=path)
+                _git(["config", "remote.origin.fetch", "+refs/heads/*:refs/heads/*"], cwd=path)
+                _git(["config", "--add", "remote.origin.fetch", "+refs/tags/*:refs/tags/*"], cwd=path)
+                _git(["fetch", "--prune", "--quiet", "origin"], cwd=path)
+                os.rename(path, mirror.path)
+            finally:
+                shutil.rmtree(tmp, ignore_errors=True)
+            mirror.last_fetch = time.monotonic()
+            mirror.size = tree_bytes(mirror.path)
+            return True
+
+    def clone(self, repo_url, branch, dest):
+        """Clone repo_url at branch into dest; raises CalledProcessError or TimeoutExpired.
+
+        A branch the repo doesn't have fails from the mirror like it would from the
+        remote; only failing to create or fetch the mirror falls back to a direct clone.
+        """
+        if self.max_bytes <= 0 or not self._clone_from_mirror(repo_url, branch, dest):
+            _git(["clone", "--depth", "1", "--branch", branch, repo_url, dest])
+
+    def _clone_from_mirror(self, repo_url, branch, dest):
+        """Clone from the repo's mirror; False if the mirror couldn't be brought up to date."""
+        mirror = self._mirror_for(repo_url)
+        with mirror.lock:
+            try:
+                fetched = self._update(mirror, repo_url)
+                # A branch pushed since the last fetch isn't in the mirror yet
+                if not fetched and not self._has_ref(mirror, branch):
+                    self._update(mirror, repo_url, force=True)
+            except (subprocess.CalledProcessError, subprocess.TimeoutExpired, OSError) as e:
+                print(f"Clone cache failed for {repo_url}, cloning directly: {e}")
+                with self._lock:
+                    self.fallbacks += 1
+                return False
+            # A plain path (not --local) so git copies instead of failing if it can't hardlink.
+            # A missing branch fails here, as it would from the remote, without a second clone
+            _git(["clone", "--quiet", "--branch", branch, mirror.path, dest])
+            mirror.last_used = time.time()
+            os.utime(mirror.path)
+        # Pushes and status should talk to the real remote, not the cache
+        _git(["remote", "set-url", "origin", repo_url], cwd=dest)
+        self._evict()
+        return True
+
+    @staticmethod
+    def _has_ref(mirror, branch):
+        for ref in ("refs/heads/" + branch, "refs/tags/" + branch):
+            result = subprocess.run(
+                ["git", "show-ref", "--verify", "--quiet", ref], cwd=mirror.path, timeout=CLONE_TIMEOUT,
+            )
+            if result.returncode == 0:
+                return True
+        return False
+
+    def _evict(self):
+        evicted = []
+        with self._lock:
+            mirrors = sorted((m for m in self._mirrors.values() if m.size), key=lambda m: m.last_used)
+            total = sum(m.size for m in mirrors)
+            # The most recently used mirror is kept even if it alone is over budget
+            for mirror in mirrors[:-1]:
+                if total <= self.max_bytes:
+                    break
+                # Mirrors in use right now are skipped; they'll be reconsidered next time
+                if not mirror.lock.acquire(blocking=False):
+                    continue
+                try:
+                    # Moved aside here and deleted below, so clones don't wait on the delete. The
+                    # entry stays so its lock keeps serializing clones of this URL
+                    aside = tempfile.mkdtemp(dir=self.root, prefix=".tmp-")
+                    evicted.append(aside)
+                    os.rename(mirror.path, os.path.join(aside, "m.git"))
+                    total -= mirror.size
+                    mirror.size = 0
+                    self.evictions += 1
+                except OSError as e:
+                    print(f"Clone cache eviction of {mirror.path} failed: {e}")
+                finally:
+                    mirror.lock.release()
+        for path in evicted:
+            shutil.rmtree(path, ignore_errors=True)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "mirrors": sum(1 for m in self._mirrors.values() if m.size),
+                "bytes": sum(m.size for m in self._mirrors.values()),
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "fallbacks": self.fallbacks,
+            }
@@ -1,3 +1,10 @@
+import os
+
+from dotenv import load_dotenv
+
+# Before any os.getenv below, so every setting can come from .env
+load_dotenv()
+
 MAX_CHARS = 30000
 
 WORKING_DIRECTORY = "calculator"
@@ -12,6 +19,8 @@ When a user asks a question or makes a request, make a function call plan. You c
 - Write to a file (create or overwrite the file and its parent directories if they don't exist) - USE ONLY FOR NEW FILES
 - Edit existing files (make targeted changes without rewriting the entire file) - USE FOR EXISTING FILES
 - Run a Python file (with the python3 interpreter, accepts additional CLI Args as an array of strings)
+- Search the code for a string or regex (search_code) - prefer this over reading files one by one to find something
+- Find where a Python symbol is defined or used (find_definition, find_references)
 
 IMPORTANT FILE EDITING RULES:
 - For NEW files: use write_file_content
@@ -24,4 +33,126 @@ All paths you provide should be relative to the working directory. You do not ne
 
 max_iterations = 25
 
-LOCAL_MODE = False
\ No newline at end of file
+LOCAL_MODE = False
+
+# Directories skipped by workspace listings, the file index and ZIP export
+IGNORE_DIRS = {".git", "node_modules", ".venv", "__pycache__"}
+# Workspace indexes follow the agent's own writes path by path and rescan the whole tree only
+# after a script run or, as a backstop for anything else, once this many seconds have passed
+INDEX_RESCAN_INTERVAL = float(os.getenv("INDEX_RESCAN_INTERVAL", 60))
+
+# Workspace upload limits (ZIP archives are spooled to disk and extracted in chunks)
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+UPLOAD_MAX_BYTES = int(os.getenv("UPLOAD_MAX_BYTES", 512 * 1024 * 1024))
+UPLOAD_MAX_UNCOMPRESSED_BYTES = int(os.getenv("UPLOAD_MAX_UNCOMPRESSED_BYTES", 2 * 1024 * 1024 * 1024))
+UPLOAD_MAX_MEMBERS = int(os.getenv("UPLOAD_MAX_MEMBERS", 100_000))
+UPLOAD_EXTRACT_WORKERS = int(os.getenv("UPLOAD_EXTRACT_WORKERS", 4))  # 1 disables parallel extraction
+
+# Workspace download (ZIP export is streamed; memory stays at roughly one chunk)
+DOWNLOAD_CHUNK_SIZE = 256 * 1024
+DOWNLOAD_DEFAULT_COMPRESSLEVEL = int(os.getenv("DOWNLOAD_COMPRESSLEVEL", 6))
+
+# Agent run concurrency: excess /v1/run requests queue until a slot frees up
+MAX_CONCURRENT_RUNS = int(os.getenv("MAX_CONCURRENT_RUNS", 64))
+MAX_RUNS_PER_WORKSPACE = int(os.getenv("MAX_RUNS_PER_WORKSPACE", 1))
+RUN_QUEUE_TIMEOUT = float(os.getenv("RUN_QUEUE_TIMEOUT", 300))  # seconds before a queued run gets 503
+TOOL_WORKERS = int(os.getenv("TOOL_WORKERS", 32))
+TOOL_CALL_PARALLELISM = int(os.getenv("TOOL_CALL_PARALLELISM", 8))  # concurrent tool calls within one model turn
+STREAM_RESULT_PREVIEW_CHARS = 500  # tool output preview size in streamed run events
+STREAM_TOOL_OUTPUT_MAX_CHARS = 64 * 1024  # live script output streamed per tool call
+
+# Shared Gemini client connection pool
+GEMINI_MAX_CONNECTIONS = int(os.getenv("GEMINI_MAX_CONNECTIONS", 200))
+GEMINI_MAX_KEEPALIVE = int(os.getenv("GEMINI_MAX_KEEPALIVE", 50))
+GEMINI_KEEPALIVE_EXPIRY = 60.0
+
+# Memoized results of read-only tools (get_file_content, get_files_info); 0 disables
+TOOL_CACHE_MAX_BYTES = int(os.getenv("TOOL_CACHE_MAX_BYTES", 64 * 1024 * 1024))
+
+# Agent context compaction: once the estimated history passes the budget, old tool
+# outputs are replaced with short stubs (the latest turns are always kept intact)
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", 32000))
+CONTEXT_KEEP_RECENT_TOOL_TURNS = 2
+CONTEXT_COMPACT_MIN_CHARS = 1000
+
+# Warm interpreter pool for run_python_file: one pre-started fork server per
+# workspace (LRU, INTERPRETER_POOL_SIZE of them; 0 disables and always cold-starts)
+INTERPRETER_POOL_SIZE = int(os.getenv("INTERPRETER_POOL_SIZE", 8))
+INTERPRETER_MAX_JOBS = 200  # replace a fork server after this many runs
+# Modules every fork server imports up front; nothing else is preloaded (scripts never choose)
+INTERPRETER_PRELOAD = [
+    "json", "re", "math", "collections", "itertools", "functools", "typing",
+    "dataclasses", "pathlib", "datetime", "decimal", "argparse", "logging",
+    "unittest", "subprocess", "random", "string", "csv",
+]
+
+# run_python_file output capture: the first/last bytes of each stream are kept and the
+# process is killed once combined output passes RUN_OUTPUT_KILL_BYTES
+RUN_OUTPUT_HEAD_BYTES = int(os.getenv("RUN_OUTPUT_HEAD_BYTES", 8 * 1024))
+RUN_OUTPUT_TAIL_BYTES = int(os.getenv("RUN_OUTPUT_TAIL_BYTES", 8 * 1024))
+RUN_OUTPUT_KILL_BYTES = int(os.getenv("RUN_OUTPUT_KILL_BYTES", 16 * 1024 * 1024))
+
+# Execution scheduler: every run_python_file job, from any workspace, takes one of
+# EXEC_SLOTS slots; waiting jobs are served by priority, then workspace fairness
+EXEC_SLOTS = int(os.getenv("EXEC_SLOTS", os.cpu_count() or 4))
+EXEC_MAX_QUEUED = int(os.getenv("EXEC_MAX_QUEUED", 256))
+EXEC_QUEUE_TIMEOUT = float(os.getenv("EXEC_QUEUE_TIMEOUT", 120))
+EXEC_PRIORITY_DEFAULT = 10  # lower runs first; /v1/run can pass its own, clamped to the range below
+EXEC_PRIORITY_MIN = int(os.getenv("EXEC_PRIORITY_MIN", 0))
+EXEC_PRIORITY_MAX = int(os.getenv("EXEC_PRIORITY_MAX", 20))
+# Per-job resource limits (0 disables)
+RUN_CPU_SECONDS = int(os.getenv("RUN_CPU_SECONDS", 30))
+RUN_MEMORY_BYTES = int(os.getenv("RUN_MEMORY_BYTES", 1024 * 1024 * 1024))
+
+# edit_file_content streams files at least this big through mmap instead of loading them
+EDIT_STREAM_MIN_BYTES = int(os.getenv("EDIT_STREAM_MIN_BYTES", 8 * 1024 * 1024))
+
+# get_file_content line ranges: per-file index of every LINE_INDEX_STRIDE-th line offset
+LINE_INDEX_STRIDE = 256
+LINE_INDEX_MAX_FILES = int(os.getenv("LINE_INDEX_MAX_FILES", 512))
+
+# search_code: trigram index per workspace; bigger files are not searched
+SEARCH_MAX_FILE_BYTES = int(os.getenv("SEARCH_MAX_FILE_BYTES", 2 * 1024 * 1024))
+SEARCH_MAX_RESULTS = 200
+SEARCH_LINE_PREVIEW_CHARS = 200
+
+# find_definition / find_references: AST symbol index of each workspace's Python files
+SYMBOL_MAX_FILE_BYTES = int(os.getenv("SYMBOL_MAX_FILE_BYTES", 2 * 1024 * 1024))
+SYMBOL_MAX_RESULTS = 100
+
+# get_files_info limits (recursive listings default to LIST_MAX_DEPTH levels)
+LIST_MAX_DEPTH = 8
+LIST_MAX_ENTRIES = int(os.getenv("LIST_MAX_ENTRIES", 1000))
+
+# Cached git status per workspace; entries are also dropped when .git/index, HEAD or the tree change
+GIT_STATUS_CACHE_TTL = float(os.getenv("GIT_STATUS_CACHE_TTL", 30))
+
+# Server state that isn't a workspace, created at startup: outside WORKSPACES_BASE so it can't be
+# addressed as one, and in the user's cache directory by default so any user can run the server.
+# Put CLONE_CACHE_DIR on the workspaces' filesystem to let clones hardlink from the mirrors
+SERVER_STATE_DIR = os.getenv(
+    "SERVER_STATE_DIR", os.path.join(os.getenv("XDG_CACHE_HOME") or os.path.expanduser("~/.cache"), "aiagents")
+)
+CLONE_CACHE_DIR = os.getenv("CLONE_CACHE_DIR", os.path.join(SERVER_STATE_DIR, "mirrors"))
+WORKSPACE_REGISTRY_PATH = os.getenv("WORKSPACE_REGISTRY_PATH", os.path.join(SERVER_STATE_DIR, "workspace-registry.json"))
+
+# Clone cache: bare mirrors of cloned repos (in CLONE_CACHE_DIR) that new workspaces are
+# cloned from locally; least recently used mirrors go first; 0 disables
+CLONE_CACHE_MAX_BYTES = int(os.getenv("CLONE_CACHE_MAX_BYTES", 2 * 1024 * 1024 * 1024))
+CLONE_CACHE_FETCH_INTERVAL = float(os.getenv("CLONE_CACHE_FETCH_INTERVAL", 30))  # seconds between fetches of a mirror
+CLONE_TIMEOUT = int(os.getenv("CLONE_TIMEOUT", 600))  # per git command; a first mirror fetch gets full history
+
+# Workspace lifecycle (workspace_registry.py): a sweeper deletes workspaces idle for WORKSPACE_TTL
+# seconds, then least recently used ones while the total passes WORKSPACE_MAX_TOTAL_BYTES;
+# agent writes are refused past WORKSPACE_QUOTA_BYTES per workspace. 0 disables each limit
+WORKSPACE_TTL = float(os.getenv("WORKSPACE_TTL", 24 * 60 * 60))
+WORKSPACE_MAX_TOTAL_BYTES = int(os.getenv("WORKSPACE_MAX_TOTAL_BYTES", 8 * 1024 * 1024 * 1024))
+WORKSPACE_QUOTA_BYTES = int(os.getenv("WORKSPACE_QUOTA_BYTES", 1024 * 1024 * 1024))
+WORKSPACE_SWEEP_INTERVAL = float(os.getenv("WORKSPACE_SWEEP_INTERVAL", 60))
+
+# Optional content-addressed store (blob_store.py) that uploaded and cloned files are hardlinked
+# into, so identical files across workspaces are stored once. Set BLOB_STORE_DIR to enable; it must
+# be on the same filesystem as WORKSPACES_BASE and outside it
+BLOB_STORE_DIR = os.getenv("BLOB_STORE_DIR", "")
+BLOB_MIN_BYTES = int(os.getenv("BLOB_MIN_BYTES", 1))  # smaller files stay private
+BLOB_COLLECT_INTERVAL = float(os.getenv("BLOB_COLLECT_INTERVAL", 600))  # seconds between scans for unused blobs
@@ -0,0 +1,100 @@
+import os
+
+from google.genai import types
+
+from config import CONTEXT_TOKEN_BUDGET, CONTEXT_KEEP_RECENT_TOOL_TURNS, CONTEXT_COMPACT_MIN_CHARS
+
+# Rough chars-per-token ratio for code and English; only used to decide when to compact
+CHARS_PER_TOKEN = 4
+STUB_PREVIEW_CHARS = 200
+
+
+def _part_chars(part):
+    if part.text:
+        return len(part.text)
+    if part.function_response is not None:
+        return len(str(part.function_response.response or ""))
+    if part.function_call is not None:
+        return len(str(part.function_call.args or "")) + len(part.function_call.name or "")
+    return 0
+
+
+class ContextManager:
+    """Tracks the estimated token size of an agent's message list and compacts it.
+
+    Once the history passes the budget, large tool responses outside the most
+    recent turns are replaced with short stubs, starting with file reads that a
+    later read or write of the same file made stale, then oldest first.
+    """
+
+    def __init__(self, messages, budget=CONTEXT_TOKEN_BUDGET, keep_recent=CONTEXT_KEEP_RECENT_TOOL_TURNS):
+        self.messages = messages
+        self.budget = budget
+        self.keep_recent = keep_recent
+        self.tokens_saved = 0
+        self._chars = {}  # id(content) -> chars, valid while the content is in messages
+
+    def _content_chars(self, content):
+        key = id(content)
+        if key not in self._chars:
+            self._chars[key] = sum(_part_chars(p) for p in content.parts or [])
+        return self._chars[key]
+
+    def estimate_tokens(self):
+        return sum(self._content_chars(m) for m in self.messages) // CHARS_PER_TOKEN
+
+    def _candidates(self):
+        """(stale, index, part_index, call) for each compactable tool response, oldest first."""
+        tool_turns = [i for i, m in enumerate(self.messages) if m.role == "tool"]
+        protected = set(tool_turns[-self.keep_recent:]) if self.keep_recent else set()
+        found = []
+        touched_later = set()
+        # Walk newest to oldest so we know whether a file is read or written again later
+        for i in reversed(tool_turns):
+            prev = self.messages[i - 1] if i > 0 else None
+            calls = [p.function_call for p in (prev.parts or []) if p.function_call] if prev else []
+            parts = self.messages[i].parts or []
+            for j in reversed(range(len(parts))):
+                call = calls[j] if j < len(calls) else None
+                path = None
+                if call is not None and call.args and call.args.get("file_path"):
+                    path = os.path.normpath(call.args["file_path"])
+                if i not in protected and _part_chars(parts[j]) >= CONTEXT_COMPACT_MIN_CHARS:
+                    stale = call is not None and call.name == "get_file_content" and path in touched_later
+                    found.append((not stale, i, j, call))
+                if path is not None:
+                    touched_later.add(path)
+        found.sort(key=lambda c: (c[0], c[1], c[2]))
+        return found
+
+    def _stub(self, part, call):
+        response = part.function_response.response or {}
+        original = str(response.get("result", response))
+        what = part.function_response.name
+        if call is not None and call.args:
+            args = ", ".join(f"{k}={v!r}" for k, v in call.args.items() if k != "content")
+            what = f"{what}({args})"
+        preview = original[:STUB_PREVIEW_CHARS].rstrip()
+        return types.Part.from_function_response(
+            name=part.function_response.name,
+            response={"result": f"[Compacted: output of {what} was {len(original)} chars; call the tool again if you need it]\n{preview}..."},
+        )
+
+    def compact(self):
+        """Compact until under budget; returns the estimated tokens saved by this call."""
+        total = self.estimate_tokens()
+        if total <= self.budget:
+            return 0
+        saved = 0
+        for _, i, j, call in self._candidates():
+            content = self.messages[i]
+            before = self._content_chars(content)
+            content.parts[j] = self._stub(content.parts[j], call)
+            self._chars.pop(id(content), None)
+            delta = (before - self._content_chars(content)) // CHARS_PER_TOKEN
+            saved += delta
+            total -= delta
+            if total <= self.budget:
+                break
+        self.tokens_saved += saved
+        return saved
@@ -0,0 +1,165 @@
+import time
+import heapq
+import itertools
+import threading
+from contextlib import contextmanager
+
+from config import (
+    EXEC_SLOTS, EXEC_MAX_QUEUED, EXEC_QUEUE_TIMEOUT, EXEC_PRIORITY_DEFAULT, RUN_CPU_SECONDS, RUN_MEMORY_BYTES,
+    WORKSPACE_QUOTA_BYTES,
+)
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
+
+
+def job_limits():
+    """Resource limits for one job, as sent to the warm interpreter's fork server."""
+    # No single file a script writes may be bigger than the whole workspace quota
+    return {"cpu": RUN_CPU_SECONDS, "memory": RUN_MEMORY_BYTES, "fsize": WORKSPACE_QUOTA_BYTES}
+
+
+def apply_limits(limits, pid=0):
+    """Set a job's rlimits on process pid, or on this process (a freshly forked child) if 0."""
+    if resource is None or (pid and not hasattr(resource, "prlimit")):
+        return
+
+    def set_limit(which, value):
+        if pid:
+            resource.prlimit(pid, which, value)
+        else:
+            resource.setrlimit(which, value)
+
+    if limits.get("cpu"):
+        set_limit(resource.RLIMIT_CPU, (limits["cpu"], limits["cpu"] + 1))
+    if limits.get("memory"):
+        set_limit(resource.RLIMIT_AS, (limits["memory"], limits["memory"]))
+    if limits.get("fsize"):
+        set_limit(resource.RLIMIT_FSIZE, (limits["fsize"], limits["fsize"]))
+
+
+class _Ticket:
+    __slots__ = ("workspace", "priority", "seq", "enqueued", "granted")
+
+    def __init__(self, workspace, priority, seq):
+        self.workspace = workspace
+        self.priority = priority
+        self.seq = seq
+        self.enqueued = time.monotonic()
+        self.granted = False
+
+
+class ExecutionScheduler:
+    """Global slot pool for script executions, shared by every workspace and run.
+
+    Waiting jobs are kept in one priority heap per workspace. When a slot frees up it
+    goes to the best head job, comparing (priority, jobs the workspace is already
+    running, when the workspace was last served, arrival order): lower priority
+    numbers go first and, within a priority, workspaces take turns so a busy one
+    can't starve the others.
+    """
+
+    def __init__(self, slots, max_queued, queue_timeout):
+        self.slots = max(1, slots)
+        self.max_queued = max_queued
+        self.queue_timeout = queue_timeout
+        self._cond = threading.Condition()
+        self._seq = itertools.count()
+        self._waiting = {}  # workspace -> heap of (priority, seq, ticket)
+        self._running = {}  # workspace -> jobs holding a slot
+        self._last_grant = {}  # workspace -> grant counter when it last got a slot
+        self._grants = itertools.count()
+        self.active = 0
+        self.queued = 0
+        self.completed = self.rejected = self.timed_out = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+
+    def _grant(self):
+        while self.active < self.slots and self._waiting:
+            workspace = min(
+                self._waiting,
+                key=lambda ws: (
+                    self._waiting[ws][0][0],
+                    self._running.get(ws, 0),
+                    self._last_grant.get(ws, -1),
+                    self._waiting[ws][0][1],
+                ),
+            )
+            heap = self._waiting[workspace]
+            _, _, ticket = heapq.heappop(heap)
+            if not heap:
+                del self._waiting[workspace]
+            ticket.granted = True
+            self.queued -= 1
+            self.active += 1
+            self._running[workspace] = self._running.get(workspace, 0) + 1
+            self._last_grant[workspace] = next(self._grants)
+            waited = time.monotonic() - ticket.enqueued
+            self._wait_total += waited
+            self._wait_max = max(self._wait_max, waited)
+        self._cond.notify_all()
+
+    def _withdraw(self, ticket):
+        heap = self._waiting.get(ticket.workspace)
+        if heap is None:
+            return
+        heap[:] = [entry for entry in heap if entry[2] is not ticket]
+        heapq.heapify(heap)
+        if not heap:
+            del self._waiting[ticket.workspace]
+        self.queued -= 1
+
+    @contextmanager
+    def slot(self, workspace, priority=EXEC_PRIORITY_DEFAULT):
+        """Hold one execution slot; raises TimeoutError if the queue is full or the wait runs out."""
+        with self._cond:
+            if self.queued >= self.max_queued:
+                self.rejected += 1
+                raise TimeoutError("execution queue is full")
+            ticket = _Ticket(workspace, priority, next(self._seq))
+            heapq.heappush(self._waiting.setdefault(workspace, []), (priority, ticket.seq, ticket))
+            self.queued += 1
+            self._grant()
+            deadline = ticket.enqueued + self.queue_timeout
+            while not ticket.granted:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._withdraw(ticket)
+                    self.timed_out += 1
+                    raise TimeoutError("timed out waiting for an execution slot")
+                self._cond.wait(remaining)
+        try:
+            yield
+        finally:
+            with self._cond:
+                self.active -= 1
+                self.completed += 1
+                left = self._running[workspace] - 1
+                if left:
+                    self._running[workspace] = left
+                else:
+                    del self._running[workspace]
+                    if workspace not in self._waiting:
+                        self._last_grant.pop(workspace, None)
+                self._grant()
+
+    def stats(self):
+        with self._cond:
+            granted = self.completed + self.active
+            return {
+                "slots": self.slots,
+                "active": self.active,
+                "queued": self.queued,
+                "queued_workspaces": len(self._waiting),
+                "completed": self.completed,
+                "rejected": self.rejected,
+                "timed_out": self.timed_out,
+                "avg_wait_seconds": round(self._wait_total / granted, 4) if granted else 0.0,
+                "max_wait_seconds": round(self._wait_max, 4),
+            }
+
+
+execution_scheduler = ExecutionScheduler(EXEC_SLOTS, EXEC_MAX_QUEUED, EXEC_QUEUE_TIMEOUT)
@@ -0,0 +1,107 @@
+import os
+import mmap
+import tempfile
+from collections import Counter
+
+COPY_CHUNK_SIZE = 1024 * 1024
+
+
+def atomic_write_text(path, content, encoding="utf-8"):
+    """Write content to path via a temp file in the same directory and os.replace.
+
+    Readers see either the old file or the new one, never a partial write, and an
+    existing file keeps its permission bits.
+    """
+    tmp_path = new_temp_path(path)
+    try:
+        with open(tmp_path, "w", encoding=encoding) as f:
+            f.write(content)
+        replace_keeping_mode(tmp_path, path)
+    except BaseException:
+        discard(tmp_path)
+        raise
+
+
+def replace_keeping_mode(tmp_path, path):
+    """os.replace tmp_path over path, carrying over path's permission bits if it exists."""
+    try:
+        os.chmod(tmp_path, os.stat(path).st_mode & 0o7777)
+    except FileNotFoundError:
+        pass
+    os.replace(tmp_path, path)
+
+
+def tree_bytes(path):
+    """Total apparent size of the files under path, not following symlinks."""
+    total = 0
+    for dirpath, _, filenames in os.walk(path):
+        for name in filenames:
+            try:
+                total += os.lstat(os.path.join(dirpath, name)).st_size
+            except OSError:
+                pass
+    return total
+
+
+def discard(path):
+    try:
+        os.unlink(path)
+    except OSError:
+        pass
+
+
+def count_changed_lines(old, new):
+    """Return (added, removed) line counts between two texts in linear time.
+
+    The common leading and trailing lines are skipped; the rest is compared as
+    multisets of lines, which is exact for in-place edits and close for moves.
+    """
+    old_lines = old.split("\n")
+    new_lines = new.split("\n")
+    start = 0
+    limit = min(len(old_lines), len(new_lines))
+    while start < limit and old_lines[start] == new_lines[start]:
+        start += 1
+    end = 0
+    while end < limit - start and old_lines[-1 - end] == new_lines[-1 - end]:
+        end += 1
+    old_mid = Counter(old_lines[start:len(old_lines) - end])
+    new_mid = Counter(new_lines[start:len(new_lines) - end])
+    return sum((new_mid - old_mid).values()), sum((old_mid - new_mid).values())
+
+
+def new_temp_path(path):
+    """Create an empty temp file next to path (same filesystem, so os.replace is atomic)."""
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path) or ".", prefix=".tmp-", suffix=os.path.basename(path)[-32:])
+    os.close(fd)
+    return tmp_path
+
+
+def rewrite_spans(src_path, dst_path, find_spans):
+    """Stream src_path to dst_path, replacing the spans find_spans(buffer) yields.
+
+    find_spans gets a read-only mmap of the source and yields (start, end,
+    replacement bytes) in increasing, non-overlapping order. Everything between
+    spans is copied in COPY_CHUNK_SIZE slices, so memory use does not depend on
+    file size. Returns the number of spans replaced.
+    """
+    count = 0
+    with open(src_path, "rb") as src, open(dst_path, "wb") as out:
+        if os.fstat(src.fileno()).st_size == 0:
+            return 0
+        with mmap.mmap(src.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+            pos = 0
+            for start, end, replacement in find_spans(buf):
+                _copy_range(buf, out, pos, start)
+                out.write(replacement)
+                pos = end
+                count += 1
+            _copy_range(buf, out, pos, len(buf))
+    return count
+
+
+def _copy_range(buf, out, start, end):
+    while start < end:
+        stop = min(end, start + COPY_CHUNK_SIZE)
+        out.write(buf[start:stop])
+        start = stop
@@ -1,7 +1,165 @@
 import os
 import re
 
-def edit_file_content(working_directory, file_path, search_pattern, replacement_text, mode="replace"):
+from config import EDIT_STREAM_MIN_BYTES
+from file_ops import atomic_write_text, count_changed_lines, new_temp_path, rewrite_spans, replace_keeping_mode, discard
+
+# Same heuristic git uses: a NUL byte near the start means binary
+BINARY_SNIFF_BYTES = 8000
+
+EDIT_MODES = ("replace", "regex", "insert_after", "insert_before")
+# In the streaming path, changed lines are diffed like the in-memory path when the lines
+# around a span are at most this long; longer spans just count their lines
+COUNT_LINES_MAX_BYTES = 64 * 1024
+
+
+def _apply_edit(content, search_pattern, replacement_text, mode):
+    """Apply one edit to content; returns (new_content, error message or None)."""
+    if not search_pattern:
+        return content, "search_pattern is required"
+    if replacement_text is None:
+        replacement_text = ""
+    mode = mode or "replace"
+
+    if mode == "replace":
+        if search_pattern not in content:
+            return content, f'Pattern "{search_pattern[:50]}..." not found in file'
+        return content.replace(search_pattern, replacement_text), None
+
+    elif mode == "regex":
+        try:
+            if not re.search(search_pattern, content):
+                return content, f'Regex pattern "{search_pattern}" not found in file'
+            return re.sub(search_pattern, replacement_text, content), None
+        except re.error as e:
+            return content, f'Invalid regex pattern "{search_pattern}": {e}'
+
+    elif mode == "insert_after":
+        if search_pattern not in content:
+            return content, f'Pattern "{search_pattern[:50]}..." not found in file'
+        return content.replace(search_pattern, search_pattern + replacement_text), None
+
+    elif mode == "insert_before":
+        if search_pattern not in content:
+            return content, f'Pattern "{search_pattern[:50]}..." not found in file'
+        return content.replace(search_pattern, replacement_text + search_pattern), None
+
+    return content, f'Invalid mode "{mode}". Use: {", ".join(EDIT_MODES)}'
+
+
+def _count_newlines(buf, start, end):
+    """Newlines in buf[start:end], without copying the range out of the mmap."""
+    count = 0
+    pos = buf.find(b"\n", start, end)
+    while pos != -1:
+        count += 1
+        pos = buf.find(b"\n", pos + 1, end)
+    return count
+
+
+def _count_span(buf, start, end, new, stats):
+    """Add the lines replacing buf[start:end] with new adds and removes to stats."""
+    if end - start != len(new) or buf[start:end] != new:
+        stats["changed"] = True
+    line_start = buf.rfind(b"\n", 0, start) + 1
+    line_end = buf.find(b"\n", end)
+    if line_end == -1:
+        line_end = len(buf)
+    if line_end - line_start <= COUNT_LINES_MAX_BYTES:
+        # The whole lines around the span, as count_changed_lines sees them for small files
+        old = buf[line_start:line_end]
+        updated = buf[line_start:start] + new + buf[end:line_end]
+        added, removed = count_changed_lines(old.decode("utf-8", "replace"), updated.decode("utf-8", "replace"))
+    else:
+        added, removed = new.count(b"\n") + 1, _count_newlines(buf, start, end) + 1
+    stats["added"] += added
+    stats["removed"] += removed
+
+
+def _span_finder(search_pattern, replacement_text, mode, stats):
+    """find_spans callback for rewrite_spans, matching one edit against the file bytes."""
+    pattern = search_pattern.encode("utf-8")
+    replacement = (replacement_text or "").encode("utf-8")
+
+    def find_regex(buf):
+        for match in re.finditer(pattern, buf):
+            # Only spans and the expanded replacement are used; the match itself is never copied
+            new = match.expand(replacement)
+            _count_span(buf, match.start(), match.end(), new, stats)
+            yield match.start(), match.end(), new
+
+    def find_literal(buf):
+        if mode == "insert_after":
+            new = pattern + replacement
+        elif mode == "insert_before":
+            new = replacement + pattern
+        else:
+            new = replacement
+        pos = buf.find(pattern)
+        while pos != -1:
+            _count_span(buf, pos, pos + len(pattern), new, stats)
+            yield pos, pos + len(pattern), new
+            pos = buf.find(pattern, pos + len(pattern))
+
+    return find_regex if mode == "regex" else find_literal
+
+
+def _edit_large_file(abs_file_path, file_path, edits, batch):
+    """Apply edits to a file too big to hold in memory.
+
+    Each edit streams the previous version through an mmap into a new temp file
+    next to the target, and only the last one replaces the original, so a missing
+    pattern still leaves the file untouched. Patterns are matched as UTF-8 bytes.
+    """
+    with open(abs_file_path, "rb") as f:
+        if b"\0" in f.read(BINARY_SNIFF_BYTES):
+            return f'Error: Cannot edit binary file "{file_path}"'
+
+    stats = {"added": 0, "removed": 0, "changed": False}
+    src = abs_file_path
+    try:
+        for n, edit in enumerate(edits, 1):
+            mode = edit.get("mode") or "replace"
+            search_pattern = edit.get("search_pattern")
+            error = None
+            if not search_pattern:
+                error = "search_pattern is required"
+            elif mode not in EDIT_MODES:
+                error = f'Invalid mode "{mode}". Use: {", ".join(EDIT_MODES)}'
+            else:
+                dst = new_temp_path(abs_file_path)
+                try:
+                    found = rewrite_spans(src, dst, _span_finder(search_pattern, edit.get("replacement_text"), mode, stats))
+                except re.error as e:
+                    found, error = None, f'Invalid regex pattern "{search_pattern}": {e}'
+                if src != abs_file_path:
+                    discard(src)
+                src = dst
+                if not found and error is None:
+                    error = f'Pattern "{search_pattern[:50]}..." not found in file'
+            if error:
+                if batch:
+                    return f'Error: Edit {n} of {len(edits)} failed, no changes written: {error}'
+                return f'Error: {error}'
+        if not stats["changed"]:
+            return f'Warning: No changes made to "{file_path}". Pattern may not have matched.'
+        replace_keeping_mode(src, abs_file_path)
+        src = abs_file_path
+    finally:
+        if src != abs_file_path:
+            discard(src)
+
+    return _success_message(file_path, edits, batch, stats["added"], stats["removed"])
+
+
+def _success_message(file_path, edits, batch, added, removed):
+    lines_changed = max(added, removed)
+    if batch:
+        return f'Success: Applied {len(edits)} edits to "{file_path}" - {lines_changed} lines modified (+{added}/-{removed})'
+    return f'Success: Edited "{file_path}" - {lines_changed} lines modified using {edits[0].get("mode") or "replace"} mode'
+
+
+def edit_file_content(working_directory, file_path, search_pattern=None, replacement_text=None, mode="replace", edits=None):
     """
     Edit specific parts of a file instead of rewriting the entire file.
     
@@ -11,6 +169,8 @@ def edit_file_content(working_directory, file_path, search_pattern, replacement_
         search_pattern: Pattern to find (can be regex if mode='regex')
         replacement_text: Text to replace with
         mode: 'replace' (exact match), 'regex' (regex pattern), 'insert_after', 'insert_before'
+        edits: Optional list of {search_pattern, replacement_text, mode} dicts, applied
+            in order as one transaction; if any pattern is missing nothing is written
     
     Returns:
         Success message or error
@@ -18,11 +178,18 @@ def edit_file_content(working_directory, file_path, search_pattern, replacement_
     if not file_path:
         return "Error: file_path is required"
     
-    if not search_pattern:
-        return "Error: search_pattern is required"
-    
-    if replacement_text is None:
-        replacement_text = ""
+    if edits is None:
+        if not search_pattern:
+            return "Error: search_pattern is required"
+        edits = [{"search_pattern": search_pattern, "replacement_text": replacement_text, "mode": mode}]
+        batch = False
+    else:
+        if not edits:
+            return "Error: edits must contain at least one edit"
+        for n, edit in enumerate(edits, 1):
+            if not isinstance(edit, dict):
+                return f'Error: edit {n} must be an object with search_pattern and replacement_text'
+        batch = True
     
     # Resolve paths securely
     abs_working_dir = os.path.realpath(working_directory)
@@ -37,48 +204,36 @@ def edit_file_content(working_directory, file_path, search_pattern, replacement_
         return f'Error: File "{file_path}" does not exist'
     
     try:
+        # Big files are edited as a stream instead of being read into memory
+        if os.path.getsize(abs_file_path) >= EDIT_STREAM_MIN_BYTES:
+            return _edit_large_file(abs_file_path, file_path, edits, batch)
+        
         # Read the file
         with open(abs_file_path, 'r', encoding='utf-8') as f:
             content = f.read()
         
         original_content = content
         
-        # Apply the edit based on mode
-        if mode == "replace":
-            if search_pattern not in content:
-                return f'Error: Pattern "{search_pattern[:50]}..." not found in file'
-            content = content.replace(search_pattern, replacement_text)
-            
-        elif mode == "regex":
-            if not re.search(search_pattern, content):
-                return f'Error: Regex pattern "{search_pattern}" not found in file'
-            content = re.sub(search_pattern, replacement_text, content)
-            
-        elif mode == "insert_after":
-            if search_pattern not in content:
-                return f'Error: Pattern "{search_pattern[:50]}..." not found in file'
-            content = content.replace(search_pattern, search_pattern + replacement_text)
-            
-        elif mode == "insert_before":
-            if search_pattern not in content:
-                return f'Error: Pattern "{search_pattern[:50]}..." not found in file'
-            content = content.replace(search_pattern, replacement_text + search_pattern)
-            
-        else:
-            return f'Error: Invalid mode "{mode}". Use: replace, regex, insert_after, insert_before'
+        # Apply every edit in memory first; the file is only written if all of them match
+        for n, edit in enumerate(edits, 1):
+            content, error = _apply_edit(
+                content, edit.get("search_pattern"), edit.get("replacement_text"), edit.get("mode")
+            )
+            if error:
+                if batch:
+                    return f'Error: Edit {n} of {len(edits)} failed, no changes written: {error}'
+                return f'Error: {error}'
         
         # Check if any changes were made
         if content == original_content:
             return f'Warning: No changes made to "{file_path}". Pattern may not have matched.'
         
-        # Write the modified content back
-        with open(abs_file_path, 'w', encoding='utf-8') as f:
-            f.write(content)
+        # Write the modified content back (temp file + rename, so it's all or nothing)
+        atomic_write_text(abs_file_path, content)
         
         # Count changes
-        lines_changed = len([line for line in content.split('\n') if line not in original_content.split('\n')])
-        
-        return f'Success: Edited "{file_path}" - {lines_changed} lines modified using {mode} mode'
+        added, removed = count_changed_lines(original_content, content)
+        return _success_message(file_path, edits, batch, added, removed)
         
     except UnicodeDecodeError:
         return f'Error: Cannot edit binary file "{file_path}"'
@@ -92,7 +247,7 @@ from google.genai import types
 
 schema_edit_file_content = types.FunctionDeclaration(
     name="edit_file_content",
-    description="Edit specific parts of a file without rewriting the entire file. Use this instead of write_file_content for existing files to avoid truncation.",
+    description="Edit specific parts of a file without rewriting the entire file. Use this instead of write_file_content for existing files to avoid truncation. Pass either search_pattern and replacement_text for one edit, or edits for several.",
     parameters=types.Schema(
         type=types.Type.OBJECT,
         properties={
@@ -112,7 +267,20 @@ schema_edit_file_content = types.FunctionDeclaration(
                 type=types.Type.STRING,
                 description="Edit mode: 'replace' (exact match), 'regex' (regex pattern), 'insert_after', 'insert_before'. Default: 'replace'",
             ),
+            "edits": types.Schema(
+                type=types.Type.ARRAY,
+                items=types.Schema(
+                    type=types.Type.OBJECT,
+                    properties={
+                        "search_pattern": types.Schema(type=types.Type.STRING),
+                        "replacement_text": types.Schema(type=types.Type.STRING),
+                        "mode": types.Schema(type=types.Type.STRING),
+                    },
+                    required=["search_pattern", "replacement_text"],
+                ),
+                description="Several edits to apply to the file in order, in one call. All must match or none are applied. Use instead of search_pattern/replacement_text/mode.",
+            ),
         },
-        required=["file_path", "search_pattern", "replacement_text"],
+        required=["file_path"],
     ),
 )
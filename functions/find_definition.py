@@ -0,0 +1,26 @@
+from google.genai import types
+from symbol_index import lookup
+
+
+def find_definition(working_directory, name, max_results=None):
+    return lookup(working_directory, name, max_results, "definitions")
+
+
+schema_find_definition = types.FunctionDeclaration(
+    name="find_definition",
+    description="Finds where a Python module, class, function, method or imported name is defined in the working directory. Returns path:line: [kind qualname] source for each definition.",
+    parameters=types.Schema(
+        type=types.Type.OBJECT,
+        properties={
+            "name": types.Schema(
+                type=types.Type.STRING,
+                description="The symbol name, optionally qualified to narrow it down, e.g. 'parse', 'Parser.parse' or 'pkg.module'.",
+            ),
+            "max_results": types.Schema(
+                type=types.Type.INTEGER,
+                description="Maximum number of definitions to return.",
+            ),
+        },
+        required=["name"],
+    ),
+)
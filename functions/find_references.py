@@ -0,0 +1,26 @@
+from google.genai import types
+from symbol_index import lookup
+
+
+def find_references(working_directory, name, max_results=None):
+    return lookup(working_directory, name, max_results, "references")
+
+
+schema_find_references = types.FunctionDeclaration(
+    name="find_references",
+    description="Finds call sites, imports and other uses of a Python name in the working directory, matched by name (not by type). Returns path:line: [kind] source for each use.",
+    parameters=types.Schema(
+        type=types.Type.OBJECT,
+        properties={
+            "name": types.Schema(
+                type=types.Type.STRING,
+                description="The name to look up, e.g. 'parse' or 'Parser.parse' (only the last part is matched).",
+            ),
+            "max_results": types.Schema(
+                type=types.Type.INTEGER,
+                description="Maximum number of references to return.",
+            ),
+        },
+        required=["name"],
+    ),
+)
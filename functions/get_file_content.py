@@ -1,9 +1,47 @@
 import os
 from config import MAX_CHARS
+from line_index import get_line_index
 from google.genai import types
  
 
-def get_file_content(working_directory, file_path):
+def _read_lines(f, start_line, end_line):
+    """Read lines start_line..end_line (1-based, inclusive) from binary f, up to MAX_CHARS bytes.
+
+    Returns (text, next_line): next_line is where to continue if the read stopped
+    at MAX_CHARS, else None. text is None if the file has fewer than start_line lines.
+    """
+    if not get_line_index(f, f.name).seek_line(f, start_line):
+        return None, None
+    out = bytearray()
+    line = start_line
+    while end_line is None or line <= end_line:
+        data = f.readline(MAX_CHARS - len(out) + 1)
+        if not data:
+            if line == start_line > 1:
+                return None, None
+            return out.decode("utf-8", errors="replace"), None
+        if len(out) + len(data) > MAX_CHARS:
+            if not out:
+                # A single line longer than the limit: return its start and move past it
+                return data[:MAX_CHARS].decode("utf-8", errors="replace"), line + 1
+            return out.decode("utf-8", errors="replace"), line
+        out += data
+        if data.endswith(b"\n"):
+            line += 1
+    return out.decode("utf-8", errors="replace"), None
+
+
+def _read_range(f, offset, limit):
+    """Read limit bytes from offset, moved forward off any UTF-8 continuation bytes."""
+    f.seek(offset)
+    data = f.read(limit)
+    skip = 0
+    while skip < min(3, len(data)) and 0x80 <= data[skip] < 0xC0:
+        skip += 1
+    return data[skip:].decode("utf-8", errors="replace")
+
+
+def get_file_content(working_directory, file_path, offset=None, limit=None, start_line=None, end_line=None):
     abs_working_dir = os.path.realpath(working_directory)
     abs_file_path = os.path.realpath(os.path.join(abs_working_dir, file_path))
     if not abs_file_path.startswith(abs_working_dir):
@@ -11,19 +49,46 @@ def get_file_content(working_directory, file_path):
     if not os.path.isfile(abs_file_path):
         return f'Error: File not found or is not a regular file: "{file_path}"'
     try:
+        if start_line is not None or end_line is not None:
+            start_line = int(start_line or 1)
+            end_line = int(end_line) if end_line is not None else None
+            if start_line < 1 or (end_line is not None and end_line < start_line):
+                return "Error: start_line must be >= 1 and end_line >= start_line"
+            with open(abs_file_path, "rb") as f:
+                content, next_line = _read_lines(f, start_line, end_line)
+            if content is None:
+                return f'Error: "{file_path}" has fewer than {start_line} lines'
+            if next_line is not None:
+                content += f'[...Output truncated at {MAX_CHARS} characters; continue with start_line={next_line}]'
+            return content
+
+        if offset is not None or limit is not None:
+            offset = int(offset or 0)
+            limit = min(int(limit), MAX_CHARS) if limit is not None else MAX_CHARS
+            if offset < 0 or limit < 1:
+                return "Error: offset must be >= 0 and limit >= 1"
+            with open(abs_file_path, "rb") as f:
+                size = os.fstat(f.fileno()).st_size
+                content = _read_range(f, offset, limit)
+            if offset + limit < size:
+                content += f'[...{size - offset - limit} more bytes; continue with offset={offset + limit}]'
+            return content
+
         with open(abs_file_path, "r") as f:
             content = f.read(MAX_CHARS)
-            if os.path.getsize(abs_file_path) > MAX_CHARS:
+            if f.read(1):
                 content += (
-                    f'[...File "{file_path}" truncated at {MAX_CHARS} characters]'
+                    f'[...File "{file_path}" truncated at {MAX_CHARS} characters; use start_line/end_line or offset/limit to read further]'
                 )
         return content
+    except ValueError:
+        return "Error: offset, limit, start_line and end_line must be integers"
     except Exception as e:
         return f'Error reading file "{file_path}": {e}'
 
 schema_get_file_content = types.FunctionDeclaration(
     name="get_file_content",
-    description="Reads the content of a file in the specified directory, constrained to the working directory.",
+    description="Reads the content of a file in the specified directory, constrained to the working directory. Large files are truncated; pass start_line/end_line or offset/limit to read a specific part.",
     parameters=types.Schema(
         type=types.Type.OBJECT,
         properties={
@@ -31,6 +96,22 @@ schema_get_file_content = types.FunctionDeclaration(
                 type=types.Type.STRING,
                 description="The file path to read from, relative to the working directory.",
             ),
+            "start_line": types.Schema(
+                type=types.Type.INTEGER,
+                description="First line to read (1-based). Use with end_line to read part of a large file.",
+            ),
+            "end_line": types.Schema(
+                type=types.Type.INTEGER,
+                description="Last line to read (inclusive). Defaults to reading until the size limit.",
+            ),
+            "offset": types.Schema(
+                type=types.Type.INTEGER,
+                description="Byte offset to start reading from, as an alternative to start_line.",
+            ),
+            "limit": types.Schema(
+                type=types.Type.INTEGER,
+                description="Maximum number of bytes to read from offset.",
+            ),
         },
     ),
 )
\ No newline at end of file
@@ -1,7 +1,51 @@
 import os 
+import fnmatch
 from google.genai import types
+from config import IGNORE_DIRS, LIST_MAX_DEPTH, LIST_MAX_ENTRIES
 
-def get_files_info(working_directory, directory="."):
+def _format_entry(rel, entry):
+    try:
+        is_dir = entry.is_dir()
+        size = entry.stat().st_size
+    except OSError:
+        return None
+    return f'- {rel}: file_size={size} bytes, is_dir={is_dir}'
+
+
+def _walk(abs_directory, max_depth, pattern, max_entries):
+    """Depth-first listing under abs_directory using scandir's cached entry data.
+
+    Returns (lines, truncated). Directories in IGNORE_DIRS and symlinked
+    directories are not descended into.
+    """
+    lines = []
+    stack = [("", abs_directory, 1)]
+    while stack:
+        rel_dir, abs_dir, depth = stack.pop()
+        try:
+            with os.scandir(abs_dir) as it:
+                entries = sorted(it, key=lambda e: e.name)
+        except OSError:
+            continue
+        subdirs = []
+        for entry in entries:
+            if entry.name in IGNORE_DIRS:
+                continue
+            rel = os.path.join(rel_dir, entry.name) if rel_dir else entry.name
+            if not pattern or fnmatch.fnmatch(entry.name, pattern) or fnmatch.fnmatch(rel, pattern):
+                line = _format_entry(rel, entry)
+                if line is not None:
+                    if len(lines) >= max_entries:
+                        return lines, True
+                    lines.append(line)
+            if depth < max_depth and entry.is_dir(follow_symlinks=False):
+                subdirs.append((rel, entry.path, depth + 1))
+        # Reversed so the stack pops them in name order
+        stack.extend(reversed(subdirs))
+    return lines, False
+
+
+def get_files_info(working_directory, directory=".", recursive=False, max_depth=None, pattern=None, max_entries=None):
     # Construct the absolute working dir from the provided path
     abs_working_directory = os.path.realpath(working_directory)
 
@@ -12,17 +56,35 @@ def get_files_info(working_directory, directory="."):
 
     if not os.path.isdir(abs_directory):
         return f'Error: "{directory}" is not a directory'
-    
-    final_response = ""
-    #contents of the directory: 
-    contents = os.listdir(abs_directory)
-    for item in contents: 
-        item_path = os.path.join(abs_directory, item)
-        if os.path.isdir(item_path): 
-            final_response += f'- {item}: file_size={os.path.getsize(item_path)} bytes, is_dir=True\n'
-        else:
-            final_response += f'- {item}: file_size={os.path.getsize(item_path)} bytes, is_dir=False\n'
-    return final_response
+
+    capped = max_entries is not None
+    try:
+        max_entries = min(int(max_entries or LIST_MAX_ENTRIES), LIST_MAX_ENTRIES)
+        max_depth = int(max_depth) if max_depth is not None else (LIST_MAX_DEPTH if recursive else 1)
+    except (TypeError, ValueError):
+        return "Error: max_depth and max_entries must be integers"
+    if max_depth < 1:
+        return "Error: max_depth must be >= 1"
+
+    if max_depth == 1 and not pattern:
+        # One level, everything included (ignored directories too, and uncapped unless asked, as before)
+        lines = []
+        truncated = False
+        with os.scandir(abs_directory) as it:
+            for entry in it:
+                line = _format_entry(entry.name, entry)
+                if line is None:
+                    continue
+                if capped and len(lines) >= max_entries:
+                    truncated = True
+                    break
+                lines.append(line)
+    else:
+        lines, truncated = _walk(abs_directory, max_depth, pattern, max_entries)
+
+    if truncated:
+        lines.append(f"[...Listing stopped at {max_entries} entries; narrow it with directory, max_depth or pattern]")
+    return "\n".join(lines) + "\n" if lines else ""
     
 schema_get_files_info = types.FunctionDeclaration(
     name="get_files_info",
@@ -34,6 +96,22 @@ schema_get_files_info = types.FunctionDeclaration(
                 type=types.Type.STRING,
                 description="The directory to list files from, relative to the working directory. If not provided, lists files in the working directory itself.",
             ),
+            "recursive": types.Schema(
+                type=types.Type.BOOLEAN,
+                description="List the whole subtree (skipping .git, node_modules, .venv and __pycache__) instead of one level. Paths are shown relative to directory.",
+            ),
+            "max_depth": types.Schema(
+                type=types.Type.INTEGER,
+                description="How many directory levels to list; 1 is just the directory itself.",
+            ),
+            "pattern": types.Schema(
+                type=types.Type.STRING,
+                description="Only show entries whose name or relative path matches this glob, e.g. '*.py'.",
+            ),
+            "max_entries": types.Schema(
+                type=types.Type.INTEGER,
+                description="Maximum number of entries to return.",
+            ),
         },
     ),
 )
\ No newline at end of file
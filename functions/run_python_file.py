@@ -1,8 +1,55 @@
 import os
+import time
+import signal
 import subprocess
 from google.genai import types
+from config import RUN_OUTPUT_KILL_BYTES, EXEC_PRIORITY_DEFAULT
+from interpreter_pool import interpreter_pool
+from output_capture import capture_streams
+from execution_scheduler import execution_scheduler, job_limits, apply_limits
+from workspace_fork import ensure_private, script_running
 
-def run_python_file(working_directory, file_path, args=None):
+RUN_TIMEOUT = 30  # seconds per job, including any unsharing of forked files
+# Cold runs start through this, so writes to blob store links copy the file first
+WRITE_GUARD_SCRIPT = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "write_guard.py")
+
+def _run_cold(commands, cwd, timeout, on_output, limits):
+    proc = subprocess.Popen(
+        commands,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        cwd=cwd,
+        start_new_session=True,
+    )
+    # Set from here rather than with preexec_fn, which can deadlock the child of a threaded
+    # process; the script gets at most interpreter start-up before they apply
+    try:
+        apply_limits(limits, proc.pid)
+    except ProcessLookupError:
+        pass
+
+    def kill():
+        try:
+            os.killpg(proc.pid, signal.SIGKILL)
+        except ProcessLookupError:
+            pass
+
+    deadline = time.monotonic() + timeout
+    with proc:
+        captured = capture_streams(proc.stdout.fileno(), proc.stderr.fileno(), deadline, kill, on_output)
+        try:
+            # A script can close its stdout/stderr and keep running; EOF doesn't mean it exited
+            returncode = proc.wait(timeout=max(0, deadline - time.monotonic()))
+        except subprocess.TimeoutExpired:
+            captured.timed_out = True
+            kill()
+            returncode = proc.wait()
+    if captured.timed_out:
+        raise subprocess.TimeoutExpired(commands, timeout)
+    return returncode, captured
+
+
+def run_python_file(working_directory, file_path, args=None, on_output=None, priority=EXEC_PRIORITY_DEFAULT):
     abs_working_dir = os.path.realpath(working_directory)
     abs_file_path = os.path.realpath(os.path.join(abs_working_dir, file_path))
     if not abs_file_path.startswith(abs_working_dir + os.sep):
@@ -15,21 +62,40 @@ def run_python_file(working_directory, file_path, args=None):
         commands = ["python", abs_file_path]
         if args:
             commands.extend(args)
-        result = subprocess.run(
-            commands,
-            capture_output=True,
-            text=True,
-            timeout=30,
-            cwd=abs_working_dir,
-        )
+        limits = job_limits()
+        try:
+            # script_running also keeps the workspace from being forked while the script can write
+            with execution_scheduler.slot(abs_working_dir, priority), script_running(abs_working_dir):
+                started = time.monotonic()
+                # Scripts may write files in place, which must not leak into forks sharing their inodes
+                ensure_private(abs_working_dir)
+                timeout = RUN_TIMEOUT - (time.monotonic() - started)
+                if timeout <= 0:
+                    return (
+                        f"Error: copying files shared with a forked workspace used the whole {RUN_TIMEOUT}s "
+                        "budget; the copy is done, run the script again"
+                    )
+                # Prefer a warm interpreter forked from the workspace's fork server
+                result = interpreter_pool.run(abs_working_dir, commands, abs_file_path, commands[2:], timeout, on_output, limits)
+                if result is None:
+                    guarded = ["python", WRITE_GUARD_SCRIPT, abs_working_dir, *commands[1:]]
+                    result = _run_cold(guarded, abs_working_dir, timeout, on_output, limits)
+        except TimeoutError as e:
+            return f"Error: server is busy running other scripts ({e}); try again later"
+        returncode, captured = result
+        # Output is held as head + tail per stream, so a runaway script can't flood memory or the context
         output = []
-        if result.stdout:
-            output.append(f"STDOUT:\n{result.stdout}")
-        if result.stderr:
-            output.append(f"STDERR:\n{result.stderr}")
+        if captured.stdout.total:
+            output.append(f"STDOUT:\n{captured.stdout.getvalue()}")
+        if captured.stderr.total:
+            output.append(f"STDERR:\n{captured.stderr.getvalue()}")
 
-        if result.returncode != 0:
-            output.append(f"Process exited with code {result.returncode}")
+        if captured.output_limit_hit:
+            output.append(f"Process killed: output exceeded {RUN_OUTPUT_KILL_BYTES} bytes")
+        elif returncode == -signal.SIGXCPU:
+            output.append(f"Process killed: CPU time limit of {limits['cpu']}s exceeded")
+        elif returncode != 0:
+            output.append(f"Process exited with code {returncode}")
 
         return "\n".join(output) if output else "No output produced."
     except Exception as e:
@@ -0,0 +1,95 @@
+import os
+import re
+import fnmatch
+from google.genai import types
+from config import SEARCH_MAX_RESULTS, SEARCH_LINE_PREVIEW_CHARS
+from search_index import get_search_index, literal_runs
+
+
+def search_code(working_directory, query, regex=False, path_glob=None, case_sensitive=True, max_results=None):
+    if not query:
+        return "Error: query is required"
+    abs_working_dir = os.path.realpath(working_directory)
+    if not os.path.isdir(abs_working_dir):
+        return f'Error: Working directory does not exist: {working_directory}'
+
+    flags = 0 if case_sensitive else re.IGNORECASE
+    if regex:
+        try:
+            pattern = re.compile(query, flags)
+        except re.error as e:
+            return f'Error: Invalid regex "{query}": {e}'
+        required = literal_runs(query, flags)
+        matches = pattern.search
+    else:
+        # Case-insensitive lookups can only use the index for ASCII (the index folds ASCII case)
+        required = [query] if case_sensitive or query.isascii() else []
+        if case_sensitive:
+            matches = lambda line: query in line
+        else:
+            needle = query.casefold()
+            matches = lambda line: needle in line.casefold()
+
+    try:
+        limit = min(int(max_results or SEARCH_MAX_RESULTS), SEARCH_MAX_RESULTS)
+    except (TypeError, ValueError):
+        return "Error: max_results must be an integer"
+    results = []
+    try:
+        for rel in get_search_index(abs_working_dir).candidates(required):
+            if path_glob and not fnmatch.fnmatch(rel, path_glob) and not fnmatch.fnmatch(os.path.basename(rel), path_glob):
+                continue
+            try:
+                with open(os.path.join(abs_working_dir, rel), "r", encoding="utf-8", errors="replace") as f:
+                    for line_no, line in enumerate(f, 1):
+                        if not matches(line):
+                            continue
+                        text = line.rstrip("\n")
+                        if len(text) > SEARCH_LINE_PREVIEW_CHARS:
+                            text = text[:SEARCH_LINE_PREVIEW_CHARS] + "..."
+                        results.append(f"{rel}:{line_no}: {text}")
+                        if len(results) >= limit:
+                            break
+            except OSError:
+                continue
+            if len(results) >= limit:
+                results.append(f"[...Stopped after {limit} matches; narrow the query or path_glob]")
+                break
+    except Exception as e:
+        return f"Error: searching workspace: {e}"
+
+    if not results:
+        return f'No matches for "{query}"'
+    return "\n".join(results)
+
+
+schema_search_code = types.FunctionDeclaration(
+    name="search_code",
+    description="Searches the text files of the working directory for a string or regex and returns matching lines as path:line: text. Much faster than listing directories and reading files one by one to find a symbol.",
+    parameters=types.Schema(
+        type=types.Type.OBJECT,
+        properties={
+            "query": types.Schema(
+                type=types.Type.STRING,
+                description="The text to search for, or a Python regular expression if regex is true. Matched against one line at a time.",
+            ),
+            "regex": types.Schema(
+                type=types.Type.BOOLEAN,
+                description="Treat query as a regular expression. Default: false",
+            ),
+            "path_glob": types.Schema(
+                type=types.Type.STRING,
+                description="Only search files whose path (or file name) matches this glob, e.g. '*.py' or 'src/*'.",
+            ),
+            "case_sensitive": types.Schema(
+                type=types.Type.BOOLEAN,
+                description="Default: true",
+            ),
+            "max_results": types.Schema(
+                type=types.Type.INTEGER,
+                description="Maximum number of matching lines to return.",
+            ),
+        },
+        required=["query"],
+    ),
+)
@@ -1,5 +1,6 @@
 import os
 from google.genai import types
+from file_ops import atomic_write_text
 
 
 def write_file_content(working_directory, file_path, content):
@@ -41,10 +42,9 @@ def write_file_content(working_directory, file_path, content):
         if os.path.exists(abs_file_path) and os.path.isdir(abs_file_path):
             return f'Error: "{file_path}" is a directory, not a file'
         
-        # Write the file
+        # Write the file; replacing rather than writing in place also leaves forks sharing the old inode alone
         print(f"DEBUG: Writing to file: {abs_file_path}")
-        with open(abs_file_path, "w", encoding="utf-8") as f:
-            f.write(content)
+        atomic_write_text(abs_file_path, content)
         return f'Successfully wrote to "{file_path}" ({len(content)} characters written)'
         
     except PermissionError as e:
@@ -0,0 +1,231 @@
+import os
+import json
+import time
+import signal
+import socket
+import atexit
+import threading
+import subprocess
+from collections import OrderedDict
+
+from config import INTERPRETER_POOL_SIZE, INTERPRETER_PRELOAD, INTERPRETER_MAX_JOBS
+from output_capture import capture_streams
+
+ZYGOTE_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "interpreter_zygote.py")
+ZYGOTE_START_TIMEOUT = 10
+ZYGOTE_KILL_GRACE = 5  # seconds to wait for the status of a job killed at its deadline
+SUPPORTED = hasattr(os, "fork") and hasattr(socket, "send_fds")
+
+
+class _Stale(Exception):
+    """The zygote imported a workspace file that has since changed."""
+
+
+class WarmInterpreter:
+    """One zygote process for a workspace; runs one job at a time."""
+
+    def __init__(self, workspace):
+        self.workspace = workspace
+        self.busy = threading.Lock()
+        self.jobs = 0
+        self._sock, child_sock = socket.socketpair()
+        try:
+            self.proc = subprocess.Popen(
+                ["python", ZYGOTE_SCRIPT, workspace, str(child_sock.fileno()), ",".join(INTERPRETER_PRELOAD)],
+                pass_fds=[child_sock.fileno()],
+                cwd=workspace,
+                stdin=subprocess.DEVNULL,
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.DEVNULL,
+            )
+        finally:
+            child_sock.close()
+        self._replies = self._sock.makefile("rb")
+        self._sock.settimeout(ZYGOTE_START_TIMEOUT)
+        if not self._reply().get("ready"):
+            raise OSError("interpreter zygote failed to start")
+        self._sock.settimeout(None)
+
+    def _reply(self):
+        line = self._replies.readline()
+        if not line:
+            raise OSError("interpreter zygote exited")
+        return json.loads(line)
+
+    def run(self, commands, file_path, args, timeout, on_output=None, limits=None):
+        out_r, out_w = os.pipe()
+        err_r, err_w = os.pipe()
+        try:
+            try:
+                job = {"path": file_path, "args": list(args), "cwd": self.workspace, "limits": limits or {}}
+                socket.send_fds(self._sock, [json.dumps(job).encode()], [out_w, err_w])
+            finally:
+                os.close(out_w)
+                os.close(err_w)
+            reply = self._reply()
+            if reply.get("stale"):
+                raise _Stale()
+            self.jobs += 1
+            pid = reply["pid"]
+
+            def kill():
+                try:
+                    os.killpg(pid, signal.SIGKILL)
+                except ProcessLookupError:
+                    pass
+
+            deadline = time.monotonic() + timeout
+            captured = capture_streams(out_r, err_r, deadline, kill, on_output)
+            try:
+                # The pipes hit EOF, but the script may have closed them and kept running
+                self._sock.settimeout(max(0.001, deadline - time.monotonic()))
+                try:
+                    returncode = self._reply()["status"]
+                except TimeoutError:
+                    captured.timed_out = True
+                    kill()
+                    self._sock.settimeout(ZYGOTE_KILL_GRACE)
+                    returncode = self._reply()["status"]
+            except OSError:
+                # The zygote died after starting the job, or never reported the killed one;
+                # retire it, and don't let the caller run the job twice
+                returncode = -1
+                self.close()
+            finally:
+                if self._sock.fileno() != -1:
+                    self._sock.settimeout(None)
+            if captured.timed_out:
+                raise subprocess.TimeoutExpired(commands, timeout)
+            return returncode, captured
+        finally:
+            os.close(out_r)
+            os.close(err_r)
+
+    def close(self):
+        try:
+            self._sock.close()
+            self.proc.kill()
+            self.proc.wait(timeout=5)
+        except Exception:
+            pass
+
+
+class InterpreterPool:
+    """Warm, fork-server interpreters for run_python_file, at most one per workspace.
+
+    Each job runs in a child forked from the workspace's zygote, so the process is
+    fresh every time but interpreter start-up and common imports are already paid.
+    A zygote is replaced when a workspace file it imported changes or after
+    INTERPRETER_MAX_JOBS jobs, and the least recently used one is closed when the
+    pool is full.
+    """
+
+    def __init__(self, size):
+        self.size = size if SUPPORTED else 0
+        self._lock = threading.Lock()
+        self._workers = OrderedDict()  # workspace -> WarmInterpreter
+        self._starting = set()
+
+    def _evict_idle(self):
+        for workspace, worker in list(self._workers.items()):
+            if len(self._workers) < self.size:
+                return True
+            if worker.busy.acquire(blocking=False):
+                del self._workers[workspace]
+                worker.close()
+        return len(self._workers) < self.size
+
+    def _checkout(self, workspace):
+        """Return a warm interpreter for workspace with its busy lock held, or None."""
+        with self._lock:
+            worker = self._workers.get(workspace)
+            if worker is not None:
+                if not worker.busy.acquire(blocking=False):
+                    return None
+                self._workers.move_to_end(workspace)
+                if worker.proc.poll() is None and worker.jobs < INTERPRETER_MAX_JOBS:
+                    return worker
+                del self._workers[workspace]
+                worker.close()
+            if workspace in self._starting or not self._evict_idle():
+                return None
+            self._starting.add(workspace)
+        try:
+            worker = WarmInterpreter(workspace)
+            worker.busy.acquire()
+        except Exception:
+            return None
+        finally:
+            with self._lock:
+                self._starting.discard(workspace)
+        with self._lock:
+            self._workers[workspace] = worker
+        return worker
+
+    def _discard(self, workspace, worker):
+        with self._lock:
+            if self._workers.get(workspace) is worker:
+                del self._workers[workspace]
+        worker.close()
+
+    def run(self, workspace, commands, file_path, args, timeout, on_output=None, limits=None):
+        """Run file_path warm; returns (returncode, CapturedOutput), or None to cold start instead."""
+        if self.size <= 0:
+            return None
+        for _ in range(2):
+            worker = self._checkout(workspace)
+            if worker is None:
+                return None
+            try:
+                return worker.run(commands, file_path, args, timeout, on_output, limits)
+            except _Stale:
+                # Replace the zygote and retry once with a fresh one
+                self._discard(workspace, worker)
+            except subprocess.TimeoutExpired:
+                raise
+            except (OSError, ValueError, KeyError):
+                self._discard(workspace, worker)
+                return None
+            finally:
+                worker.busy.release()
+        return None
+
+    def warm(self, workspace):
+        """Start a zygote for workspace in the background so the first run is already warm."""
+        if self.size <= 0 or workspace in self._workers:
+            return
+
+        def start():
+            worker = self._checkout(workspace)
+            if worker is not None:
+                worker.busy.release()
+
+        threading.Thread(target=start, daemon=True).start()
+
+    def forget(self, workspace):
+        """Close the zygote of a deleted workspace; a busy one is left for LRU eviction."""
+        with self._lock:
+            worker = self._workers.get(workspace)
+            if worker is None or not worker.busy.acquire(blocking=False):
+                return
+            del self._workers[workspace]
+        worker.close()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "size": self.size,
+                "warm": len(self._workers),
+                "busy": sum(1 for w in self._workers.values() if w.busy.locked()),
+            }
+
+    def close(self):
+        with self._lock:
+            workers = list(self._workers.values())
+            self._workers.clear()
+        for worker in workers:
+            worker.close()
+
+
+interpreter_pool = InterpreterPool(INTERPRETER_POOL_SIZE)
+atexit.register(interpreter_pool.close)
@@ -0,0 +1,153 @@
+"""Fork server behind the warm interpreter pool (see interpreter_pool.py).
+
+Started once per workspace with a control socket fd on the command line. It imports
+commonly used modules once, then for every job forks a fresh child that runs
+the requested script with the job's cwd, argv, rlimits and stdout/stderr pipes, so each
+run gets a clean process without paying interpreter start-up and import costs.
+The zygote itself never executes workspace code.
+"""
+import sys
+
+# What a plain `python script.py` has imported before the script runs; nothing a
+# script directory contains can shadow these, but it can shadow anything we preload
+_STARTUP_MODULES = frozenset(name.partition(".")[0] for name in sys.modules)
+
+import os
+import json
+import socket
+import importlib
+import runpy
+import atexit
+import traceback
+
+from execution_scheduler import apply_limits
+from write_guard import install as install_write_guard, evict_shadowed
+
+
+def _quiet_import(name):
+    try:
+        importlib.import_module(name)
+    except BaseException:
+        pass
+
+
+def _workspace_files(workspace):
+    """Module files of this process that live inside the workspace, with their mtimes."""
+    files = {}
+    for module in list(sys.modules.values()):
+        path = getattr(module, "__file__", None)
+        if path and os.path.realpath(path).startswith(workspace + os.sep):
+            try:
+                files[path] = os.stat(path).st_mtime_ns
+            except OSError:
+                files[path] = None
+    return files
+
+
+def _is_stale(files):
+    for path, mtime in files.items():
+        try:
+            if os.stat(path).st_mtime_ns != mtime:
+                return True
+        except OSError:
+            return True
+    return False
+
+
+def _run_child(ctrl, job, out_fd, err_fd, workspace):
+    # New session so a timeout can kill the script and anything it spawned
+    os.setsid()
+    apply_limits(job.get("limits") or {})
+    ctrl.close()
+    devnull = os.open(os.devnull, os.O_RDONLY)
+    os.dup2(devnull, 0)
+    os.dup2(out_fd, 1)
+    os.dup2(err_fd, 2)
+    for fd in (devnull, out_fd, err_fd):
+        os.close(fd)
+    os.chdir(job["cwd"])
+    install_write_guard(workspace)
+
+    sys.stdin = open(0, "r", closefd=False)
+    sys.stdout = open(1, "w", closefd=False)
+    sys.stderr = open(2, "w", buffering=1, errors="backslashreplace", closefd=False)
+    sys.argv = [job["path"]] + job["args"]
+    # Same as `python script.py`: the script's directory comes first on sys.path
+    sys.path.insert(0, os.path.dirname(job["path"]))
+    evict_shadowed(sys.path[0], _STARTUP_MODULES)
+
+    code = 0
+    try:
+        runpy.run_path(job["path"], run_name="__main__")
+    except SystemExit as e:
+        if e.code is None:
+            code = 0
+        elif isinstance(e.code, int):
+            code = e.code
+        else:
+            print(e.code, file=sys.stderr)
+            code = 1
+    except BaseException as e:
+        # Hide the zygote and runpy frames, as a plain `python script.py` would
+        tb = e.__traceback__
+        while tb is not None and tb.tb_frame.f_code.co_filename != job["path"]:
+            tb = tb.tb_next
+        traceback.print_exception(type(e), e, tb or e.__traceback__)
+        code = 1
+    try:
+        atexit._run_exitfuncs()
+        sys.stdout.flush()
+        sys.stderr.flush()
+    except BaseException:
+        pass
+    os._exit(code & 0xFF)
+
+
+def main():
+    workspace = os.path.realpath(sys.argv[1])
+    control_fd = int(sys.argv[2])
+    preload = sys.argv[3].split(",") if len(sys.argv) > 3 and sys.argv[3] else []
+
+    # Don't let workspace scripts import the server's own modules, including the
+    # ones imported above for apply_limits
+    here = os.path.dirname(os.path.abspath(__file__))
+    sys.path[:] = [p for p in sys.path if os.path.abspath(p or ".") != here]
+    for name, module in list(sys.modules.items()):
+        path = getattr(module, "__file__", None)
+        if name != "__main__" and path and os.path.dirname(os.path.abspath(path)) == here:
+            del sys.modules[name]
+
+    ctrl = socket.socket(fileno=control_fd)
+    for name in preload:
+        _quiet_import(name)
+    # If anything we imported lives in the workspace, editing it makes us stale
+    watched = _workspace_files(workspace)
+    ctrl.sendall(b'{"ready": true}\n')
+
+    while True:
+        msg, fds, _, _ = socket.recv_fds(ctrl, 65536, 2)
+        if not msg:
+            return
+        job = json.loads(msg)
+        out_fd, err_fd = fds
+        if _is_stale(watched):
+            os.close(out_fd)
+            os.close(err_fd)
+            ctrl.sendall(b'{"stale": true}\n')
+            return
+
+        sys.stdout.flush()
+        sys.stderr.flush()
+        pid = os.fork()
+        if pid == 0:
+            _run_child(ctrl, job, out_fd, err_fd, workspace)
+        os.close(out_fd)
+        os.close(err_fd)
+        ctrl.sendall(json.dumps({"pid": pid}).encode() + b"\n")
+
+        _, status = os.waitpid(pid, 0)
+        ctrl.sendall(json.dumps({"status": os.waitstatus_to_exitcode(status)}).encode() + b"\n")
+
+
+if __name__ == "__main__":
+    main()
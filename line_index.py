@@ -0,0 +1,89 @@
+import os
+import threading
+from array import array
+from collections import OrderedDict
+
+from config import LINE_INDEX_STRIDE, LINE_INDEX_MAX_FILES
+
+SCAN_CHUNK_SIZE = 1024 * 1024
+
+
+class LineIndex:
+    """Byte offsets of every LINE_INDEX_STRIDE-th line of one file, built lazily.
+
+    checkpoints[k] is where line k * stride + 1 starts. The file is only scanned
+    as far as the furthest line asked for so far, so jumping to line 40 000 reads
+    up to there once and later jumps nearby are a seek plus a few readlines.
+    """
+
+    def __init__(self, stride=LINE_INDEX_STRIDE):
+        self.stride = stride
+        self.checkpoints = array("Q", [0])
+        self.complete = False
+        self._lock = threading.Lock()
+
+    def _extend(self, f, target):
+        """Scan forward from the last checkpoint until checkpoint target exists or EOF."""
+        offset = self.checkpoints[-1]
+        f.seek(offset)
+        pending = 0  # newlines seen since the last checkpoint
+        while len(self.checkpoints) <= target:
+            chunk = f.read(SCAN_CHUNK_SIZE)
+            if not chunk:
+                self.complete = True
+                return
+            found = chunk.count(b"\n")
+            pos = -1
+            while pending + found >= self.stride:
+                # Locate the newline that ends this checkpoint's last line
+                for _ in range(self.stride - pending):
+                    pos = chunk.find(b"\n", pos + 1)
+                found -= self.stride - pending
+                pending = 0
+                self.checkpoints.append(offset + pos + 1)
+            pending += found
+            offset += len(chunk)
+
+    def seek_line(self, f, line):
+        """Position binary file f at the start of 1-based line; False if the file is shorter."""
+        target = (line - 1) // self.stride
+        with self._lock:
+            if target >= len(self.checkpoints) and not self.complete:
+                self._extend(f, target)
+            target = min(target, len(self.checkpoints) - 1)
+            f.seek(self.checkpoints[target])
+        for _ in range(line - 1 - target * self.stride):
+            if not f.readline():
+                return False
+        return True
+
+
+class _LineIndexCache:
+    """LRU of LineIndex objects keyed by path and (inode, size, mtime), so edits retire them."""
+
+    def __init__(self, max_files):
+        self.max_files = max_files
+        self._lock = threading.Lock()
+        self._indexes = OrderedDict()  # path -> (identity, LineIndex)
+
+    def get(self, path, st):
+        identity = (st.st_ino, st.st_size, st.st_mtime_ns)
+        with self._lock:
+            entry = self._indexes.get(path)
+            if entry is not None and entry[0] == identity:
+                self._indexes.move_to_end(path)
+                return entry[1]
+            index = LineIndex()
+            self._indexes[path] = (identity, index)
+            self._indexes.move_to_end(path)
+            while len(self._indexes) > self.max_files:
+                self._indexes.popitem(last=False)
+            return index
+
+
+line_indexes = _LineIndexCache(LINE_INDEX_MAX_FILES)
+
+
+def get_line_index(f, path):
+    """LineIndex for the open binary file f at path."""
+    return line_indexes.get(os.path.realpath(path), os.fstat(f.fileno()))
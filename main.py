@@ -1,11 +1,13 @@
 import os 
 import sys
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
 from google import genai
 from google.genai import types
 
-from config import max_iterations, system_prompt
-from call_funtion import call_function, available_functions
+from config import max_iterations, system_prompt, TOOL_CALL_PARALLELISM
+from call_funtion import call_functions, available_functions
+from context_compaction import ContextManager
 
 def main(): 
     if len(sys.argv) < 2:
@@ -33,9 +35,14 @@ def main():
     messages = [
             types.Content(role="user", parts=[types.Part(text=user_prompt)])
         ]
+    tool_pool = ThreadPoolExecutor(max_workers=TOOL_CALL_PARALLELISM)
+    context = ContextManager(messages)
 
     for i in range(max_iterations):
         print(f"Iteration {i+1}:")
+        saved = context.compact()
+        if verbose and saved:
+            print(f"compacted context: ~{saved} tokens saved")
         try:
             response = client.models.generate_content(
                 model="gemini-2.0-flash",
@@ -69,8 +76,7 @@ def main():
         
         if response.function_calls:            
             function_response_parts = []
-            for function_call_part in response.function_calls:
-                function_result = call_function(function_call_part, verbose)
+            for function_result in call_functions(response.function_calls, verbose, executor=tool_pool):
                 function_response_parts.extend(function_result.parts)
             messages.append(
                 types.Content(
@@ -87,6 +93,8 @@ def main():
             print('--------------------------------')
             print("Final answer:")
             print(response.text)
+            if verbose:
+                print(f"tokens saved by compaction: ~{context.tokens_saved}")
             return
 
 main()
\ No newline at end of file
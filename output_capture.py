@@ -0,0 +1,88 @@
+import os
+import time
+import selectors
+from collections import deque
+
+from config import RUN_OUTPUT_HEAD_BYTES, RUN_OUTPUT_TAIL_BYTES, RUN_OUTPUT_KILL_BYTES
+
+READ_SIZE = 65536
+
+
+class BoundedBuffer:
+    """Keeps the first head_bytes and the last tail_bytes of a stream, and counts the rest."""
+
+    def __init__(self, head_bytes=RUN_OUTPUT_HEAD_BYTES, tail_bytes=RUN_OUTPUT_TAIL_BYTES):
+        self.head_bytes = head_bytes
+        self.tail_bytes = tail_bytes
+        self.head = bytearray()
+        self.tail = deque()
+        self.tail_size = 0
+        self.total = 0
+
+    def write(self, data):
+        self.total += len(data)
+        room = self.head_bytes - len(self.head)
+        if room > 0:
+            self.head += data[:room]
+            data = data[room:]
+        if not data:
+            return
+        self.tail.append(data)
+        self.tail_size += len(data)
+        # Drop whole chunks from the front while the rest still covers the tail window
+        while self.tail_size - len(self.tail[0]) >= self.tail_bytes:
+            self.tail_size -= len(self.tail.popleft())
+
+    def getvalue(self):
+        tail = b"".join(self.tail)[-self.tail_bytes:] if self.tail else b""
+        omitted = self.total - len(self.head) - len(tail)
+        text = decode_output(bytes(self.head))
+        if omitted > 0:
+            text += f"\n[... {omitted} bytes omitted ...]\n"
+        return text + decode_output(tail)
+
+
+def decode_output(data):
+    # Match subprocess text mode: universal newlines
+    return data.decode("utf-8", errors="replace").replace("\r\n", "\n").replace("\r", "\n")
+
+
+class CapturedOutput:
+    def __init__(self):
+        self.stdout = BoundedBuffer()
+        self.stderr = BoundedBuffer()
+        self.timed_out = False
+        self.output_limit_hit = False
+
+
+def capture_streams(out_fd, err_fd, deadline, kill, on_output=None):
+    """Read a process's stdout/stderr pipes to EOF with bounded memory.
+
+    Calls on_output(stream, text) for every chunk as it arrives. If combined
+    output passes RUN_OUTPUT_KILL_BYTES, or the deadline passes, kill() is called.
+    """
+    captured = CapturedOutput()
+    buffers = {out_fd: ("stdout", captured.stdout), err_fd: ("stderr", captured.stderr)}
+    with selectors.DefaultSelector() as sel:
+        for fd in buffers:
+            sel.register(fd, selectors.EVENT_READ)
+        while sel.get_map():
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                captured.timed_out = True
+                kill()
+                break
+            for key, _ in sel.select(remaining):
+                data = os.read(key.fd, READ_SIZE)
+                if not data:
+                    sel.unregister(key.fd)
+                    continue
+                name, buf = buffers[key.fd]
+                buf.write(data)
+                if on_output is not None:
+                    on_output(name, data.decode("utf-8", errors="replace"))
+                if not captured.output_limit_hit and captured.stdout.total + captured.stderr.total > RUN_OUTPUT_KILL_BYTES:
+                    # Runaway output: stop the process but keep draining what's already in the pipes
+                    captured.output_limit_hit = True
+                    kill()
+    return captured
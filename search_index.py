@@ -0,0 +1,205 @@
+import os
+import re
+import time
+import threading
+
+from config import IGNORE_DIRS, SEARCH_MAX_FILE_BYTES, INDEX_RESCAN_INTERVAL
+from workspace_index import get_index, rescan_generation
+
+# Same heuristic git uses: a NUL byte near the start means binary
+BINARY_SNIFF_BYTES = 8000
+_TRIGRAMS = re.compile(rb"(?=(...))", re.S)
+
+
+def trigrams(data):
+    """Set of lowercased 3-byte substrings of data."""
+    return set(_TRIGRAMS.findall(data.lower()))
+
+
+def literal_runs(pattern, flags=0):
+    """Literal strings every match of the regex must contain (best effort, may be empty)."""
+    try:
+        from re import _parser as sre_parse
+        from re._constants import LITERAL
+    except ImportError:  # Python < 3.11
+        import sre_parse
+        from sre_constants import LITERAL
+    try:
+        parsed = sre_parse.parse(pattern, flags)
+    except re.error:
+        return []
+    ignore_case = bool(parsed.state.flags & re.IGNORECASE)
+    runs, current = [], []
+    for op, value in parsed:
+        if op is LITERAL:
+            current.append(chr(value))
+            continue
+        if current:
+            runs.append("".join(current))
+        current = []
+    if current:
+        runs.append("".join(current))
+    # The index only folds ASCII case, so case-insensitive non-ASCII runs can't be used
+    return [run for run in runs if len(run.encode("utf-8")) >= 3 and not (ignore_case and not run.isascii())]
+
+
+class TrigramIndex:
+    """Trigram posting lists for the text files of one workspace.
+
+    Each indexed file version gets an integer id; postings map a lowercased
+    trigram to the ids of files containing it. A query's trigrams narrow the
+    search to candidate files, which are then scanned line by line, so results
+    are exact. Files the agent writes are re-indexed from mark_dirty() alone;
+    changes nobody reported (a script ran, or INDEX_RESCAN_INTERVAL passed) are
+    found by a stat sweep over the workspace file index. A changed file is
+    re-indexed under a new id; old ids are just marked dead and the postings
+    are rebuilt once dead ids outnumber live ones.
+    """
+
+    def __init__(self, root):
+        self.root = os.path.realpath(root)
+        self._lock = threading.Lock()
+        self._rescan_generation = None  # workspace_index.rescan_generation at the last sweep
+        self._last_sweep = 0.0
+        self._reset()
+
+    def _reset(self):
+        self._postings = {}  # trigram -> set of file ids
+        self._files = {}     # rel path -> (file id, (size, mtime_ns, ino))
+        self._paths = {}     # live file id -> rel path
+        self._skipped = {}   # rel path -> identity of binary or oversized files
+        self._dead = 0
+        self._next_id = 0
+        self._dirty = set()
+
+    def _index_file(self, rel, identity):
+        old = self._files.pop(rel, None)
+        if old is not None:
+            self._paths.pop(old[0], None)
+            self._dead += 1
+        self._skipped.pop(rel, None)
+        if identity[0] > SEARCH_MAX_FILE_BYTES:
+            self._skipped[rel] = identity
+            return
+        try:
+            with open(os.path.join(self.root, rel), "rb") as f:
+                data = f.read(SEARCH_MAX_FILE_BYTES + 1)
+        except OSError:
+            return
+        if b"\0" in data[:BINARY_SNIFF_BYTES]:
+            self._skipped[rel] = identity
+            return
+        file_id = self._next_id
+        self._next_id += 1
+        self._files[rel] = (file_id, identity)
+        self._paths[file_id] = rel
+        for gram in trigrams(data):
+            ids = self._postings.get(gram)
+            if ids is None:
+                self._postings[gram] = {file_id}
+            else:
+                ids.add(file_id)
+
+    def _identity(self, rel):
+        try:
+            st = os.stat(os.path.join(self.root, rel))
+        except OSError:
+            return None
+        return (st.st_size, st.st_mtime_ns, st.st_ino)
+
+    def _refresh_dirty(self):
+        """Re-index just the files the agent wrote since the last refresh."""
+        for rel in self._dirty:
+            # Same files as the workspace index lists
+            identity = None if IGNORE_DIRS.intersection(rel.split(os.sep)[:-1]) else self._identity(rel)
+            if identity is not None:
+                self._index_file(rel, identity)
+            elif rel in self._files:
+                self._paths.pop(self._files.pop(rel)[0], None)
+                self._dead += 1
+            else:
+                self._skipped.pop(rel, None)
+        self._dirty.clear()
+
+    def refresh(self):
+        """Bring the index in line with the workspace; O(files written) unless a sweep is due."""
+        generation = rescan_generation(self.root)
+        with self._lock:
+            if generation == self._rescan_generation and time.monotonic() - self._last_sweep < INDEX_RESCAN_INTERVAL:
+                self._refresh_dirty()
+                return
+        self._sweep(generation)
+
+    def _sweep(self, generation):
+        entries, _ = get_index(self.root).page()
+        with self._lock:
+            self._rescan_generation = generation
+            self._last_sweep = time.monotonic()
+            if self._dead > max(1000, len(self._paths)):
+                self._reset()
+            live = set(entries)
+            for rel in list(self._files):
+                if rel not in live:
+                    self._paths.pop(self._files.pop(rel)[0], None)
+                    self._dead += 1
+            for rel in list(self._skipped):
+                if rel not in live:
+                    del self._skipped[rel]
+            for rel in entries:
+                identity = self._identity(rel)
+                if identity is None:
+                    continue
+                current = self._files.get(rel)
+                if rel in self._dirty or (current[1] if current else self._skipped.get(rel)) != identity:
+                    self._index_file(rel, identity)
+            self._dirty.clear()
+
+    def mark_dirty(self, rel_path):
+        with self._lock:
+            self._dirty.add(os.path.normpath(rel_path))
+
+    def candidates(self, required):
+        """Sorted rel paths of files containing every trigram of every string in required."""
+        self.refresh()
+        with self._lock:
+            ids = None
+            for text in required:
+                for gram in trigrams(text.encode("utf-8")):
+                    posting = self._postings.get(gram, set())
+                    ids = set(posting) if ids is None else ids & posting
+                    if not ids:
+                        return []
+            if ids is None:
+                return sorted(self._files)
+            return sorted(self._paths[i] for i in ids if i in self._paths)
+
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+
+def get_search_index(root):
+    root = os.path.realpath(root)
+    with _indexes_lock:
+        index = _indexes.get(root)
+        if index is None:
+            index = _indexes[root] = TrigramIndex(root)
+    return index
+
+
+def build_in_background(root):
+    """Index a freshly uploaded or cloned workspace so the first search is fast."""
+    threading.Thread(target=get_search_index(root).refresh, daemon=True).start()
+
+
+def forget(root):
+    """Drop the index of a deleted workspace."""
+    with _indexes_lock:
+        _indexes.pop(os.path.realpath(root), None)
+
+
+def notify_changed(root, rel_path):
+    """Called after a tool writes rel_path; a no-op if the workspace has no index yet."""
+    index = _indexes.get(os.path.realpath(root))
+    if index is not None:
+        index.mark_dirty(rel_path)
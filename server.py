@@ -1,30 +1,90 @@
-from fastapi import FastAPI, HTTPException, UploadFile, File, Query
+from fastapi import FastAPI, HTTPException, UploadFile, File, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import StreamingResponse
+from fastapi.responses import StreamingResponse, FileResponse, JSONResponse, Response
+from starlette.concurrency import run_in_threadpool
 from pydantic import BaseModel
-from typing import Optional, Dict, List
+from typing import Optional, Dict, List, Literal
 import os
 import io
+import itertools
 import uuid
 import zipfile
 import subprocess
 import json
+from contextlib import asynccontextmanager
 import tempfile
 import requests
 import re
+import shutil
 from datetime import datetime
-from dotenv import load_dotenv
-from google import genai
+from email.utils import formatdate, parsedate_to_datetime
 from google.genai import types
 
 import config as cfg
-from call_funtion import call_function, available_functions
+from agent import AgentError, RunGovernor, GENERATE_CONFIG, get_client, iter_agent_events, run_agent
+from workspace_archive import extract_zip, iter_zip
+from workspace_diff import iter_combined_diff
+from workspace_index import get_index
+import workspace_index
+from tool_cache import tool_cache
+from interpreter_pool import interpreter_pool
+from execution_scheduler import execution_scheduler
+from workspace_git import git_status_cache
+from clone_cache import CloneCache
+import workspace_fork
+from search_index import build_in_background as build_search_index
+from symbol_index import build_in_background as build_symbol_index, get_symbol_index
+import search_index
+import symbol_index
+from workspace_registry import workspace_registry, WorkspaceGone
+from blob_store import BlobStore
 
 WORKSPACES_BASE = os.getenv("WORKSPACES_BASE", "/workspaces")
-os.makedirs(WORKSPACES_BASE, exist_ok=True)
+# Mirrors in cfg.CLONE_CACHE_DIR; nothing touches the disk until startup
+clone_cache = CloneCache()
+# Optional: deduplicate uploaded and cloned files across workspaces (blob_store.py); set at startup
+blob_store = None
+
+
+def _forget_workspace(root):
+    """Drop everything cached for a workspace the registry deleted."""
+    workspace_index.forget(root)
+    search_index.forget(root)
+    symbol_index.forget(root)
+    git_status_cache.invalidate(root)
+    interpreter_pool.forget(root)
+
+
+def _start_blob_store():
+    store = BlobStore(cfg.BLOB_STORE_DIR)
+    if store.device != os.stat(WORKSPACES_BASE).st_dev:
+        print(f"Blob store disabled: BLOB_STORE_DIR {cfg.BLOB_STORE_DIR} is not on the same filesystem as {WORKSPACES_BASE}")
+        return None
+    store.start()
+    # Its links stay shared when scripts run; write_guard copies one only when it's written
+    workspace_fork.keep_linked(store.contains)
+    return store
+
+
+@asynccontextmanager
+async def lifespan(app):
+    """Create the workspace and state directories and start the background sweepers."""
+    global blob_store
+    os.makedirs(WORKSPACES_BASE, exist_ok=True)
+    clone_cache.start()
+    if cfg.BLOB_STORE_DIR:
+        blob_store = _start_blob_store()
+    # Tracks size and last access of every workspace and sweeps out idle ones (workspace_registry.py)
+    # Bytes deduplicated by the blob store (as of its last collection) don't count toward the budget
+    workspace_registry.start(
+        WORKSPACES_BASE,
+        on_remove=_forget_workspace,
+        shared_bytes=blob_store.saved_bytes if blob_store else None,
+    )
+    yield
 
-IGNORE_DIRS = {".git", "node_modules", ".venv", "__pycache__"}
+IGNORE_DIRS = cfg.IGNORE_DIRS
 MAX_ENTRIES = 2000
 
 class ChatMessage(BaseModel):
@@ -37,12 +97,16 @@ class RunRequest(BaseModel):
     verbose: bool = False
     max_iterations: Optional[int] = None
     chatHistory: Optional[List[ChatMessage]] = []
+    stream: Optional[Literal["sse", "ndjson"]] = None  # emit run events as they happen
+    priority: Optional[int] = None  # script execution queue priority, lower runs first (clamped to EXEC_PRIORITY_MIN..MAX)
 
 class CloneRequest(BaseModel):
     repo_url: str
     branch: Optional[str] = "main"
 
-app = FastAPI()
+run_governor = RunGovernor(cfg.MAX_CONCURRENT_RUNS, cfg.MAX_RUNS_PER_WORKSPACE, cfg.RUN_QUEUE_TIMEOUT)
+
+app = FastAPI(lifespan=lifespan)
 
 # Enable CORS for browser-based UI
 app.add_middleware(
@@ -53,6 +117,16 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+_WORKSPACE_PATH = re.compile(r"^/v1/workspaces/([^/]+)/")
+
+@app.middleware("http")
+async def touch_workspace(request: Request, call_next):
+    """Any request naming a workspace counts as an access for TTL and LRU eviction"""
+    match = _WORKSPACE_PATH.match(request.url.path)
+    if match:
+        workspace_registry.touch(os.path.join(WORKSPACES_BASE, match.group(1)))
+    return await call_next(request)
+
 # Serve the simple web UI from the same origin to avoid CORS entirely
 try:
     app.mount("/ui", StaticFiles(directory="web", html=True), name="ui")
@@ -62,7 +136,28 @@ except Exception:
 
 @app.get("/healthz")
 def healthz():
-    return {"ok": True}
+    return {"ok": True, "runs": run_governor.stats()}
+
+@app.get("/v1/metrics")
+def metrics():
+    return {
+        "runs": run_governor.stats(),
+        "tool_cache": tool_cache.stats(),
+        "interpreter_pool": interpreter_pool.stats(),
+        "executions": execution_scheduler.stats(),
+        "git_status_cache": git_status_cache.stats(),
+        "clone_cache": clone_cache.stats(),
+        "forks": workspace_fork.stats(),
+        "workspaces": workspace_registry.stats(),
+        "blob_store": blob_store.stats() if blob_store else None,
+    }
+
+def _register_or_reject(ws_root):
+    """Start tracking a new workspace, or delete it if it's already over the per-workspace quota"""
+    size = workspace_registry.register(ws_root)
+    if workspace_registry.over_quota(size):
+        workspace_registry.remove(ws_root)
+        raise HTTPException(413, f"Workspace is {size} bytes, over the {workspace_registry.quota_bytes} byte quota")
 
 @app.post("/v1/workspaces/upload")
 async def upload_ws(zip_file: UploadFile = File(...)):
@@ -72,23 +167,36 @@ async def upload_ws(zip_file: UploadFile = File(...)):
     ws_root = os.path.join(WORKSPACES_BASE, ws_id)
     os.makedirs(ws_root, exist_ok=True)
 
-    data = await zip_file.read()
+    # Spool the upload to disk in chunks instead of holding the whole archive in memory
+    fd, zip_path = tempfile.mkstemp(suffix=".zip")
     try:
-        with zipfile.ZipFile(io.BytesIO(data)) as z:
-            base_real = os.path.realpath(ws_root)
-            for member in z.infolist():
-                target = os.path.realpath(os.path.join(ws_root, member.filename))
-                if not target.startswith(base_real + os.sep):
-                    raise HTTPException(400, "Invalid entry in ZIP")
-                if member.is_dir():
-                    os.makedirs(target, exist_ok=True)
-                else:
-                    os.makedirs(os.path.dirname(target), exist_ok=True)
-                    with z.open(member) as src, open(target, "wb") as dst:
-                        dst.write(src.read())
+        received = 0
+        with os.fdopen(fd, "wb") as spool:
+            while chunk := await zip_file.read(cfg.UPLOAD_CHUNK_SIZE):
+                received += len(chunk)
+                if received > cfg.UPLOAD_MAX_BYTES:
+                    raise HTTPException(413, f"Upload exceeds {cfg.UPLOAD_MAX_BYTES} bytes")
+                spool.write(chunk)
+        # Extraction is blocking disk I/O; keep it off the event loop
+        await run_in_threadpool(extract_zip, zip_path, ws_root)
+    except HTTPException:
+        shutil.rmtree(ws_root, ignore_errors=True)
+        raise
+    except ValueError as e:
+        shutil.rmtree(ws_root, ignore_errors=True)
+        raise HTTPException(400, str(e))
     except zipfile.BadZipFile:
+        shutil.rmtree(ws_root, ignore_errors=True)
         raise HTTPException(400, "Corrupt or invalid ZIP")
-
+    finally:
+        os.unlink(zip_path)
+
+    if blob_store:
+        await run_in_threadpool(blob_store.add_tree, ws_root)
+    # Measuring (and, over quota, deleting) the tree is blocking disk I/O too
+    await run_in_threadpool(_register_or_reject, ws_root)
+    build_search_index(ws_root)
+    build_symbol_index(ws_root)
     return {"workspace_id": ws_id}
 
 @app.post("/v1/workspaces/clone")
@@ -97,40 +205,79 @@ def clone_ws(body: CloneRequest):
     ws_root = os.path.join(WORKSPACES_BASE, ws_id)
     os.makedirs(ws_root, exist_ok=True)
     try:
-        subprocess.run(
-            ["git", "clone", "--depth", "1", "--branch", body.branch, body.repo_url, ws_root],
-            check=True,
-            capture_output=True,
-            text=True,
-            timeout=120,
-        )
+        # Served from a local mirror of the repo when possible (clone_cache.py)
+        clone_cache.clone(body.repo_url, body.branch, ws_root)
     except subprocess.CalledProcessError as e:
+        shutil.rmtree(ws_root, ignore_errors=True)
         raise HTTPException(400, f"Git clone failed: {e.stderr.strip() or e.stdout.strip()}")
     except Exception as e:
+        shutil.rmtree(ws_root, ignore_errors=True)
         raise HTTPException(500, f"Clone error: {e}")
+    if blob_store:
+        blob_store.add_tree(ws_root)
+    _register_or_reject(ws_root)
+    build_search_index(ws_root)
+    build_symbol_index(ws_root)
     return {"workspace_id": ws_id}
 
+@app.post("/v1/workspaces/{ws_id}/fork")
+def fork_ws(ws_id: str):
+    """Copy a workspace for another attempt; files are shared until one side writes them"""
+    src_root = os.path.realpath(os.path.join(WORKSPACES_BASE, ws_id))
+    if os.path.dirname(src_root) != os.path.realpath(WORKSPACES_BASE) or not os.path.isdir(src_root):
+        raise HTTPException(404, "Workspace not found")
+    # A run's scripts may write files in place, so its workspace can't be shared mid-run
+    if run_governor.in_use(src_root):
+        raise HTTPException(409, "Workspace has an active run; fork it when the run finishes")
+    new_id = str(uuid.uuid4())
+    ws_root = os.path.join(WORKSPACES_BASE, new_id)
+    try:
+        # Pinned so the sweeper can't delete the source while it's being copied
+        with workspace_registry.pin(src_root):
+            counts = workspace_fork.fork_workspace(src_root, ws_root)
+    except WorkspaceGone:
+        raise HTTPException(404, "Workspace not found")
+    except workspace_fork.WorkspaceBusy as e:
+        raise HTTPException(409, f"Cannot fork now: {e}")
+    except OSError as e:
+        shutil.rmtree(ws_root, ignore_errors=True)
+        raise HTTPException(500, f"Fork error: {e}")
+    _register_or_reject(ws_root)
+    build_search_index(ws_root)
+    build_symbol_index(ws_root)
+    return {"workspace_id": new_id, "forked_from": ws_id, "files": counts}
+
 @app.get("/v1/workspaces/{ws_id}/tree")
-def tree(ws_id: str, max_entries: int = MAX_ENTRIES):
+def tree(ws_id: str, max_entries: int = Query(MAX_ENTRIES, ge=1), cursor: Optional[str] = None):
     ws_root = os.path.join(WORKSPACES_BASE, ws_id)
     base_real = os.path.realpath(ws_root)
     if not os.path.isdir(base_real):
         raise HTTPException(404, "Workspace not found")
-    entries = []
-    for root, dirs, files in os.walk(base_real):
-        dirs[:] = [d for d in dirs if d not in IGNORE_DIRS]
-        rel_root = os.path.relpath(root, base_real)
-        for name in sorted(files):
-            rel = os.path.normpath(os.path.join(rel_root, name)) if rel_root != "." else name
-            if rel.startswith(".."):
-                continue
-            entries.append(rel)
-            if len(entries) >= max_entries:
-                return {"entries": entries, "truncated": True}
-    return {"entries": entries, "truncated": False}
+    # Served from the cached index; pass next_cursor back to fetch the following page
+    entries, next_cursor = get_index(base_real).page(cursor, max_entries)
+    return {"entries": entries, "truncated": next_cursor is not None, "next_cursor": next_cursor}
+
+def _file_validators(st):
+    """ETag and Last-Modified for a file, derived from its stat so no read is needed."""
+    etag = f'"{st.st_ino:x}-{st.st_size:x}-{st.st_mtime_ns:x}"'
+    return {"ETag": etag, "Last-Modified": formatdate(st.st_mtime, usegmt=True)}
+
+def _is_not_modified(request, validators, st):
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        # If-None-Match wins over If-Modified-Since; compare weakly
+        tags = [t.strip().removeprefix("W/") for t in if_none_match.split(",")]
+        return "*" in tags or validators["ETag"] in tags
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since:
+        try:
+            return int(st.st_mtime) <= parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError):
+            return False
+    return False
 
 @app.get("/v1/workspaces/{ws_id}/file")
-def read_file(ws_id: str, path: str = Query(...)):
+def read_file(request: Request, ws_id: str, path: str = Query(...), raw: bool = False):
     ws_root = os.path.join(WORKSPACES_BASE, ws_id)
     base_real = os.path.realpath(ws_root)
     if not os.path.isdir(base_real):
@@ -142,15 +289,65 @@ def read_file(ws_id: str, path: str = Query(...)):
         if os.path.isdir(abs_path):
             return {"is_directory": True, "message": "This is a directory. Select a file to view its content."}
         raise HTTPException(404, "Not found")
+
+    st = os.stat(abs_path)
+    validators = _file_validators(st)
+    if _is_not_modified(request, validators, st):
+        return Response(status_code=304, headers=validators)
+
+    if raw:
+        # Raw bytes of any file type; FileResponse streams from disk and honours Range/If-Range
+        return FileResponse(abs_path, stat_result=st, headers=validators)
+
     with open(abs_path, "rb") as f:
         data = f.read(2_000_000)
     try:
-        return {"path": path, "content": data.decode("utf-8")}
+        return JSONResponse({"path": path, "content": data.decode("utf-8")}, headers=validators)
     except UnicodeDecodeError:
-        raise HTTPException(415, "Binary file not supported")
+        raise HTTPException(415, "Binary file not supported; request it with raw=true")
+
+@app.get("/v1/workspaces/{ws_id}/symbols")
+def symbols(ws_id: str, name: str = Query(..., min_length=1), max_results: int = Query(cfg.SYMBOL_MAX_RESULTS, ge=1, le=1000)):
+    ws_root = os.path.join(WORKSPACES_BASE, ws_id)
+    base_real = os.path.realpath(ws_root)
+    if not os.path.isdir(base_real):
+        raise HTTPException(404, "Workspace not found")
+    # Served from the workspace's AST symbol index; only changed files are re-parsed
+    index = get_symbol_index(base_real)
+    definitions = index.definitions(name)
+    references = index.references(name)
+    return {
+        "name": name,
+        "definitions": [s.to_dict() for s in definitions[:max_results]],
+        "references": [s.to_dict() for s in references[:max_results]],
+        "truncated": len(definitions) > max_results or len(references) > max_results,
+    }
+
+def _format_event(fmt, event):
+    data = json.dumps(event, default=str)
+    if fmt == "sse":
+        return f"event: {event['type']}\ndata: {data}\n\n"
+    return data + "\n"
+
+async def _stream_run(fmt, client, config, messages, workspace_root, iters, verbose, priority):
+    """Yield agent events as SSE or NDJSON; failures become a final error event."""
+    try:
+        # Pinned so the sweeper can't delete the workspace under a queued or running run
+        with workspace_registry.pin(workspace_root):
+            async with run_governor.slot(workspace_root):
+                async for event in iter_agent_events(client, config, messages, workspace_root, iters, verbose, priority):
+                    yield _format_event(fmt, event)
+    except WorkspaceGone:
+        yield _format_event(fmt, {"type": "error", "message": "Workspace not found; it was deleted"})
+    except TimeoutError:
+        yield _format_event(fmt, {"type": "error", "message": "Too many concurrent runs; try again later"})
+    except AgentError as e:
+        yield _format_event(fmt, {"type": "error", "message": str(e)})
+    except Exception as e:
+        yield _format_event(fmt, {"type": "error", "message": f"Run failed: {e}"})
 
 @app.post("/v1/run")
-def run(req: RunRequest):
+async def run(req: RunRequest):
     if not req.workspace:
         raise HTTPException(400, "workspace is required")
 
@@ -158,21 +355,19 @@ def run(req: RunRequest):
     candidate = os.path.realpath(os.path.join(WORKSPACES_BASE, req.workspace))
     if not candidate.startswith(base_real):
         raise HTTPException(400, "Invalid workspace path")
-    if not os.path.isdir(candidate):
+    # Unregistered means it never existed or the sweeper is deleting it
+    if not os.path.isdir(candidate) or not workspace_registry.exists(candidate):
         raise HTTPException(404, "Workspace not found; upload or clone first")
     workspace_root = candidate
 
-    load_dotenv()
-    api_key = os.environ.get("GEMINI_API_KEY")
-    if not api_key:
-        raise HTTPException(500, "GEMINI_API_KEY not set")
+    # Start the workspace's fork server now so the agent's first script run is warm
+    interpreter_pool.warm(workspace_root)
 
-    client = genai.Client(api_key=api_key)
-    config = types.GenerateContentConfig(
-        system_instruction=cfg.system_prompt,
-        tools=[available_functions],
-        candidate_count=1,
-    )
+    try:
+        client = get_client()
+    except AgentError as e:
+        raise HTTPException(500, str(e))
+    config = GENERATE_CONFIG
     
     # Build messages with chat history context
     messages = []
@@ -188,37 +383,26 @@ def run(req: RunRequest):
     messages.append(types.Content(role="user", parts=[types.Part(text=req.prompt)]))
     
     iters = req.max_iterations or cfg.max_iterations
+    # Clients can only move their scripts within the configured priority band
+    priority = None if req.priority is None else min(max(req.priority, cfg.EXEC_PRIORITY_MIN), cfg.EXEC_PRIORITY_MAX)
 
-    for _ in range(iters):
-        resp = client.models.generate_content(
-            model="gemini-2.0-flash",
-            contents=messages,
-            config=config,
+    if req.stream:
+        return StreamingResponse(
+            _stream_run(req.stream, client, config, messages, workspace_root, iters, req.verbose, priority),
+            media_type="text/event-stream" if req.stream == "sse" else "application/x-ndjson",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
         )
-        if not resp or not resp.candidates:
-            raise HTTPException(500, "Empty response")
-
-        candidate_msg = resp.candidates[0]
-        messages.append(candidate_msg.content)
 
-        if resp.function_calls:
-            tool_parts = []
-            for fc in resp.function_calls:
-                tool_result = call_function(fc, req.verbose, workspace_root)
-                tool_parts.extend(tool_result.parts)
-            messages.append(types.Content(role="tool", parts=tool_parts))
-            continue
-
-        usage = resp.usage_metadata
-        return {
-            "final_text": resp.text,
-            "usage": {
-                "prompt_tokens": getattr(usage, "prompt_token_count", None),
-                "response_tokens": getattr(usage, "candidates_token_count", None),
-            },
-        }
-
-    raise HTTPException(500, "Max iterations reached")
+    try:
+        with workspace_registry.pin(workspace_root):
+            async with run_governor.slot(workspace_root):
+                return await run_agent(client, config, messages, workspace_root, iters, req.verbose, priority)
+    except WorkspaceGone:
+        raise HTTPException(404, "Workspace not found; upload or clone first")
+    except TimeoutError:
+        raise HTTPException(503, "Too many concurrent runs; try again later")
+    except AgentError as e:
+        raise HTTPException(500, str(e))
 
 @app.get("/v1/workspaces/{ws_id}/git/status")
 def git_status(ws_id: str):
@@ -233,65 +417,8 @@ def git_status(ws_id: str):
         return {"is_git": False, "files": {}}
     
     try:
-        # Get git status in porcelain format
-        result = subprocess.run(
-            ["git", "status", "--porcelain"],
-            cwd=base_real,
-            capture_output=True,
-            text=True,
-            check=True
-        )
-        
-        files = {}
-        for line in result.stdout.strip().split('\n'):
-            if not line:
-                continue
-            # Format: XY filename (note: there might be multiple spaces)
-            # X = index status, Y = working tree status
-            status_code = line[:2]
-            # Skip the status code and any whitespace to get the filename
-            filename = line[2:].lstrip()  # Remove status code and leading whitespace
-            
-            # Map git status codes to simple status
-            if status_code == "??":
-                status = "untracked"
-            elif status_code.startswith("A"):
-                status = "added"
-            elif status_code.startswith("M") or " M" in status_code:
-                status = "modified"
-            elif status_code.startswith("D"):
-                status = "deleted"
-            elif status_code.startswith("R"):
-                status = "renamed"
-            else:
-                status = "unknown"
-            
-            files[filename] = status
-        
-        # Get current branch
-        branch_result = subprocess.run(
-            ["git", "branch", "--show-current"],
-            cwd=base_real,
-            capture_output=True,
-            text=True,
-            check=True
-        )
-        
-        # Get remote URL
-        remote_result = subprocess.run(
-            ["git", "remote", "get-url", "origin"],
-            cwd=base_real,
-            capture_output=True,
-            text=True
-        )
-        
-        return {
-            "is_git": True,
-            "branch": branch_result.stdout.strip(),
-            "remote": remote_result.stdout.strip() if remote_result.returncode == 0 else None,
-            "files": files
-        }
-        
+        # One porcelain v2 call, memoized until the index, HEAD or the tree changes
+        return git_status_cache.status(base_real)
     except subprocess.CalledProcessError as e:
         raise HTTPException(500, f"Git command failed: {e.stderr}")
 
@@ -374,7 +501,11 @@ def git_diff(ws_id: str, path: Optional[str] = None):
         raise HTTPException(500, f"Git diff failed: {e.stderr}")
 
 @app.post("/v1/workspaces/{ws_id}/download")
-def download_workspace(ws_id: str, format: str = Query("zip", regex="^(zip|diff)$")):
+def download_workspace(
+    ws_id: str,
+    format: str = Query("zip", regex="^(zip|diff)$"),
+    compresslevel: int = Query(cfg.DOWNLOAD_DEFAULT_COMPRESSLEVEL, ge=0, le=9),
+):
     """Download workspace as ZIP or git diff"""
     ws_root = os.path.join(WORKSPACES_BASE, ws_id)
     base_real = os.path.realpath(ws_root)
@@ -386,101 +517,25 @@ def download_workspace(ws_id: str, format: str = Query("zip", regex="^(zip|diff)
         if not os.path.isdir(os.path.join(base_real, ".git")):
             raise HTTPException(400, "Not a git repository")
         
+        diff_chunks = iter_combined_diff(base_real)
         try:
-            # Get both staged and unstaged changes
-            staged_result = subprocess.run(
-                ["git", "diff", "--no-color", "--cached"],
-                cwd=base_real,
-                capture_output=True,
-                text=True,
-                check=True
-            )
-            
-            unstaged_result = subprocess.run(
-                ["git", "diff", "--no-color"],
-                cwd=base_real,
-                capture_output=True,
-                text=True,
-                check=True
-            )
-            
-            # Also get untracked files as diffs
-            untracked_result = subprocess.run(
-                ["git", "ls-files", "--others", "--exclude-standard"],
-                cwd=base_real,
-                capture_output=True,
-                text=True,
-                check=True
-            )
-            
-            # Combine all diffs
-            combined_diff = ""
-            
-            if staged_result.stdout.strip():
-                combined_diff += "# Staged Changes\n" + staged_result.stdout + "\n\n"
-            
-            if unstaged_result.stdout.strip():
-                combined_diff += "# Unstaged Changes\n" + unstaged_result.stdout + "\n\n"
-            
-            # Add untracked files as new file diffs
-            if untracked_result.stdout.strip():
-                combined_diff += "# Untracked Files\n"
-                for untracked_file in untracked_result.stdout.strip().split('\n'):
-                    if untracked_file.strip():
-                        try:
-                            file_path = os.path.join(base_real, untracked_file)
-                            with open(file_path, 'r', encoding='utf-8') as f:
-                                content = f.read()
-                            
-                            lines = content.split('\n')
-                            combined_diff += f"diff --git a/{untracked_file} b/{untracked_file}\n"
-                            combined_diff += "new file mode 100644\n"
-                            combined_diff += "index 0000000..0000000\n"
-                            combined_diff += "--- /dev/null\n"
-                            combined_diff += f"+++ b/{untracked_file}\n"
-                            combined_diff += f"@@ -0,0 +1,{len(lines)} @@\n"
-                            for line in lines:
-                                combined_diff += f"+{line}\n"
-                            combined_diff += "\n"
-                        except (UnicodeDecodeError, IOError):
-                            # Skip binary or unreadable files
-                            combined_diff += f"diff --git a/{untracked_file} b/{untracked_file}\n"
-                            combined_diff += "new file mode 100644\n"
-                            combined_diff += "Binary file (not shown)\n\n"
-            
-            # If no changes at all, provide a helpful message
-            if not combined_diff.strip():
-                combined_diff = "# No changes found\n# All files are up to date with the repository.\n"
-            
-            return StreamingResponse(
-                io.BytesIO(combined_diff.encode()),
-                media_type="text/plain",
-                headers={
-                    "Content-Disposition": f"attachment; filename=workspace_{ws_id}.diff"
-                }
-            )
-            
+            # Pull the first chunk eagerly so git failures still map to a 500
+            first = next(diff_chunks)
         except subprocess.CalledProcessError as e:
             raise HTTPException(500, f"Git diff failed: {e.stderr}")
+
+        return StreamingResponse(
+            itertools.chain([first], diff_chunks),
+            media_type="text/plain",
+            headers={
+                "Content-Disposition": f"attachment; filename=workspace_{ws_id}.diff"
+            }
+        )
     
     else:  # format == "zip"
-        # Create ZIP file
-        zip_buffer = io.BytesIO()
-        
-        with zipfile.ZipFile(zip_buffer, 'w', zipfile.ZIP_DEFLATED) as zipf:
-            for root, dirs, files in os.walk(base_real):
-                # Skip ignored directories
-                dirs[:] = [d for d in dirs if d not in IGNORE_DIRS]
-                
-                for file in files:
-                    file_path = os.path.join(root, file)
-                    arcname = os.path.relpath(file_path, base_real)
-                    zipf.write(file_path, arcname)
-        
-        zip_buffer.seek(0)
-        
+        # Stream the archive as entries are compressed instead of building it in memory
         return StreamingResponse(
-            zip_buffer,
+            iter_zip(base_real, IGNORE_DIRS, compresslevel),
             media_type="application/zip",
             headers={
                 "Content-Disposition": f"attachment; filename=workspace_{ws_id}.zip"
@@ -0,0 +1,314 @@
+import os
+import ast
+import hashlib
+import threading
+
+from config import SYMBOL_MAX_FILE_BYTES, SYMBOL_MAX_RESULTS
+from workspace_index import get_index
+
+
+class Symbol:
+    __slots__ = ("name", "qualname", "kind", "path", "line", "col")
+
+    def __init__(self, name, qualname, kind, path, line, col):
+        self.name = name
+        self.qualname = qualname
+        self.kind = kind
+        self.path = path
+        self.line = line
+        self.col = col
+
+    def to_dict(self):
+        return {
+            "name": self.name, "qualname": self.qualname, "kind": self.kind,
+            "path": self.path, "line": self.line, "col": self.col,
+        }
+
+
+def module_name(rel):
+    """Dotted module name for a workspace-relative .py path (pkg/__init__.py -> pkg)."""
+    parts = os.path.normpath(rel)[:-3].split(os.sep)
+    if parts[-1] == "__init__" and len(parts) > 1:
+        parts.pop()
+    return ".".join(parts)
+
+
+class _Collector(ast.NodeVisitor):
+    """Collects definitions (module, class, function, method, import) and references
+    (call, import, name) of one module, with dotted qualnames for definitions."""
+
+    def __init__(self, rel):
+        self.rel = rel
+        self.module = module_name(rel)
+        self.scope = [self.module]
+        self.in_class = [False]
+        self.definitions = [Symbol(self.module.rsplit(".", 1)[-1], self.module, "module", rel, 1, 0)]
+        self.references = []
+
+    def _define(self, name, kind, node):
+        self.definitions.append(Symbol(name, f"{self.scope[-1]}.{name}", kind, self.rel, node.lineno, node.col_offset))
+
+    def _refer(self, name, kind, node):
+        self.references.append(Symbol(name, None, kind, self.rel, node.lineno, node.col_offset))
+
+    def _refer_attribute(self, node, kind):
+        # Where .attr itself is, not the start of the value expression before it
+        self.references.append(Symbol(
+            node.attr, None, kind, self.rel, node.end_lineno, node.end_col_offset - len(node.attr),
+        ))
+
+    def _visit_scope(self, node, kind, is_class):
+        self._define(node.name, kind, node)
+        for decorator in node.decorator_list:
+            self.visit(decorator)
+        self.scope.append(f"{self.scope[-1]}.{node.name}")
+        self.in_class.append(is_class)
+        for child in node.body:
+            self.visit(child)
+        self.in_class.pop()
+        self.scope.pop()
+
+    def visit_ClassDef(self, node):
+        for base in node.bases + [k.value for k in node.keywords]:
+            self.visit(base)
+        self._visit_scope(node, "class", True)
+
+    def visit_FunctionDef(self, node):
+        self.visit(node.args)
+        if node.returns is not None:
+            self.visit(node.returns)
+        self._visit_scope(node, "method" if self.in_class[-1] else "function", False)
+
+    visit_AsyncFunctionDef = visit_FunctionDef
+
+    def visit_Import(self, node):
+        for alias in node.names:
+            self._define(alias.asname or alias.name.split(".")[0], "import", node)
+            self._refer(alias.name.rsplit(".", 1)[-1], "import", node)
+
+    def visit_ImportFrom(self, node):
+        for alias in node.names:
+            if alias.name == "*":
+                continue
+            self._define(alias.asname or alias.name, "import", node)
+            self._refer(alias.name, "import", node)
+
+    def visit_Call(self, node):
+        func = node.func
+        if isinstance(func, ast.Name):
+            self._refer(func.id, "call", func)
+        elif isinstance(func, ast.Attribute):
+            self._refer_attribute(func, "call")
+            self.visit(func.value)
+        else:
+            self.visit(func)
+        for arg in node.args + [k.value for k in node.keywords]:
+            self.visit(arg)
+
+    def visit_Name(self, node):
+        if isinstance(node.ctx, ast.Load):
+            self._refer(node.id, "name", node)
+
+    def visit_Attribute(self, node):
+        if isinstance(node.ctx, ast.Load):
+            self._refer_attribute(node, "name")
+        self.visit(node.value)
+
+
+class _FileSymbols:
+    __slots__ = ("identity", "digest", "definitions", "references", "error")
+
+    def __init__(self, identity, digest, definitions=(), references=(), error=None):
+        self.identity = identity
+        self.digest = digest
+        self.definitions = list(definitions)
+        self.references = list(references)
+        self.error = error
+
+
+class SymbolIndex:
+    """Definitions and references of every Python file in one workspace.
+
+    A refresh stats the .py files from the workspace file index; a file whose
+    (size, mtime, inode) moved is hashed, and only re-parsed if its content hash
+    changed. Lookups go through name -> files maps so they don't scan every file.
+    """
+
+    def __init__(self, root):
+        self.root = os.path.realpath(root)
+        self._lock = threading.Lock()
+        self._files = {}      # rel path -> _FileSymbols
+        self._def_files = {}  # name -> set of rel paths defining it
+        self._ref_files = {}  # name -> set of rel paths referring to it
+        self._dirty = set()
+        self.parsed = 0
+
+    def _unlink(self, rel):
+        entry = self._files.pop(rel, None)
+        if entry is None:
+            return
+        for table, symbols in ((self._def_files, entry.definitions), (self._ref_files, entry.references)):
+            for name in {s.name for s in symbols}:
+                paths = table.get(name)
+                if paths is not None:
+                    paths.discard(rel)
+                    if not paths:
+                        del table[name]
+
+    def _load(self, rel, identity):
+        previous = self._files.get(rel)
+        try:
+            with open(os.path.join(self.root, rel), "rb") as f:
+                source = f.read(SYMBOL_MAX_FILE_BYTES + 1)
+        except OSError:
+            self._unlink(rel)
+            return
+        digest = hashlib.blake2b(source, digest_size=16).digest()
+        if previous is not None and previous.digest == digest:
+            previous.identity = identity
+            return
+        self._unlink(rel)
+        if len(source) > SYMBOL_MAX_FILE_BYTES:
+            entry = _FileSymbols(identity, digest, error="file too large to index")
+        else:
+            try:
+                collector = _Collector(rel)
+                collector.visit(ast.parse(source, filename=rel))
+                entry = _FileSymbols(identity, digest, collector.definitions, collector.references)
+            except (SyntaxError, ValueError, RecursionError) as e:
+                entry = _FileSymbols(identity, digest, error=str(e))
+            self.parsed += 1
+        self._files[rel] = entry
+        for table, symbols in ((self._def_files, entry.definitions), (self._ref_files, entry.references)):
+            for name in {s.name for s in symbols}:
+                table.setdefault(name, set()).add(rel)
+
+    def refresh(self):
+        entries, _ = get_index(self.root).page()
+        with self._lock:
+            live = {rel for rel in entries if rel.endswith(".py")}
+            for rel in list(self._files):
+                if rel not in live:
+                    self._unlink(rel)
+            for rel in sorted(live):
+                try:
+                    st = os.stat(os.path.join(self.root, rel))
+                except OSError:
+                    continue
+                identity = (st.st_size, st.st_mtime_ns, st.st_ino)
+                entry = self._files.get(rel)
+                if entry is None or entry.identity != identity or rel in self._dirty:
+                    self._load(rel, identity)
+            self._dirty.clear()
+
+    def mark_dirty(self, rel_path):
+        with self._lock:
+            self._dirty.add(os.path.normpath(rel_path))
+
+    def definitions(self, name):
+        """Definitions whose qualname is name or ends with .name (e.g. 'Cls.method', 'pkg.mod')."""
+        self.refresh()
+        last = name.rsplit(".", 1)[-1]
+        with self._lock:
+            found = [
+                s for rel in sorted(self._def_files.get(last, ()))
+                for s in self._files[rel].definitions
+                if s.name == last and (s.qualname == name or s.qualname.endswith("." + name))
+            ]
+        # Real definitions before import bindings
+        return sorted(found, key=lambda s: (s.kind == "import", s.path, s.line))
+
+    def references(self, name):
+        """Call sites, imports and other uses of the last component of name."""
+        self.refresh()
+        last = name.rsplit(".", 1)[-1]
+        with self._lock:
+            return [
+                s for rel in sorted(self._ref_files.get(last, ()))
+                for s in self._files[rel].references
+                if s.name == last
+            ]
+
+    def stats(self):
+        with self._lock:
+            return {
+                "files": len(self._files),
+                "parse_errors": sum(1 for e in self._files.values() if e.error),
+                "parsed": self.parsed,
+            }
+
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+
+def get_symbol_index(root):
+    root = os.path.realpath(root)
+    with _indexes_lock:
+        index = _indexes.get(root)
+        if index is None:
+            index = _indexes[root] = SymbolIndex(root)
+    return index
+
+
+def build_in_background(root):
+    """Parse a freshly uploaded or cloned workspace so the first lookup is fast."""
+    threading.Thread(target=get_symbol_index(root).refresh, daemon=True).start()
+
+
+def forget(root):
+    """Drop the index of a deleted workspace."""
+    with _indexes_lock:
+        _indexes.pop(os.path.realpath(root), None)
+
+
+def notify_changed(root, rel_path):
+    """Called after a tool writes rel_path; a no-op if the workspace has no index yet."""
+    index = _indexes.get(os.path.realpath(root))
+    if index is not None:
+        index.mark_dirty(rel_path)
+
+
+_LOOKUPS = {
+    "definitions": "No definition of \"{}\" found in the workspace's Python files",
+    "references": "No references to \"{}\" found in the workspace's Python files",
+}
+
+
+def lookup(working_directory, name, max_results, what):
+    """The find_definition / find_references tools: what is "definitions" or "references"."""
+    if not name:
+        return "Error: name is required"
+    abs_working_dir = os.path.realpath(working_directory)
+    if not os.path.isdir(abs_working_dir):
+        return f'Error: Working directory does not exist: {working_directory}'
+    try:
+        limit = min(int(max_results or SYMBOL_MAX_RESULTS), SYMBOL_MAX_RESULTS)
+    except (TypeError, ValueError):
+        return "Error: max_results must be an integer"
+    try:
+        symbols = getattr(get_symbol_index(abs_working_dir), what)(name)
+    except Exception as e:
+        return f"Error: looking up {what}: {e}"
+    if not symbols:
+        return _LOOKUPS[what].format(name)
+    return format_symbols(abs_working_dir, symbols, limit)
+
+
+def format_symbols(root, symbols, limit):
+    """path:line: kind qualname  source-line, for the first limit symbols."""
+    lines = []
+    sources = {}
+    for s in symbols[:limit]:
+        if s.path not in sources:
+            try:
+                with open(os.path.join(root, s.path), "r", encoding="utf-8", errors="replace") as f:
+                    sources[s.path] = f.read().splitlines()
+            except OSError:
+                sources[s.path] = []
+        text = sources[s.path][s.line - 1].strip() if s.line <= len(sources[s.path]) else ""
+        label = f"{s.kind} {s.qualname}" if s.qualname else s.kind
+        lines.append(f"{s.path}:{s.line}: [{label}] {text}")
+    if len(symbols) > limit:
+        lines.append(f"[...{len(symbols) - limit} more not shown]")
+    return "\n".join(lines)
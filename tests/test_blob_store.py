@@ -0,0 +1,107 @@
+import os
+import shutil
+
+import pytest
+
+import workspace_fork
+from blob_store import BlobStore
+from functions.run_python_file import run_python_file
+from interpreter_pool import interpreter_pool
+
+
+@pytest.fixture
+def store(tmp_path):
+    return BlobStore(str(tmp_path / "blobs"), min_bytes=1)
+
+
+def make_workspace(tmp_path, name, files):
+    root = tmp_path / name
+    for rel, content in files.items():
+        path = root / rel
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(content)
+    return root
+
+
+def test_identical_files_share_one_blob(tmp_path, store):
+    a = make_workspace(tmp_path, "a", {"lib/big.txt": b"y" * 1000, "own.txt": b"a", ".git/HEAD": b"ref"})
+    b = make_workspace(tmp_path, "b", {"lib/big.txt": b"y" * 1000, "own.txt": b"b"})
+    assert store.add_tree(str(a)) == {"stored": 2, "deduplicated": 0}
+    assert store.add_tree(str(b)) == {"stored": 1, "deduplicated": 1}
+    assert os.path.samefile(a / "lib/big.txt", b / "lib/big.txt")
+    assert os.stat(a / ".git/HEAD").st_nlink == 1
+
+
+def test_files_with_different_modes_stay_apart(tmp_path, store):
+    a = make_workspace(tmp_path, "a", {"run.sh": b"echo hi\n", "notes.txt": b"echo hi\n"})
+    os.chmod(a / "run.sh", 0o755)
+    store.add_tree(str(a))
+    assert not os.path.samefile(a / "run.sh", a / "notes.txt")
+    assert os.stat(a / "run.sh").st_mode & 0o111
+
+
+def test_collect_counts_savings_and_deletes_unused_blobs(tmp_path, store):
+    workspaces = [make_workspace(tmp_path, name, {"big.txt": b"y" * 1000, "own.txt": name.encode()}) for name in "abc"]
+    for root in workspaces:
+        store.add_tree(str(root))
+    # Three links to big.txt stored once; each own.txt is used once
+    assert store.collect() == 2000
+    assert store.saved_bytes() == 2000
+    assert store.stats()["blobs"] == 4
+
+    shutil.rmtree(workspaces[0])
+    assert store.collect() == 1000
+    assert store.stats()["blobs"] == 3
+    assert store.stats()["collected"] == 1
+
+    for root in workspaces[1:]:
+        shutil.rmtree(root)
+    assert store.collect() == 0
+    assert store.stats()["blobs"] == 0
+
+
+def test_small_files_and_other_filesystems_are_skipped(tmp_path, store):
+    a = make_workspace(tmp_path, "a", {"tiny": b"x", "big.txt": b"y" * 1000})
+    store.min_bytes = 2
+    assert store.add_tree(str(a)) == {"stored": 1, "deduplicated": 0}
+    assert os.stat(a / "tiny").st_nlink == 1
+
+    b = make_workspace(tmp_path, "b", {"big.txt": b"y" * 1000})
+    store.device = -1
+    assert store.add_tree(str(b)) == {"stored": 0, "deduplicated": 0}
+    assert os.stat(b / "big.txt").st_nlink == 1
+
+
+@pytest.fixture
+def linked_workspaces(tmp_path, store):
+    workspace_fork.keep_linked(store.contains)
+    roots = []
+    for name in "ab":
+        root = make_workspace(tmp_path, name, {"data.txt": b"shared\n", "notes.txt": b"notes\n"})
+        (root / "main.py").write_text(
+            "print(open('data.txt').read().strip())\n"
+            "with open('notes.txt', 'a') as f:\n"
+            "    f.write('more\\n')\n"
+        )
+        store.add_tree(str(root))
+        roots.append(root)
+    yield roots
+    workspace_fork.keep_linked(None)
+    interpreter_pool.close()
+
+
+@pytest.mark.parametrize("warm", [True, False])
+def test_script_runs_keep_links_it_doesnt_write(linked_workspaces, monkeypatch, warm):
+    if not warm:
+        monkeypatch.setattr(interpreter_pool, "size", 0)
+    a, b = linked_workspaces
+    assert os.stat(a / "data.txt").st_nlink == 3
+
+    result = run_python_file(str(a), "main.py")
+    assert result == "STDOUT:\nshared\n"
+    # Read-only files stay shared; the written one was copied first, so b never sees the write
+    assert os.path.samefile(a / "data.txt", b / "data.txt")
+    assert os.stat(a / "data.txt").st_nlink == 3
+    assert (a / "notes.txt").read_bytes() == b"notes\nmore\n"
+    assert (b / "notes.txt").read_bytes() == b"notes\n"
+    assert os.stat(a / "notes.txt").st_nlink == 1
@@ -0,0 +1,40 @@
+from google.genai import types
+
+from call_funtion import plan_call_levels
+
+
+def call(name, **args):
+    return types.FunctionCall(name=name, args=args)
+
+
+def test_reads_of_different_files_share_a_level():
+    calls = [call("get_file_content", file_path="a.py"), call("get_file_content", file_path="b.py")]
+    assert plan_call_levels(calls) == [[0, 1]]
+
+
+def test_write_waits_for_earlier_read_of_same_file():
+    calls = [
+        call("get_file_content", file_path="a.py"),
+        call("write_file_content", file_path="./a.py", content="x"),
+        call("get_file_content", file_path="b.py"),
+    ]
+    assert plan_call_levels(calls) == [[0, 2], [1]]
+
+
+def test_read_after_write_of_same_file_waits():
+    calls = [call("write_file_content", file_path="a.py", content="x"), call("get_file_content", file_path="a.py")]
+    assert plan_call_levels(calls) == [[0], [1]]
+
+
+def test_listing_waits_for_every_earlier_write():
+    calls = [call("write_file_content", file_path="a.py", content="x"), call("get_files_info", directory=".")]
+    assert plan_call_levels(calls) == [[0], [1]]
+
+
+def test_unknown_call_is_a_barrier():
+    calls = [
+        call("get_file_content", file_path="a.py"),
+        call("run_python_file", file_path="main.py"),
+        call("get_file_content", file_path="b.py"),
+    ]
+    assert plan_call_levels(calls) == [[0], [1], [2]]
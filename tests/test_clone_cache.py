@@ -0,0 +1,68 @@
+import shutil
+import subprocess
+
+import pytest
+
+from clone_cache import CloneCache
+
+pytestmark = pytest.mark.skipif(shutil.which("git") is None, reason="needs git")
+
+
+def _git(cwd, *args):
+    return subprocess.run(
+        ["git", "-c", "user.name=t", "-c", "user.email=t@t", *args],
+        cwd=cwd, check=True, capture_output=True, text=True,
+    ).stdout
+
+
+@pytest.fixture
+def origin(tmp_path):
+    repo = tmp_path / "origin"
+    repo.mkdir()
+    _git(repo, "init", "-q", "-b", "main")
+    (repo / "a.txt").write_text("a\n")
+    _git(repo, "add", ".")
+    _git(repo, "commit", "-q", "-m", "init")
+    return repo
+
+
+def _cache(tmp_path, **kwargs):
+    cache = CloneCache(root=str(tmp_path / "cache"), **kwargs)
+    cache.start()
+    return cache
+
+
+def test_missing_branch_fails_without_a_direct_clone(tmp_path, origin):
+    cache = _cache(tmp_path, max_bytes=1 << 30, fetch_interval=3600)
+    cache.clone(str(origin), "main", str(tmp_path / "ws1"))
+    assert (tmp_path / "ws1" / "a.txt").read_text() == "a\n"
+
+    with pytest.raises(subprocess.CalledProcessError):
+        cache.clone(str(origin), "nope", str(tmp_path / "ws2"))
+    assert cache.stats()["fallbacks"] == 0
+
+    # A branch pushed after the last fetch is fetched on demand
+    _git(origin, "branch", "later")
+    cache.clone(str(origin), "later", str(tmp_path / "ws3"))
+    assert cache.stats()["fallbacks"] == 0
+
+
+def test_unreachable_remote_falls_back(tmp_path):
+    cache = _cache(tmp_path, max_bytes=1 << 30)
+    with pytest.raises(subprocess.CalledProcessError):
+        cache.clone(str(tmp_path / "missing"), "main", str(tmp_path / "ws"))
+    assert cache.stats()["fallbacks"] == 1
+
+
+def test_evicted_mirrors_are_removed(tmp_path, origin):
+    other = tmp_path / "other"
+    shutil.copytree(origin, other)
+    cache = _cache(tmp_path, max_bytes=1)
+    cache.clone(str(origin), "main", str(tmp_path / "ws1"))
+    cache.clone(str(other), "main", str(tmp_path / "ws2"))
+
+    stats = cache.stats()
+    assert stats["evictions"] == 1 and stats["mirrors"] == 1
+    assert len(list((tmp_path / "cache").iterdir())) == 1
+    # The workspace doesn't depend on its evicted mirror
+    assert _git(tmp_path / "ws1", "log", "--oneline").strip()
@@ -0,0 +1,50 @@
+from google.genai import types
+
+from context_compaction import ContextManager
+
+
+def tool_turn(name, file_path, result):
+    call = types.Content(role="model", parts=[types.Part(function_call=types.FunctionCall(name=name, args={"file_path": file_path}))])
+    response = types.Content(role="tool", parts=[types.Part.from_function_response(name=name, response={"result": result})])
+    return [call, response]
+
+
+def history(*turns):
+    messages = [types.Content(role="user", parts=[types.Part(text="fix the bug")])]
+    for turn in turns:
+        messages.extend(tool_turn(*turn))
+    return messages
+
+
+def result_of(message):
+    return message.parts[0].function_response.response["result"]
+
+
+def test_under_budget_is_left_alone():
+    messages = history(("get_file_content", "a.py", "x" * 5000))
+    manager = ContextManager(messages, budget=10_000, keep_recent=0)
+    assert manager.compact() == 0
+    assert result_of(messages[2]) == "x" * 5000
+
+
+def test_recent_turns_are_protected():
+    messages = history(("get_file_content", "a.py", "a" * 5000), ("get_file_content", "b.py", "b" * 5000))
+    manager = ContextManager(messages, budget=100, keep_recent=1)
+    assert manager.compact() > 0
+    assert result_of(messages[2]).startswith("[Compacted: output of get_file_content(file_path='a.py')")
+    assert result_of(messages[4]) == "b" * 5000
+
+
+def test_stale_reads_go_first():
+    messages = history(
+        ("get_file_content", "b.py", "b" * 5000),
+        ("get_file_content", "a.py", "a" * 5000),
+        ("get_file_content", "a.py", "A" * 5000),
+    )
+    manager = ContextManager(messages, budget=3000, keep_recent=1)
+    saved = manager.compact()
+    # b.py is older, but the later read of a.py made the first one stale
+    assert result_of(messages[2]) == "b" * 5000
+    assert result_of(messages[4]).startswith("[Compacted:")
+    assert manager.estimate_tokens() <= 3000
+    assert manager.tokens_saved == saved
@@ -0,0 +1,45 @@
+import pytest
+
+import functions.edit_file_content as edit_module
+from functions.edit_file_content import edit_file_content
+
+CONTENT = "def add(a, b):\n    return a + b\n\n\ndef sub(a, b):\n    return a - b\n"
+
+EDITS = [
+    {"search_pattern": "return a + b", "replacement_text": "return b + a"},
+    {"search_pattern": r"def (\w+)\(a, b\):", "replacement_text": r"def \1(a, b, c=0):", "mode": "regex"},
+    {"search_pattern": "    return a - b\n", "replacement_text": "    # subtract\n", "mode": "insert_before"},
+    {"search_pattern": "return a + b", "replacement_text": "return a + b"},
+    {"search_pattern": "nothing like this", "replacement_text": "x"},
+]
+
+
+def run_both(tmp_path, monkeypatch, **kwargs):
+    """Result and resulting content of the same edit on the in-memory and the streaming path."""
+    outcomes = []
+    for streaming in (False, True):
+        monkeypatch.setattr(edit_module, "EDIT_STREAM_MIN_BYTES", 1 if streaming else 1 << 30)
+        (tmp_path / "m.py").write_text(CONTENT)
+        result = edit_file_content(str(tmp_path), "m.py", **kwargs)
+        outcomes.append((result, (tmp_path / "m.py").read_text()))
+    return outcomes
+
+
+@pytest.mark.parametrize("edit", EDITS, ids=lambda e: e.get("mode", "replace") + ":" + e["search_pattern"][:12])
+def test_streaming_path_reports_like_the_in_memory_one(tmp_path, monkeypatch, edit):
+    small, large = run_both(tmp_path, monkeypatch, **edit)
+    assert large == small
+
+
+def test_batch_reports_match(tmp_path, monkeypatch):
+    small, large = run_both(tmp_path, monkeypatch, edits=EDITS[:3])
+    assert large == small
+    assert small[0] == 'Success: Applied 3 edits to "m.py" - 4 lines modified (+4/-3)'
+
+
+def test_huge_regex_match_is_not_copied(tmp_path, monkeypatch):
+    monkeypatch.setattr(edit_module, "EDIT_STREAM_MIN_BYTES", 1)
+    (tmp_path / "big.txt").write_text("line\n" * 100_000)
+    result = edit_file_content(str(tmp_path), "big.txt", r"(?s)line.*", "gone\n", mode="regex")
+    assert result == 'Success: Edited "big.txt" - 100001 lines modified using regex mode'
+    assert (tmp_path / "big.txt").read_text() == "gone\n"
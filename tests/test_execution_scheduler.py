@@ -0,0 +1,72 @@
+import threading
+import time
+
+import pytest
+
+from execution_scheduler import ExecutionScheduler
+
+
+def queue_jobs(scheduler, jobs, order):
+    """Start one thread per (workspace, priority, name), each waiting in the queue before the next starts."""
+    threads = []
+    for workspace, priority, name in jobs:
+        def job(workspace=workspace, priority=priority, name=name):
+            with scheduler.slot(workspace, priority):
+                order.append(name)
+
+        queued = scheduler.queued
+        thread = threading.Thread(target=job)
+        thread.start()
+        threads.append(thread)
+        while scheduler.queued == queued:
+            time.sleep(0.001)
+    return threads
+
+
+def run_queued(jobs, slots=1):
+    scheduler = ExecutionScheduler(slots, max_queued=100, queue_timeout=10)
+    order = []
+    with scheduler.slot("a"):
+        threads = queue_jobs(scheduler, jobs, order)
+    for thread in threads:
+        thread.join()
+    return order, scheduler
+
+
+def test_workspaces_take_turns():
+    order, _ = run_queued([("a", 10, "a1"), ("a", 10, "a2"), ("a", 10, "a3"), ("b", 10, "b1"), ("b", 10, "b2")])
+    # a was served last (the job holding the slot), so b goes first, then they alternate
+    assert order == ["b1", "a1", "b2", "a2", "a3"]
+
+
+def test_lower_priority_number_goes_first():
+    order, _ = run_queued([("a", 10, "low"), ("b", 10, "low2"), ("c", 0, "urgent")])
+    assert order[0] == "urgent"
+
+
+def test_stats_after_drain():
+    _, scheduler = run_queued([("a", 10, "a1"), ("b", 10, "b1")])
+    stats = scheduler.stats()
+    assert stats["active"] == stats["queued"] == 0
+    assert stats["completed"] == 3
+
+
+def test_full_queue_is_rejected():
+    scheduler = ExecutionScheduler(1, max_queued=1, queue_timeout=10)
+    with scheduler.slot("a"):
+        threads = queue_jobs(scheduler, [("b", 10, "b1")], [])
+        with pytest.raises(TimeoutError):
+            with scheduler.slot("c"):
+                pass
+    threads[0].join()
+    assert scheduler.stats()["rejected"] == 1
+
+
+def test_wait_times_out():
+    scheduler = ExecutionScheduler(1, max_queued=10, queue_timeout=0.05)
+    with scheduler.slot("a"):
+        with pytest.raises(TimeoutError):
+            with scheduler.slot("b"):
+                pass
+    stats = scheduler.stats()
+    assert stats["timed_out"] == 1 and stats["queued"] == 0
@@ -0,0 +1,47 @@
+import pytest
+
+import line_index
+from line_index import LineIndex
+
+
+@pytest.fixture
+def lines_file(tmp_path):
+    # Varying line lengths so checkpoints don't fall at regular offsets
+    lines = [b"line %d %s\n" % (n, b"x" * (n % 13)) for n in range(1, 1001)]
+    path = tmp_path / "lines.txt"
+    path.write_bytes(b"".join(lines))
+    return path, lines
+
+
+@pytest.mark.parametrize("stride", [1, 3, 256])
+@pytest.mark.parametrize("chunk_size", [5, 1024 * 1024])
+def test_seek_line_matches_readlines(lines_file, monkeypatch, stride, chunk_size):
+    monkeypatch.setattr(line_index, "SCAN_CHUNK_SIZE", chunk_size)
+    path, lines = lines_file
+    index = LineIndex(stride)
+    with open(path, "rb") as f:
+        # Out of order, so later seeks go back over checkpoints already built
+        for line in (1, 500, 2, 257, 1000, 999, 256, 3):
+            assert index.seek_line(f, line)
+            assert f.readline() == lines[line - 1]
+
+
+def test_past_the_end(lines_file):
+    path, _ = lines_file
+    index = LineIndex(7)
+    with open(path, "rb") as f:
+        assert not index.seek_line(f, 1002)
+        assert index.complete
+        # One past the last line is the (empty) end of the file
+        assert index.seek_line(f, 1001)
+        assert f.readline() == b""
+
+
+def test_scans_only_as_far_as_needed(lines_file, monkeypatch):
+    monkeypatch.setattr(line_index, "SCAN_CHUNK_SIZE", 64)
+    path, _ = lines_file
+    index = LineIndex(10)
+    with open(path, "rb") as f:
+        index.seek_line(f, 25)
+        assert not index.complete
+        assert 3 <= len(index.checkpoints) < 10
@@ -0,0 +1,40 @@
+import re
+
+import file_ops
+from file_ops import rewrite_spans
+
+
+def rewrite(tmp_path, data, find_spans):
+    src, dst = tmp_path / "src", tmp_path / "dst"
+    src.write_bytes(data)
+    count = rewrite_spans(str(src), str(dst), find_spans)
+    return count, dst.read_bytes()
+
+
+def replace_all(old, new):
+    return lambda buf: ((m.start(), m.end(), new) for m in re.finditer(re.escape(old), buf))
+
+
+def test_replaces_every_span(tmp_path):
+    assert rewrite(tmp_path, b"foo bar foo\nfoo", replace_all(b"foo", b"quux")) == (3, b"quux bar quux\nquux")
+
+
+def test_spans_at_the_edges_and_deletions(tmp_path):
+    spans = lambda buf: iter([(0, 2, b""), (len(buf) - 1, len(buf), b"!")])
+    assert rewrite(tmp_path, b"abcdef", spans) == (2, b"cde!")
+
+
+def test_no_spans_copies_the_file(tmp_path):
+    assert rewrite(tmp_path, b"unchanged", lambda buf: iter(())) == (0, b"unchanged")
+
+
+def test_empty_file(tmp_path):
+    assert rewrite(tmp_path, b"", replace_all(b"x", b"y")) == (0, b"")
+
+
+def test_copies_in_chunks(tmp_path, monkeypatch):
+    monkeypatch.setattr(file_ops, "COPY_CHUNK_SIZE", 7)
+    data = b"".join(b"line %d needle\n" % i for i in range(100))
+    count, out = rewrite(tmp_path, data, replace_all(b"needle", b"pin"))
+    assert count == 100
+    assert out == data.replace(b"needle", b"pin")
@@ -0,0 +1,66 @@
+import re
+
+import pytest
+
+import workspace_index
+from functions.search_code import search_code
+from search_index import TrigramIndex, literal_runs
+
+
+@pytest.mark.parametrize("pattern, flags, expected", [
+    ("def handle_request", 0, ["def handle_request"]),
+    (r"foo\d+barbaz", 0, ["foo", "barbaz"]),
+    ("get_(file|dir)_info", 0, ["get_", "_info"]),
+    ("ab.cd", 0, []),                      # runs shorter than a trigram are useless
+    ("x*yz_literal", 0, ["yz_literal"]),  # x is optional, so it can't be required
+    ("(", 0, []),                          # invalid regex
+    ("héllo", re.IGNORECASE, []),          # the index only folds ASCII case
+    ("héllo", 0, ["héllo"]),
+])
+def test_literal_runs(pattern, flags, expected):
+    assert literal_runs(pattern, flags) == expected
+
+
+@pytest.fixture
+def workspace(tmp_path):
+    (tmp_path / "a.py").write_text("def handle_request(req):\n    return req\n")
+    (tmp_path / "b.py").write_text("HANDLE_REQUEST = None\n")
+    (tmp_path / "c.bin").write_bytes(b"\0handle_request")
+    yield tmp_path
+    workspace_index.forget(tmp_path)
+
+
+def test_candidates_narrow_by_trigram_ignoring_case(workspace):
+    index = TrigramIndex(workspace)
+    assert index.candidates(["handle_request"]) == ["a.py", "b.py"]
+    assert index.candidates(["return"]) == ["a.py"]
+    assert index.candidates(["nowhere"]) == []
+    # No required literals: every indexed (text) file is a candidate
+    assert index.candidates([]) == ["a.py", "b.py"]
+
+
+def test_changed_added_and_removed_files(workspace):
+    index = TrigramIndex(workspace)
+    assert index.candidates(["return"]) == ["a.py"]
+    (workspace / "a.py").write_text("def handle_request(req):\n    raise ValueError(req)\n")
+    (workspace / "b.py").unlink()
+    (workspace / "d.py").write_text("return 1\n")
+    workspace_index.notify_tree_changed(workspace)
+    assert index.candidates(["return"]) == ["d.py"]
+    assert index.candidates(["handle_request"]) == ["a.py"]
+
+
+def test_agent_writes_are_indexed_without_a_sweep(workspace):
+    index = TrigramIndex(workspace)
+    assert index.candidates(["return"]) == ["a.py"]
+    (workspace / "e.py").write_text("return 2\n")
+    index.mark_dirty("e.py")
+    # Not reported, so not seen until a script run or the rescan interval forces a sweep
+    (workspace / "b.py").write_text("return 3\n")
+    assert index.candidates(["return"]) == ["a.py", "e.py"]
+    workspace_index.notify_tree_changed(workspace)
+    assert index.candidates(["return"]) == ["a.py", "b.py", "e.py"]
+
+
+def test_bad_max_results_is_an_error(workspace):
+    assert search_code(str(workspace), "handle", max_results="ten") == "Error: max_results must be an integer"
@@ -0,0 +1,22 @@
+from symbol_index import lookup, get_symbol_index
+
+
+def test_attribute_references_point_at_the_attribute(tmp_path):
+    (tmp_path / "app.py").write_text(
+        "import parser\n"
+        "result = config.settings.parse(text)\n"
+        "value = (first\n"
+        "         .parse)\n"
+    )
+    refs = get_symbol_index(str(tmp_path)).references("parse")
+    assert [(s.kind, s.line, s.col) for s in refs] == [("call", 2, 25), ("name", 4, 10)]
+
+
+def test_lookup(tmp_path):
+    (tmp_path / "mod.py").write_text("class Parser:\n    def parse(self):\n        pass\n\nParser().parse()\n")
+    root = str(tmp_path)
+    assert lookup(root, "Parser.parse", None, "definitions") == "mod.py:2: [method mod.Parser.parse] def parse(self):"
+    assert lookup(root, "parse", 5, "references") == "mod.py:5: [call] Parser().parse()"
+    assert lookup(root, "missing", None, "references").startswith('No references to "missing"')
+    assert lookup(root, "parse", "lots", "definitions") == "Error: max_results must be an integer"
+    assert lookup(root, "", None, "definitions") == "Error: name is required"
@@ -0,0 +1,60 @@
+import shutil
+import subprocess
+
+import pytest
+
+from workspace_git import parse_status_v2
+
+
+def test_parse_status_v2():
+    output = "\0".join([
+        "# branch.oid 1234567890abcdef1234567890abcdef12345678",
+        "# branch.head main",
+        "# branch.upstream origin/main",
+        "# branch.ab +1 -0",
+        "1 .M N... 100644 100644 100644 aaaa bbbb src/app.py",
+        "1 A. N... 000000 100644 100644 0000 cccc new file.py",
+        "1 D. N... 100644 000000 000000 dddd 0000 gone.py",
+        "2 R. N... 100644 100644 100644 eeee eeee R100 renamed.py",
+        "old name.py",
+        "u UU N... 100644 100644 100644 100644 ffff 1111 2222 conflict.py",
+        "? untracked dir/notes.txt",
+        "",
+    ])
+    branch, files = parse_status_v2(output)
+    assert branch == "main"
+    assert files == {
+        "src/app.py": "modified",
+        "new file.py": "added",
+        "gone.py": "deleted",
+        "renamed.py": "renamed",
+        "conflict.py": "unknown",
+        "untracked dir/notes.txt": "untracked",
+    }
+
+
+def test_detached_head_and_clean_tree():
+    assert parse_status_v2("# branch.oid abc\0# branch.head (detached)\0") == ("", {})
+    assert parse_status_v2("") == ("", {})
+
+
+@pytest.mark.skipif(shutil.which("git") is None, reason="needs git")
+def test_real_git_output(tmp_path):
+    def git(*args):
+        return subprocess.run(
+            ["git", "-c", "user.name=t", "-c", "user.email=t@t", *args],
+            cwd=tmp_path, check=True, capture_output=True, text=True,
+        ).stdout
+
+    git("init", "-q", "-b", "work")
+    (tmp_path / "kept.py").write_text("a\n")
+    (tmp_path / "moved.py").write_text("b\n" * 20)
+    git("add", ".")
+    git("commit", "-q", "-m", "init")
+    (tmp_path / "kept.py").write_text("changed\n")
+    git("mv", "moved.py", "has space.py")
+    (tmp_path / "new.txt").write_text("new\n")
+
+    branch, files = parse_status_v2(git("status", "--porcelain=v2", "--branch", "-z"))
+    assert branch == "work"
+    assert files == {"kept.py": "modified", "has space.py": "renamed", "new.txt": "untracked"}
@@ -0,0 +1,64 @@
+import os
+
+import pytest
+
+import workspace_index
+from workspace_index import WorkspaceIndex
+
+
+@pytest.fixture
+def tree(tmp_path):
+    for rel in ("a.py", "pkg/b.py", "pkg/sub/c.py", "node_modules/x.js", ".git/HEAD"):
+        path = tmp_path / rel
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text("x")
+    yield tmp_path
+    workspace_index.forget(tmp_path)
+
+
+def listing(index):
+    return index.page()[0]
+
+
+def test_first_refresh_lists_every_file_outside_ignored_dirs(tree):
+    assert listing(WorkspaceIndex(tree)) == ["a.py", "pkg/b.py", "pkg/sub/c.py"]
+
+
+def test_agent_writes_rescan_only_their_directories(tree, monkeypatch):
+    index = WorkspaceIndex(tree)
+    listing(index)
+    scanned = []
+    scan = index._scan
+    monkeypatch.setattr(index, "_scan", lambda rel_dir: scanned.append(rel_dir) or scan(rel_dir))
+
+    (tree / "pkg/new/deep").mkdir(parents=True)
+    (tree / "pkg/new/deep/d.py").write_text("x")
+    (tree / "node_modules/y.js").write_text("x")
+    workspace_index.notify_changed(tree, "pkg/new/deep/d.py")
+    workspace_index.notify_changed(tree, "node_modules/y.js")
+    index.mark_dirty("pkg/new/deep/d.py")
+    index.mark_dirty("node_modules/y.js")
+    assert listing(index) == ["a.py", "pkg/b.py", "pkg/new/deep/d.py", "pkg/sub/c.py"]
+    assert "pkg/sub" not in scanned and "node_modules" not in scanned
+
+    # A change nobody reported shows up after a script run
+    (tree / "pkg/sub/c.py").unlink()
+    assert listing(index) == ["a.py", "pkg/b.py", "pkg/new/deep/d.py", "pkg/sub/c.py"]
+    workspace_index.notify_tree_changed(tree)
+    assert listing(index) == ["a.py", "pkg/b.py", "pkg/new/deep/d.py"]
+
+
+def test_rescan_interval_is_a_backstop(tree, monkeypatch):
+    index = WorkspaceIndex(tree)
+    listing(index)
+    (tree / "z.py").write_text("x")
+    assert "z.py" not in listing(index)
+    monkeypatch.setattr(workspace_index, "INDEX_RESCAN_INTERVAL", 0)
+    assert "z.py" in listing(index)
+
+
+def test_paging(tree):
+    index = WorkspaceIndex(tree)
+    first, cursor = index.page(limit=2)
+    rest, end = index.page(cursor=cursor, limit=2)
+    assert first + rest == ["a.py", "pkg/b.py", "pkg/sub/c.py"] and end is None
@@ -0,0 +1,117 @@
+import os
+import time
+
+import pytest
+
+from workspace_registry import WorkspaceRegistry, WorkspaceGone
+
+
+@pytest.fixture
+def base(tmp_path):
+    base = tmp_path / "workspaces"
+    base.mkdir()
+    return base
+
+
+def state_path(base):
+    return str(base.parent / "state" / "registry.json")
+
+
+def make_workspace(base, name, size, idle):
+    root = base / name
+    root.mkdir()
+    (root / "data").write_bytes(b"x" * size)
+    return str(root), idle
+
+
+def start(base, workspaces, on_remove=None, shared_bytes=None, **limits):
+    """Registry over base whose workspaces were last accessed idle seconds ago."""
+    registry = WorkspaceRegistry(**{"ttl": 0, "max_total_bytes": 0, "quota_bytes": 0, **limits})
+    registry.start(str(base), state_path(base), on_remove=on_remove, shared_bytes=shared_bytes, interval=0)
+    now = time.time()
+    for root, idle in workspaces:
+        registry.register(root)
+        registry._get(root).last_access = now - idle
+    return registry
+
+
+def test_ttl_evicts_idle_workspaces(base):
+    old = make_workspace(base, "old", 10, idle=100)
+    new = make_workspace(base, "new", 10, idle=1)
+    removed = []
+    registry = start(base, [old, new], on_remove=removed.append, ttl=50)
+    registry.sweep()
+    assert removed == [os.path.realpath(old[0])]
+    assert not os.path.exists(old[0]) and os.path.exists(new[0])
+    assert registry.stats()["evicted_ttl"] == 1
+
+
+def test_budget_evicts_least_recently_used_first(base):
+    workspaces = [make_workspace(base, f"ws{i}", 100, idle=10 * i) for i in range(4)]
+    registry = start(base, workspaces, max_total_bytes=250)
+    registry.sweep()
+    assert sorted(os.listdir(base)) == ["ws0", "ws1"]
+    assert registry.stats()["evicted_lru"] == 2
+
+
+def test_shared_bytes_dont_count_toward_the_budget(base):
+    workspaces = [make_workspace(base, f"ws{i}", 100, idle=10 * i) for i in range(4)]
+    registry = start(base, workspaces, shared_bytes=lambda: 100, max_total_bytes=250)
+    registry.sweep()
+    assert sorted(os.listdir(base)) == ["ws0", "ws1", "ws2"]
+
+
+def test_pinned_workspaces_are_never_evicted(base):
+    old = make_workspace(base, "old", 10, idle=100)
+    registry = start(base, [old], ttl=50)
+    with registry.pin(old[0]):
+        registry._get(old[0]).last_access -= 100
+        registry.sweep()
+        assert os.path.exists(old[0])
+    registry._get(old[0]).last_access -= 100
+    registry.sweep()
+    assert not os.path.exists(old[0])
+
+
+def test_pinning_an_evicted_workspace_fails(base):
+    old = make_workspace(base, "old", 10, idle=100)
+    registry = start(base, [old], ttl=50)
+    registry.sweep()
+    with pytest.raises(WorkspaceGone):
+        with registry.pin(old[0]):
+            pass
+    with pytest.raises(WorkspaceGone):
+        with registry.pin(str(base / "never-registered")):
+            pass
+
+
+def test_stale_sizes_are_remeasured(base):
+    ws = make_workspace(base, "ws", 10, idle=0)
+    registry = start(base, [ws])
+    (base / "ws" / "more").write_bytes(b"y" * 90)
+    registry.mark_stale(ws[0])
+    registry.sweep()
+    assert registry.stats()["bytes"] == 100
+
+
+def test_quota(base):
+    ws = make_workspace(base, "ws", 10, idle=0)
+    registry = start(base, [ws], quota_bytes=100)
+    assert registry.reserve_write(ws[0], 91)[0].startswith("Error: workspace quota exceeded")
+    assert registry.reserve_write(ws[0], 60) == (None, 60)
+    # A second write can't use the quota held by the first one still running
+    assert registry.reserve_write(ws[0], 40)[0] is not None
+    assert registry.reserve_write(ws[0], 30) == (None, 30)
+    registry.record_write(ws[0], 0, 50, reserved=60)
+    registry.record_write(ws[0], 0, 0, reserved=30)
+    assert registry.reserve_write(ws[0], 41)[0] is not None
+    assert registry.reserve_write(ws[0], 40) == (None, 40)
+
+
+def test_last_access_survives_a_restart(base):
+    old = make_workspace(base, "old", 10, idle=100)
+    start(base, [old]).sweep()
+    registry = WorkspaceRegistry(ttl=50, max_total_bytes=0, quota_bytes=0)
+    registry.start(str(base), state_path(base), interval=0)
+    registry.sweep()
+    assert not os.path.exists(old[0])
@@ -0,0 +1,115 @@
+import os
+import sys
+import json
+import threading
+from collections import OrderedDict
+
+from config import TOOL_CACHE_MAX_BYTES
+
+# Cacheable tools and the argument naming the path they read
+CACHEABLE_FUNCTIONS = {
+    "get_file_content": "file_path",
+    "get_files_info": "directory",
+}
+
+
+class ToolResultCache:
+    """LRU memo of read-only tool results, bounded by approximate memory use.
+
+    Keys include the identity of what was read: (inode, size, mtime) for files,
+    and for directories their mtime plus a per-workspace generation that every
+    agent write or script run bumps, since file sizes in a listing can change
+    without touching the directory mtime.
+    """
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # key -> (result, size)
+        self._by_path = {}             # (workspace, path) -> set of keys
+        self._generation = {}          # workspace -> int
+        self._bytes = 0
+        self.hits = self.misses = self.evictions = self.invalidations = 0
+
+    def _key(self, workspace, name, args):
+        arg_name = CACHEABLE_FUNCTIONS.get(name)
+        if arg_name is None or self.max_bytes <= 0:
+            return None
+        path = os.path.normpath(args.get(arg_name) or ".")
+        try:
+            st = os.stat(os.path.join(workspace, path))
+        except (OSError, ValueError):
+            return None
+        if name == "get_files_info":
+            identity = (st.st_ino, st.st_mtime_ns, self._generation.get(workspace, 0))
+        else:
+            identity = (st.st_ino, st.st_size, st.st_mtime_ns)
+        key_args = json.dumps({**args, arg_name: path}, sort_keys=True, default=str)
+        return (workspace, path, name, key_args, identity)
+
+    def lookup(self, workspace, name, args):
+        """Return (key, cached result or None); key is None when the call can't be cached."""
+        key = self._key(workspace, name, args)
+        if key is None:
+            return None, None
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return key, None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return key, entry[0]
+
+    def store(self, key, result):
+        if key is None or not isinstance(result, str) or result.startswith("Error"):
+            return
+        size = sys.getsizeof(result)
+        if size > self.max_bytes // 4:
+            return
+        with self._lock:
+            if key in self._entries:
+                return
+            self._entries[key] = (result, size)
+            self._by_path.setdefault(key[:2], set()).add(key)
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                self._drop(next(iter(self._entries)))
+                self.evictions += 1
+
+    def _drop(self, key):
+        _, size = self._entries.pop(key)
+        self._bytes -= size
+        keys = self._by_path.get(key[:2])
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._by_path[key[:2]]
+
+    def invalidate_path(self, workspace, path):
+        """Drop everything cached for a file the agent just wrote, and stale listings."""
+        with self._lock:
+            for key in list(self._by_path.get((workspace, os.path.normpath(path)), ())):
+                self._drop(key)
+                self.invalidations += 1
+            self._generation[workspace] = self._generation.get(workspace, 0) + 1
+
+    def invalidate_listings(self, workspace):
+        """Something may have changed files anywhere (e.g. a script ran); retire cached listings."""
+        with self._lock:
+            self._generation[workspace] = self._generation.get(workspace, 0) + 1
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
+
+
+tool_cache = ToolResultCache(TOOL_CACHE_MAX_BYTES)
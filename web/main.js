@@ -876,9 +876,17 @@ async function refreshTree() {
   showTreeLoading(true);
   
   try {
-    const response = await apiCall(`/v1/workspaces/${state.workspace}/tree`);
-    const data = await response.json();
-    state.treeData = data.entries || [];
+    // The tree endpoint is paginated; follow next_cursor until every entry is loaded
+    const entries = [];
+    let cursor = null;
+    do {
+      const query = cursor ? `?cursor=${encodeURIComponent(cursor)}` : '';
+      const response = await apiCall(`/v1/workspaces/${state.workspace}/tree${query}`);
+      const data = await response.json();
+      entries.push(...(data.entries || []));
+      cursor = data.next_cursor;
+    } while (cursor);
+    state.treeData = entries;
     renderTree(state.treeData);
     
     // Fetch git status after tree refresh and wait for it
@@ -0,0 +1,145 @@
+import os
+import shutil
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+
+from config import (
+    DOWNLOAD_CHUNK_SIZE,
+    UPLOAD_CHUNK_SIZE,
+    UPLOAD_MAX_UNCOMPRESSED_BYTES,
+    UPLOAD_MAX_MEMBERS,
+    UPLOAD_EXTRACT_WORKERS,
+)
+
+
+def _plan_members(z, base_real):
+    """Validate every entry up front and return (dirs, files) as (member, target) pairs."""
+    infos = z.infolist()
+    if len(infos) > UPLOAD_MAX_MEMBERS:
+        raise ValueError(f"ZIP has too many entries ({len(infos)} > {UPLOAD_MAX_MEMBERS})")
+
+    total = 0
+    dirs, files = [], []
+    for member in infos:
+        target = os.path.realpath(os.path.join(base_real, member.filename))
+        # Zip slip guard: every entry must resolve inside the workspace
+        if not target.startswith(base_real + os.sep):
+            raise ValueError("Invalid entry in ZIP")
+        if member.is_dir():
+            dirs.append(target)
+            continue
+        total += member.file_size
+        if total > UPLOAD_MAX_UNCOMPRESSED_BYTES:
+            raise ValueError(f"ZIP expands beyond the {UPLOAD_MAX_UNCOMPRESSED_BYTES} byte limit")
+        files.append((member, target))
+    return dirs, files
+
+
+def _extract_batch(zip_path, batch):
+    # Each worker opens its own handle so reads don't contend on one file position
+    with zipfile.ZipFile(zip_path) as z:
+        for member, target in batch:
+            with z.open(member) as src, open(target, "wb") as dst:
+                shutil.copyfileobj(src, dst, UPLOAD_CHUNK_SIZE)
+
+
+def _balanced_batches(files, n):
+    """Split files into n batches of roughly equal uncompressed size."""
+    batches = [[] for _ in range(n)]
+    loads = [0] * n
+    for item in sorted(files, key=lambda f: f[0].file_size, reverse=True):
+        i = loads.index(min(loads))
+        batches[i].append(item)
+        loads[i] += item[0].file_size
+    return [b for b in batches if b]
+
+
+def extract_zip(zip_path, dest_root, workers=None):
+    """Extract the ZIP at zip_path into dest_root with bounded memory.
+
+    Raises ValueError for unsafe entries or archives over the configured limits,
+    and zipfile.BadZipFile for corrupt input.
+    """
+    workers = workers or UPLOAD_EXTRACT_WORKERS
+    base_real = os.path.realpath(dest_root)
+    with zipfile.ZipFile(zip_path) as z:
+        dirs, files = _plan_members(z, base_real)
+
+    for d in dirs:
+        os.makedirs(d, exist_ok=True)
+    for _, target in files:
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+
+    if workers <= 1 or len(files) < 2:
+        _extract_batch(zip_path, files)
+        return len(files)
+
+    batches = _balanced_batches(files, workers)
+    with ThreadPoolExecutor(max_workers=len(batches)) as pool:
+        for fut in [pool.submit(_extract_batch, zip_path, b) for b in batches]:
+            fut.result()
+    return len(files)
+
+
+# Formats that are already compressed; deflating them again only burns CPU
+STORE_EXTENSIONS = {
+    ".png", ".jpg", ".jpeg", ".gif", ".webp", ".ico",
+    ".zip", ".gz", ".tgz", ".bz2", ".xz", ".zst", ".7z", ".rar",
+    ".whl", ".jar", ".egg",
+    ".mp3", ".mp4", ".mov", ".avi", ".pdf", ".woff", ".woff2",
+}
+
+
+class _ChunkSink:
+    """Write-only, unseekable buffer that zipfile writes into and the generator drains."""
+
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def iter_zip(base_real, ignore_dirs, compresslevel=6):
+    """Yield a ZIP archive of base_real chunk by chunk.
+
+    The output stream is unseekable, so zipfile writes data descriptors after each
+    entry and nothing larger than one read chunk (plus compressor state) is held.
+    """
+    sink = _ChunkSink()
+    with zipfile.ZipFile(sink, "w", zipfile.ZIP_DEFLATED, compresslevel=compresslevel) as zipf:
+        for root, dirs, files in os.walk(base_real):
+            # Skip ignored directories
+            dirs[:] = [d for d in dirs if d not in ignore_dirs]
+
+            for file in files:
+                file_path = os.path.join(root, file)
+                arcname = os.path.relpath(file_path, base_real)
+                try:
+                    zinfo = zipfile.ZipInfo.from_file(file_path, arcname)
+                    src = open(file_path, "rb")
+                except OSError:
+                    # File vanished or is unreadable since the walk listed it
+                    continue
+                stored = compresslevel == 0 or os.path.splitext(file)[1].lower() in STORE_EXTENSIONS
+                zinfo.compress_type = zipfile.ZIP_STORED if stored else zipfile.ZIP_DEFLATED
+                zinfo.compress_level = None if stored else compresslevel
+                with src, zipf.open(zinfo, "w") as dst:
+                    while chunk := src.read(DOWNLOAD_CHUNK_SIZE):
+                        dst.write(chunk)
+                        if data := sink.drain():
+                            yield data
+                if data := sink.drain():
+                    yield data
+    # Central directory is written on close
+    if data := sink.drain():
+        yield data
@@ -0,0 +1,125 @@
+import os
+import tempfile
+import subprocess
+
+from config import DOWNLOAD_CHUNK_SIZE
+
+# Same heuristic git uses: a NUL byte near the start means binary
+BINARY_SNIFF_BYTES = 8000
+
+
+def _iter_command(cmd, cwd):
+    """Yield a command's stdout in chunks, raising CalledProcessError on failure."""
+    # stderr goes to a temp file: a pipe nobody reads until stdout ends would fill up
+    # on a long stream of warnings and block git
+    with tempfile.TemporaryFile() as stderr_file:
+        proc = subprocess.Popen(cmd, cwd=cwd, stdout=subprocess.PIPE, stderr=stderr_file)
+        try:
+            while chunk := proc.stdout.read(DOWNLOAD_CHUNK_SIZE):
+                yield chunk
+            if proc.wait() != 0:
+                stderr_file.seek(0)
+                raise subprocess.CalledProcessError(proc.returncode, cmd, stderr=stderr_file.read().decode(errors="replace"))
+        finally:
+            if proc.poll() is None:
+                proc.kill()
+                proc.wait()
+            proc.stdout.close()
+
+
+def _iter_git_section(title, cmd, cwd):
+    started = False
+    for chunk in _iter_command(cmd, cwd):
+        if not started:
+            yield f"# {title}\n".encode()
+            started = True
+        yield chunk
+    if started:
+        yield b"\n\n"
+
+
+def _iter_untracked_paths(cwd):
+    """Yield untracked paths (raw bytes) as git lists them, without buffering the full list."""
+    carry = b""
+    for chunk in _iter_command(["git", "ls-files", "--others", "--exclude-standard", "-z"], cwd):
+        parts = (carry + chunk).split(b"\0")
+        carry = parts.pop()
+        yield from (p for p in parts if p)
+    if carry:
+        yield carry
+
+
+def _iter_new_file_diff(base_real, rel):
+    header = b"diff --git a/" + rel + b" b/" + rel + b"\nnew file mode 100644\n"
+    binary_stub = header + b"Binary file (not shown)\n\n"
+    try:
+        f = open(os.path.join(base_real, os.fsdecode(rel)), "rb")
+    except OSError:
+        # Skip unreadable files
+        yield binary_stub
+        return
+    with f:
+        head = f.read(BINARY_SNIFF_BYTES)
+        if b"\0" in head:
+            yield binary_stub
+            return
+
+        # First pass only counts lines so the hunk header can precede the content
+        lines = head.count(b"\n") + 1
+        while chunk := f.read(DOWNLOAD_CHUNK_SIZE):
+            lines += chunk.count(b"\n")
+
+        yield header
+        yield b"index 0000000..0000000\n--- /dev/null\n+++ b/" + rel + b"\n"
+        yield f"@@ -0,0 +1,{lines} @@\n".encode()
+        f.seek(0)
+        yield b"+"
+        while chunk := f.read(DOWNLOAD_CHUNK_SIZE):
+            yield chunk.replace(b"\n", b"\n+")
+        yield b"\n\n"
+
+
+def _iter_untracked_section(base_real):
+    started = False
+    for rel in _iter_untracked_paths(base_real):
+        if not started:
+            yield b"# Untracked Files\n"
+            started = True
+        yield from _iter_new_file_diff(base_real, rel)
+
+
+def _coalesce(pieces, size):
+    """Group small pieces into chunks of about `size` bytes to keep send calls cheap."""
+    buf, buffered = [], 0
+    for piece in pieces:
+        buf.append(piece)
+        buffered += len(piece)
+        if buffered >= size:
+            yield b"".join(buf)
+            buf, buffered = [], 0
+    if buf:
+        yield b"".join(buf)
+
+
+def _iter_sections(base_real):
+    emitted = False
+    sections = (
+        _iter_git_section("Staged Changes", ["git", "diff", "--no-color", "--cached"], base_real),
+        _iter_git_section("Unstaged Changes", ["git", "diff", "--no-color"], base_real),
+        _iter_untracked_section(base_real),
+    )
+    for section in sections:
+        for piece in section:
+            emitted = True
+            yield piece
+    if not emitted:
+        yield b"# No changes found\n# All files are up to date with the repository.\n"
+
+
+def iter_combined_diff(base_real):
+    """Yield staged, unstaged and untracked changes as one unified diff, chunk by chunk.
+
+    Runs in linear time and bounded memory: git output is piped straight through
+    and untracked files are read in chunks.
+    """
+    return _coalesce(_iter_sections(base_real), DOWNLOAD_CHUNK_SIZE)
@@ -0,0 +1,187 @@
+import os
+import stat
+import errno
+import fcntl
+import shutil
+import threading
+from contextlib import contextmanager
+
+from file_ops import new_temp_path, replace_keeping_mode, discard
+
+FICLONE = 0x40049409  # linux/fs.h: share src's extents with dst (btrfs, xfs, ...)
+# Errors meaning "this filesystem can't do that", as opposed to a problem with one file
+_UNSUPPORTED = {errno.EOPNOTSUPP, errno.ENOTTY, errno.EXDEV, errno.EINVAL, errno.ENOSYS, errno.EPERM}
+
+_lock = threading.Condition()
+_running = {}     # workspace -> scripts running in it
+_forking = set()  # workspaces being forked right now
+_private = set()  # workspaces known to share no file inodes with another workspace
+_generation = 0   # bumped by every fork, so an unshare that raced one isn't trusted
+_keep_linked = None  # predicate(stat result) for files unshare_tree leaves linked
+_counts = {"forks": 0, "reflinked": 0, "linked": 0, "copied": 0, "unshared": 0}
+
+
+class WorkspaceBusy(Exception):
+    """The workspace has a script running, which could write through freshly shared inodes."""
+
+
+@contextmanager
+def script_running(root):
+    """Held around a script run in root; waits for a fork of root in progress to finish."""
+    root = os.path.realpath(root)
+    with _lock:
+        while root in _forking:
+            _lock.wait()
+        _running[root] = _running.get(root, 0) + 1
+    try:
+        yield
+    finally:
+        with _lock:
+            _running[root] -= 1
+            if not _running[root]:
+                del _running[root]
+
+
+def _reflink(src, dst):
+    with open(src, "rb") as fsrc, open(dst, "wb") as fdst:
+        fcntl.ioctl(fdst.fileno(), FICLONE, fsrc.fileno())
+    shutil.copystat(src, dst)
+
+
+def fork_tree(src, dst):
+    """Recreate the tree at src under dst (which must not exist) without copying data.
+
+    Files are reflinked where the filesystem supports it, which is true copy on
+    write; otherwise they are hardlinked, and only copied if that fails too.
+    Returns counts of files by how they were made.
+    """
+    counts = {"reflinked": 0, "linked": 0, "copied": 0}
+    can_reflink = can_link = True
+    for dirpath, dirnames, filenames in os.walk(src):
+        rel = os.path.relpath(dirpath, src)
+        target_dir = os.path.normpath(os.path.join(dst, rel))
+        os.mkdir(target_dir)
+        for name in filenames + [d for d in dirnames if os.path.islink(os.path.join(dirpath, d))]:
+            source = os.path.join(dirpath, name)
+            target = os.path.join(target_dir, name)
+            if os.path.islink(source):
+                os.symlink(os.readlink(source), target)
+                continue
+            if not os.path.isfile(source):
+                continue  # sockets, fifos
+            if can_reflink:
+                try:
+                    _reflink(source, target)
+                    counts["reflinked"] += 1
+                    continue
+                except OSError as e:
+                    discard(target)
+                    if e.errno not in _UNSUPPORTED:
+                        raise
+                    can_reflink = False
+            if can_link:
+                try:
+                    os.link(source, target)
+                    counts["linked"] += 1
+                    continue
+                except OSError as e:
+                    if e.errno not in _UNSUPPORTED and e.errno != errno.EMLINK:
+                        raise
+                    can_link = e.errno == errno.EMLINK  # only this file has too many links
+            shutil.copy2(source, target)
+            counts["copied"] += 1
+        shutil.copystat(dirpath, target_dir)
+    return counts
+
+
+def fork_workspace(src, dst):
+    """Fork workspace src into the new workspace dst; returns fork_tree's counts.
+
+    Raises WorkspaceBusy if a script is running in src: it was unshared before
+    it started, so it could write in place to a file this fork is about to link.
+    Scripts starting during the fork wait for it.
+    """
+    global _generation
+    src, dst = os.path.realpath(src), os.path.realpath(dst)
+    with _lock:
+        if _running.get(src):
+            raise WorkspaceBusy("a script is running in the workspace")
+        _forking.add(src)
+        # Both sides now share inodes until their first script run unshares them
+        _private.discard(src)
+        _generation += 1
+    try:
+        counts = fork_tree(src, dst)
+    finally:
+        with _lock:
+            _forking.discard(src)
+            _lock.notify_all()
+    with _lock:
+        _counts["forks"] += 1
+        for key, value in counts.items():
+            _counts[key] += value
+    return counts
+
+
+def keep_linked(predicate):
+    """Have unshare_tree skip files for which predicate(stat result) is true.
+
+    Used for blob store files: scripts run with write_guard, which copies such a
+    file just before the script writes it, so they needn't be copied up front.
+    """
+    global _keep_linked
+    _keep_linked = predicate
+
+
+def unshare_tree(root):
+    """Give every hardlinked regular file under root (outside .git) an inode of its own.
+
+    Returns the number of files copied. Git only ever replaces files in .git, so
+    sharing them with other workspaces is safe; files keep_linked() names are
+    left shared too.
+    """
+    keep = _keep_linked
+    unshared = 0
+    for dirpath, dirnames, filenames in os.walk(root):
+        if ".git" in dirnames:
+            dirnames.remove(".git")
+        for name in filenames:
+            path = os.path.join(dirpath, name)
+            try:
+                st = os.lstat(path)
+            except OSError:
+                continue
+            if st.st_nlink < 2 or not stat.S_ISREG(st.st_mode) or (keep is not None and keep(st)):
+                continue
+            tmp_path = new_temp_path(path)
+            try:
+                shutil.copy2(path, tmp_path)
+                replace_keeping_mode(tmp_path, path)
+                unshared += 1
+            except OSError:
+                discard(tmp_path)
+    return unshared
+
+
+def ensure_private(root):
+    """Unshare root's files before something that may write them in place, like a script.
+
+    Tool writes already replace files instead of writing through them, so they
+    never need this. After the first call the check is skipped until root is
+    forked again (or the server restarts).
+    """
+    root = os.path.realpath(root)
+    with _lock:
+        if root in _private:
+            return
+        generation = _generation
+    unshared = unshare_tree(root)
+    with _lock:
+        if generation == _generation:
+            _private.add(root)
+        _counts["unshared"] += unshared
+
+
+def stats():
+    with _lock:
+        return dict(_counts)
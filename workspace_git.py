@@ -0,0 +1,148 @@
+import os
+import time
+import threading
+import subprocess
+
+from config import GIT_STATUS_CACHE_TTL
+from workspace_index import tree_generation
+
+
+def _simple_status(xy):
+    """Map a two-letter porcelain status to the labels the web UI shows."""
+    if xy == "??":
+        return "untracked"
+    elif xy.startswith("A"):
+        return "added"
+    elif xy.startswith("M") or xy == " M":
+        return "modified"
+    elif xy.startswith("D"):
+        return "deleted"
+    elif xy.startswith("R"):
+        return "renamed"
+    return "unknown"
+
+
+def parse_status_v2(output):
+    """Parse `git status --porcelain=v2 --branch -z` output into (branch, files)."""
+    branch = ""
+    files = {}
+    records = output.split("\0")
+    i = 0
+    while i < len(records):
+        record = records[i]
+        i += 1
+        if not record:
+            continue
+        kind = record[0]
+        if kind == "#":
+            if record.startswith("# branch.head "):
+                head = record[len("# branch.head "):]
+                branch = "" if head == "(detached)" else head
+        elif kind == "?":
+            files[record[2:]] = "untracked"
+        elif kind == "1":
+            # 1 XY sub mH mI mW hH hI path
+            fields = record.split(" ", 8)
+            files[fields[8]] = _simple_status(fields[1].replace(".", " "))
+        elif kind == "2":
+            # 2 XY sub mH mI mW hH hI Xscore path, then the original path as its own record
+            fields = record.split(" ", 9)
+            files[fields[9]] = _simple_status(fields[1].replace(".", " "))
+            i += 1
+        elif kind == "u":
+            # u XY sub m1 m2 m3 mW h1 h2 h3 path
+            fields = record.split(" ", 10)
+            files[fields[10]] = _simple_status(fields[1].replace(".", " "))
+    return branch, files
+
+
+def _remote_url(git_dir, remote="origin"):
+    """url of a remote from .git/config, read directly instead of forking git."""
+    section = f'[remote "{remote}"]'
+    current = None
+    try:
+        with open(os.path.join(git_dir, "config"), encoding="utf-8", errors="replace") as f:
+            for line in f:
+                line = line.strip()
+                if line.startswith("["):
+                    current = line.replace("\t", " ")
+                elif current == section and "=" in line:
+                    key, value = line.split("=", 1)
+                    if key.strip().lower() == "url":
+                        return value.strip()
+    except OSError:
+        pass
+    return None
+
+
+def _mtime(path):
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+
+
+class GitStatusCache:
+    """Memoized git status per workspace.
+
+    An entry is reused while .git/index, HEAD, config and the workspace's tree
+    generation (bumped by agent writes and script runs) are unchanged, up to
+    GIT_STATUS_CACHE_TTL seconds as a backstop for changes made outside the agent.
+    """
+
+    def __init__(self, ttl):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries = {}  # workspace -> (validators, expires, result)
+        self.hits = self.misses = 0
+
+    def _validators(self, base_real):
+        git_dir = os.path.join(base_real, ".git")
+        return (
+            _mtime(os.path.join(git_dir, "index")),
+            _mtime(os.path.join(git_dir, "HEAD")),
+            _mtime(os.path.join(git_dir, "config")),
+            tree_generation(base_real),
+        )
+
+    def status(self, base_real):
+        """{"is_git": True, "branch", "remote", "files"}; raises CalledProcessError if git fails."""
+        validators = self._validators(base_real)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(base_real)
+            if entry is not None and entry[0] == validators and entry[1] > now:
+                self.hits += 1
+                return entry[2]
+            self.misses += 1
+        result = subprocess.run(
+            ["git", "status", "--porcelain=v2", "--branch", "-z"],
+            cwd=base_real,
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+        branch, files = parse_status_v2(result.stdout)
+        status = {
+            "is_git": True,
+            "branch": branch,
+            "remote": _remote_url(os.path.join(base_real, ".git")),
+            "files": files,
+        }
+        with self._lock:
+            # git status may refresh the index itself, so key on the index it left behind,
+            # but keep the tree generation seen before the run in case a write raced it
+            validators = self._validators(base_real)[:3] + validators[3:]
+            self._entries[base_real] = (validators, now + self.ttl, status)
+        return status
+
+    def invalidate(self, base_real):
+        with self._lock:
+            self._entries.pop(base_real, None)
+
+    def stats(self):
+        with self._lock:
+            return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+
+git_status_cache = GitStatusCache(GIT_STATUS_CACHE_TTL)
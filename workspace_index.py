@@ -0,0 +1,222 @@
+import os
+import time
+import heapq
+import bisect
+import threading
+
+from config import IGNORE_DIRS, INDEX_RESCAN_INTERVAL
+
+
+class _DirState:
+    __slots__ = ("mtime_ns", "files", "subdirs")
+
+    def __init__(self, mtime_ns, files, subdirs):
+        self.mtime_ns = mtime_ns
+        self.files = files
+        self.subdirs = subdirs
+
+
+class WorkspaceIndex:
+    """Sorted list of every file in a workspace, kept current incrementally.
+
+    The first refresh walks the whole tree. Later refreshes only rescan the
+    directories tool writes flagged through mark_dirty() (and any new
+    subdirectories found there), so they cost O(changes). After a script run
+    (rescan_generation moved) or every INDEX_RESCAN_INTERVAL seconds, a sweep
+    stats every known directory and rescans the ones whose mtime moved. Added
+    and removed paths are applied to the sorted list once per refresh.
+    """
+
+    # Up to this many changed paths are applied with bisect; more rebuild the list in one merge
+    BISECT_MAX_CHANGES = 32
+
+    def __init__(self, root):
+        self.root = os.path.realpath(root)
+        self._lock = threading.Lock()
+        self._dirs = {}      # rel dir ("" for root) -> _DirState
+        self._entries = []   # sorted rel file paths
+        self._dirty = set()  # rel dirs to rescan regardless of mtime
+        self._generation = None  # tree generation at the last refresh
+        self._rescan_generation = None  # rescan generation at the last sweep
+        self._last_sweep = 0.0
+
+    def _abs(self, rel_dir):
+        return os.path.join(self.root, rel_dir) if rel_dir else self.root
+
+    @staticmethod
+    def _join(rel_dir, name):
+        return os.path.join(rel_dir, name) if rel_dir else name
+
+    def _scan(self, rel_dir):
+        files, subdirs = set(), set()
+        with os.scandir(self._abs(rel_dir)) as it:
+            for entry in it:
+                try:
+                    is_dir = entry.is_dir()
+                except OSError:
+                    continue
+                if not is_dir:
+                    files.add(entry.name)
+                elif entry.name not in IGNORE_DIRS and not entry.is_symlink():
+                    # Like os.walk, symlinked directories are not descended into
+                    subdirs.add(entry.name)
+        return files, subdirs
+
+    def _apply_changes(self, changes):
+        """Apply {rel path: present} to the sorted entry list."""
+        entries = self._entries
+        if len(changes) <= self.BISECT_MAX_CHANGES:
+            for rel, present in changes.items():
+                i = bisect.bisect_left(entries, rel)
+                found = i < len(entries) and entries[i] == rel
+                if present and not found:
+                    entries.insert(i, rel)
+                elif not present and found:
+                    del entries[i]
+            return
+        # Big changes (the first build, a new or deleted subtree): one merge instead of
+        # an O(n) list insert per path
+        kept = [rel for rel in entries if changes.get(rel, True)]
+        added = sorted(rel for rel, present in changes.items() if present)
+        merged = []
+        for rel in heapq.merge(kept, added):
+            if not merged or merged[-1] != rel:
+                merged.append(rel)
+        self._entries = merged
+
+    def _drop_dir(self, rel_dir, changes):
+        state = self._dirs.pop(rel_dir, None)
+        if state is None:
+            return
+        for name in state.files:
+            changes[self._join(rel_dir, name)] = False
+        for name in state.subdirs:
+            self._drop_dir(self._join(rel_dir, name), changes)
+
+    def _refresh_dir(self, rel_dir, pending, changes, sweep=True):
+        try:
+            mtime_ns = os.stat(self._abs(rel_dir)).st_mtime_ns
+        except OSError:
+            self._drop_dir(rel_dir, changes)
+            return
+        state = self._dirs.get(rel_dir)
+        if state is None or state.mtime_ns != mtime_ns or rel_dir in self._dirty:
+            try:
+                files, subdirs = self._scan(rel_dir)
+            except OSError:
+                self._drop_dir(rel_dir, changes)
+                return
+            old_files = state.files if state else set()
+            old_subdirs = state.subdirs if state else set()
+            for name in old_files - files:
+                changes[self._join(rel_dir, name)] = False
+            for name in files - old_files:
+                changes[self._join(rel_dir, name)] = True
+            for name in old_subdirs - subdirs:
+                self._drop_dir(self._join(rel_dir, name), changes)
+            state = _DirState(mtime_ns, files, subdirs)
+            self._dirs[rel_dir] = state
+        for name in state.subdirs:
+            sub = self._join(rel_dir, name)
+            # Outside a sweep, only descend into directories we haven't scanned yet
+            if sweep or sub not in self._dirs:
+                pending.append(sub)
+
+    def refresh(self):
+        with self._lock:
+            self._generation = tree_generation(self.root)
+            rescan = rescan_generation(self.root)
+            sweep = rescan != self._rescan_generation or time.monotonic() - self._last_sweep >= INDEX_RESCAN_INTERVAL
+            if sweep:
+                self._rescan_generation = rescan
+                self._last_sweep = time.monotonic()
+                pending = [""]
+            else:
+                # Known directories only (new ones are found from their parent, which is dirty
+                # too), parents first
+                dirty = [rel for rel in self._dirty if rel in self._dirs]
+                pending = sorted(dirty, key=lambda rel: rel.count(os.sep) + 1 if rel else 0, reverse=True)
+            changes = {}  # rel path -> present, last change wins
+            while pending:
+                self._refresh_dir(pending.pop(), pending, changes, sweep)
+            self._apply_changes(changes)
+            self._dirty.clear()
+
+    def mark_dirty(self, rel_path):
+        """Flag the directories above rel_path for a rescan on the next refresh."""
+        rel_dir = os.path.dirname(os.path.normpath(rel_path))
+        with self._lock:
+            while True:
+                self._dirty.add("" if rel_dir == "." else rel_dir)
+                if not rel_dir or rel_dir == ".":
+                    break
+                rel_dir = os.path.dirname(rel_dir)
+
+    def page(self, cursor=None, limit=None):
+        """Return (entries, next_cursor); the cursor is the last path of the previous page.
+
+        The first page refreshes the index; later pages only do if the agent or a
+        script changed the tree since, so paging through a big tree stats it once.
+        """
+        if cursor is None or self._generation != tree_generation(self.root):
+            self.refresh()
+        with self._lock:
+            start = bisect.bisect_right(self._entries, cursor) if cursor else 0
+            end = len(self._entries) if limit is None else start + limit
+            entries = self._entries[start:end]
+            next_cursor = entries[-1] if end < len(self._entries) and entries else None
+        return entries, next_cursor
+
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+_generations = {}  # realpath -> count of agent writes and script runs, for caches keyed on tree state
+_rescan_generations = {}  # realpath -> count of changes to unknown paths (script runs)
+
+
+def get_index(root):
+    root = os.path.realpath(root)
+    with _indexes_lock:
+        index = _indexes.get(root)
+        if index is None:
+            index = _indexes[root] = WorkspaceIndex(root)
+    return index
+
+
+def tree_generation(root):
+    return _generations.get(os.path.realpath(root), 0)
+
+
+def rescan_generation(root):
+    """Bumped only by notify_tree_changed: indexes must rescan the tree when it moves."""
+    return _rescan_generations.get(os.path.realpath(root), 0)
+
+
+def _bump(root):
+    with _indexes_lock:
+        _generations[root] = _generations.get(root, 0) + 1
+
+
+def notify_tree_changed(root):
+    """Called after something may have changed files anywhere in the workspace (e.g. a script ran)."""
+    root = os.path.realpath(root)
+    _bump(root)
+    with _indexes_lock:
+        _rescan_generations[root] = _rescan_generations.get(root, 0) + 1
+
+
+def forget(root):
+    """Drop the index of a deleted workspace."""
+    root = os.path.realpath(root)
+    with _indexes_lock:
+        _indexes.pop(root, None)
+        _generations.pop(root, None)
+        _rescan_generations.pop(root, None)
+
+
+def notify_changed(root, rel_path):
+    """Called after a tool writes rel_path; the index is a no-op if the workspace has none yet."""
+    _bump(os.path.realpath(root))
+    index = _indexes.get(os.path.realpath(root))
+    if index is not None:
+        index.mark_dirty(rel_path)
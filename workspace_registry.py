@@ -0,0 +1,252 @@
+import os
+import json
+import time
+import shutil
+import threading
+from contextlib import contextmanager
+
+from config import WORKSPACE_REGISTRY_PATH, WORKSPACE_TTL, WORKSPACE_MAX_TOTAL_BYTES, WORKSPACE_QUOTA_BYTES, WORKSPACE_SWEEP_INTERVAL
+from file_ops import atomic_write_text, tree_bytes
+
+
+class _Workspace:
+    __slots__ = ("created", "last_access", "size", "stale", "pins", "reserved")
+
+    def __init__(self, created, last_access, size=0, stale=True):
+        self.created = created
+        self.last_access = last_access
+        self.size = size
+        self.stale = stale  # size needs re-measuring (a script ran, or loaded from disk)
+        self.pins = 0       # runs in progress; pinned workspaces are never evicted
+        self.reserved = 0   # quota held by tool writes in progress
+
+
+class WorkspaceGone(Exception):
+    """The workspace isn't registered, or the sweeper is deleting it."""
+
+
+class WorkspaceRegistry:
+    """Creation time, last access and size of every workspace under one base directory.
+
+    A background sweeper deletes workspaces not accessed for ttl seconds, then the
+    least recently accessed ones until the total is within max_total_bytes. Tool
+    writes reserve their growth against quota_bytes per workspace before they
+    run, so concurrent writes can't pass it together. Sizes are kept current
+    from the tool writes themselves; after a script run the workspace is
+    re-measured on the next sweep. The registry is saved to state_path so
+    last-access times survive a restart. A limit of 0 disables it.
+    """
+
+    def __init__(self, ttl=WORKSPACE_TTL, max_total_bytes=WORKSPACE_MAX_TOTAL_BYTES, quota_bytes=WORKSPACE_QUOTA_BYTES):
+        self.ttl = ttl
+        self.max_total_bytes = max_total_bytes
+        self.quota_bytes = quota_bytes
+        self.base = None
+        self.state_path = None
+        self._lock = threading.Lock()
+        self._workspaces = {}  # realpath -> _Workspace
+        self._on_remove = None
+        self._shared_bytes = None
+        self._dirty = False
+        self.evicted_ttl = self.evicted_lru = self.quota_rejections = 0
+
+    def start(self, base, state_path=WORKSPACE_REGISTRY_PATH, on_remove=None, shared_bytes=None, interval=WORKSPACE_SWEEP_INTERVAL):
+        """Load the workspaces under base and start sweeping every interval seconds.
+
+        on_remove(root) is called after a workspace is deleted, to drop its caches.
+        shared_bytes(), if given, is called each sweep and returns how many bytes of
+        the summed workspace sizes are shared files stored only once.
+        """
+        self.base = os.path.realpath(base)
+        self.state_path = state_path
+        if state_path:
+            os.makedirs(os.path.dirname(state_path) or ".", exist_ok=True)
+        self._on_remove = on_remove
+        self._shared_bytes = shared_bytes
+        self._load()
+        if interval > 0:
+            threading.Thread(target=self._sweep_forever, args=(interval,), daemon=True).start()
+
+    def _load(self):
+        try:
+            with open(self.state_path, encoding="utf-8") as f:
+                saved = json.load(f)
+        except (OSError, ValueError, TypeError):
+            saved = {}
+        now = time.time()
+        with self._lock:
+            for entry in os.scandir(self.base):
+                if not entry.is_dir(follow_symlinks=False):
+                    continue
+                created, last_access = saved.get(entry.name) or (entry.stat().st_ctime, entry.stat().st_mtime)
+                self._workspaces[entry.path] = _Workspace(created, min(last_access, now))
+            self._dirty = True
+
+    def _save(self):
+        with self._lock:
+            if not self._dirty or not self.state_path:
+                return
+            state = {os.path.basename(root): [ws.created, ws.last_access] for root, ws in self._workspaces.items()}
+            self._dirty = False
+        atomic_write_text(self.state_path, json.dumps(state))
+
+    def _get(self, root):
+        return self._workspaces.get(os.path.realpath(root))
+
+    def register(self, root):
+        """Record a newly created workspace and measure it; returns its size in bytes."""
+        root = os.path.realpath(root)
+        size = tree_bytes(root)
+        now = time.time()
+        with self._lock:
+            self._workspaces[root] = _Workspace(now, now, size, stale=False)
+            self._dirty = True
+        return size
+
+    def over_quota(self, size):
+        return self.quota_bytes > 0 and size > self.quota_bytes
+
+    def touch(self, root):
+        with self._lock:
+            ws = self._get(root)
+            if ws is not None:
+                ws.last_access = time.time()
+                self._dirty = True
+
+    def exists(self, root):
+        with self._lock:
+            return self._get(root) is not None
+
+    @contextmanager
+    def pin(self, root):
+        """Keep root from being evicted while a run uses it.
+
+        Raises WorkspaceGone if root isn't registered: never was, or the sweeper
+        already dropped it and is deleting its files.
+        """
+        with self._lock:
+            ws = self._get(root)
+            if ws is None:
+                raise WorkspaceGone(root)
+            ws.pins += 1
+            ws.last_access = time.time()
+        try:
+            yield
+        finally:
+            with self._lock:
+                ws.pins -= 1
+                ws.last_access = time.time()
+                self._dirty = True
+
+    def reserve_write(self, root, growth):
+        """Hold growth bytes of root's quota for a write about to run.
+
+        Returns (error, reserved): an error message if the write would pass the
+        quota counting other writes in progress, else None and the bytes held,
+        to hand back to record_write once the write is done.
+        """
+        with self._lock:
+            ws = self._get(root)
+            if ws is None or self.quota_bytes <= 0 or growth <= 0:
+                return None, 0
+            if ws.size + ws.reserved + growth > self.quota_bytes:
+                self.quota_rejections += 1
+                total = ws.size + ws.reserved + growth
+                return f"Error: workspace quota exceeded ({total} of {self.quota_bytes} bytes); delete files or write less", 0
+            ws.reserved += growth
+            return None, growth
+
+    def record_write(self, root, old_size, new_size, reserved=0):
+        """Account for a file that went from old_size to new_size bytes, releasing reserved."""
+        with self._lock:
+            ws = self._get(root)
+            if ws is not None:
+                ws.reserved = max(0, ws.reserved - reserved)
+                ws.size = max(0, ws.size + new_size - old_size)
+                ws.last_access = time.time()
+                self._dirty = True
+
+    def mark_stale(self, root):
+        """Something may have changed files anywhere in root (e.g. a script ran)."""
+        with self._lock:
+            ws = self._get(root)
+            if ws is not None:
+                ws.stale = True
+
+    def remove(self, root):
+        root = os.path.realpath(root)
+        with self._lock:
+            self._workspaces.pop(root, None)
+            self._dirty = True
+        self._delete(root)
+
+    def _delete(self, root):
+        """Delete a workspace already dropped from the registry."""
+        shutil.rmtree(root, ignore_errors=True)
+        if self._on_remove is not None:
+            self._on_remove(root)
+
+    def sweep(self):
+        """Re-measure stale workspaces, then evict expired and least recently used ones."""
+        with self._lock:
+            stale = [root for root, ws in self._workspaces.items() if ws.stale]
+        for root in stale:
+            size = tree_bytes(root)
+            with self._lock:
+                ws = self._workspaces.get(root)
+                if ws is not None:
+                    ws.size, ws.stale = size, False
+
+        now = time.time()
+        with self._lock:
+            idle = sorted((ws.last_access, root) for root, ws in self._workspaces.items() if not ws.pins)
+            total = sum(ws.size for ws in self._workspaces.values())
+        if self._shared_bytes is not None:
+            total -= self._shared_bytes()
+        for last_access, root in idle:
+            expired = self.ttl > 0 and now - last_access > self.ttl
+            over_budget = self.max_total_bytes > 0 and total > self.max_total_bytes
+            if not expired and not over_budget:
+                break
+            with self._lock:
+                ws = self._workspaces.get(root)
+                # Skip anything used since the snapshot was taken. The entry is dropped in the
+                # same critical section, so pinning it from now on raises WorkspaceGone
+                if ws is None or ws.pins or ws.last_access != last_access:
+                    continue
+                del self._workspaces[root]
+                self._dirty = True
+                total -= ws.size
+                if expired:
+                    self.evicted_ttl += 1
+                else:
+                    self.evicted_lru += 1
+            self._delete(root)
+        self._save()
+
+    def _sweep_forever(self, interval):
+        while True:
+            time.sleep(interval)
+            try:
+                self.sweep()
+            except Exception as e:
+                print(f"Workspace sweep failed: {e}")
+
+    def stats(self):
+        with self._lock:
+            largest = sorted(self._workspaces.items(), key=lambda item: item[1].size, reverse=True)[:5]
+            return {
+                "workspaces": len(self._workspaces),
+                "bytes": sum(ws.size for ws in self._workspaces.values()),
+                "max_total_bytes": self.max_total_bytes,
+                "quota_bytes": self.quota_bytes,
+                "ttl": self.ttl,
+                "pinned": sum(1 for ws in self._workspaces.values() if ws.pins),
+                "evicted_ttl": self.evicted_ttl,
+                "evicted_lru": self.evicted_lru,
+                "quota_rejections": self.quota_rejections,
+                "largest": [{"workspace_id": os.path.basename(root), "bytes": ws.size} for root, ws in largest],
+            }
+
+
+workspace_registry = WorkspaceRegistry()
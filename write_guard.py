@@ -0,0 +1,118 @@
+"""Copy on write for hardlinked workspace files, inside the script's own process.
+
+Workspace files may be hardlinks into the blob store (blob_store.py), shared
+with other workspaces. install() adds an audit hook that gives such a file an
+inode of its own just before the script opens it for writing or truncates it,
+so the write can't reach the other links and the rest stay shared. Only Python
+code in this process is covered, not programs the script starts.
+
+Cold runs start scripts through this file, as
+`python write_guard.py <workspace> <script> [args...]`; the warm fork server
+calls install() in each child. Like the zygote, it imports nothing from the
+server so scripts can't see its modules.
+"""
+import sys
+
+# What a plain `python script.py` has imported before the script runs
+_STARTUP_MODULES = frozenset(name.partition(".")[0] for name in sys.modules)
+
+import os
+import shutil
+import runpy
+import tempfile
+import threading
+import traceback
+
+_WRITE_FLAGS = os.O_WRONLY | os.O_RDWR | os.O_APPEND | os.O_TRUNC
+_local = threading.local()
+
+
+def _unshare(path, workspace):
+    try:
+        st = os.stat(path)
+    except (OSError, TypeError, ValueError):
+        return
+    if st.st_nlink < 2 or not os.path.isfile(path):
+        return
+    path = os.path.realpath(path)
+    if not path.startswith(workspace + os.sep):
+        return
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".tmp-")
+    os.close(fd)
+    try:
+        shutil.copy2(path, tmp_path)
+        os.replace(tmp_path, path)
+    except OSError:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+
+
+def install(workspace):
+    """Break the hardlinks of workspace files this process writes to, before each write."""
+    workspace = os.path.realpath(workspace)
+
+    def hook(event, args):
+        if event == "open":
+            path, _, flags = args
+            if not flags & _WRITE_FLAGS:
+                return
+        elif event == "os.truncate":
+            path = args[0]
+        else:
+            return
+        if isinstance(path, int) or getattr(_local, "active", False):
+            return  # an fd (already open), or our own copy
+        _local.active = True
+        try:
+            _unshare(path, workspace)
+        finally:
+            _local.active = False
+
+    sys.addaudithook(hook)
+
+
+def evict_shadowed(script_dir, startup_modules):
+    """Forget modules imported after start-up that a file next to the script shadows.
+
+    `python script.py` puts the script's directory first on sys.path, so a
+    workspace random.py or logging/ package wins over the stdlib module; the
+    script must import it fresh instead of reusing our copy.
+    """
+    shadowed = {}
+    for name in list(sys.modules):
+        top = name.partition(".")[0]
+        if top in startup_modules:
+            continue
+        if top not in shadowed:
+            shadowed[top] = (
+                os.path.isfile(os.path.join(script_dir, top + ".py"))
+                or os.path.isfile(os.path.join(script_dir, top, "__init__.py"))
+            )
+        if shadowed[top]:
+            del sys.modules[name]
+
+
+def main():
+    workspace, path = sys.argv[1], sys.argv[2]
+    install(workspace)
+    sys.argv = sys.argv[2:]
+    # Same as `python script.py`: the script's directory, not ours, comes first on sys.path
+    sys.path[0] = os.path.dirname(path)
+    evict_shadowed(sys.path[0], _STARTUP_MODULES)
+    try:
+        runpy.run_path(path, run_name="__main__")
+    except SystemExit:
+        raise
+    except BaseException as e:
+        # Hide our frames and runpy's, as a plain `python script.py` would
+        tb = e.__traceback__
+        while tb is not None and tb.tb_frame.f_code.co_filename != path:
+            tb = tb.tb_next
+        traceback.print_exception(type(e), e, tb or e.__traceback__)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()